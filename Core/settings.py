@@ -10,9 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -87,6 +91,103 @@ DATABASES = {
     }
 }
 
+# SQLite con varios vendedores a la vez. SQLite ignora select_for_update(), así que:
+# - journal WAL: las lecturas no bloquean la escritura ni al revés;
+# - timeout: espera hasta SQLITE_BUSY_TIMEOUT segundos el bloqueo en vez de fallar
+#   con "database is locked";
+# - transaction_mode IMMEDIATE: cada transaction.atomic() toma el bloqueo de
+#   escritura en el BEGIN, de modo que dos ventas nunca leen el mismo stock y
+#   luego compiten por escribirlo;
+# - conexiones persistentes (CONN_MAX_AGE) para no reabrir la base en cada petición.
+# SQLITE_CONCURRENCIA=0 vuelve a la configuración por defecto de Django.
+
+SQLITE_CONCURRENCIA = os.environ.get('SQLITE_CONCURRENCIA', '1') == '1'
+if SQLITE_CONCURRENCIA:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+        },
+    })
+
+# SQLITE_ESCRITOR_UNICO=1: las ventas, compras y producciones de este proceso se
+# encolan a un único hilo escritor que aplica varias en un mismo commit (Pan/escritor.py).
+SQLITE_ESCRITOR_UNICO = os.environ.get('SQLITE_ESCRITOR_UNICO') == '1'
+SQLITE_ESCRITOR_LOTE = 64  # mutaciones máximas por commit
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: 'locmem' (por proceso), 'file' (compartida entre procesos en
+# la misma máquina) o 'redis' (cualquier servidor compatible con Redis, REDIS_URL).
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'redis' and importlib.util.find_spec('redis') is None:
+    # RedisCache sólo falla al primer acceso a la caché, con un ImportError poco claro
+    raise ImproperlyConfigured("CACHE_BACKEND=redis necesita el paquete 'redis' (pip install -r requirements.txt).")
+
+_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {**_CACHE_BACKENDS[CACHE_BACKEND], 'KEY_PREFIX': 'pan'},
+    'dashboard': {**_CACHE_BACKENDS[CACHE_BACKEND], 'KEY_PREFIX': 'dashboard'},
+}
+if CACHE_BACKEND == 'locmem':
+    CACHES['dashboard']['LOCATION'] = 'dashboard'
+elif CACHE_BACKEND == 'file':
+    CACHES['dashboard']['LOCATION'] = os.path.join(BASE_DIR, 'cache', 'dashboard')
+
+# segundos que una entrada del dashboard puede vivir aunque no haya escrituras
+DASHBOARD_CACHE_TIMEOUT = 300
+# segundos que la vista asíncrona espera cada sección del dashboard antes de omitirla
+DASHBOARD_TIMEOUT_SECCION = 2.0
+
+# Pronóstico de consumo de insumos (Pan/pronostico.py, `manage.py pronosticar`):
+# se pide cuando el stock no cubre PLAZO + SEGURIDAD días de consumo y se repone
+# hasta cubrir OBJETIVO días.
+PRONOSTICO_PLAZO_DIAS = 3  # días que tarda en llegar un pedido
+PRONOSTICO_SEGURIDAD_DIAS = 2
+PRONOSTICO_OBJETIVO_DIAS = 14
+
+# Ventas de años cerrados movidas por `manage.py archivar_ventas` (Pan/archivo.py),
+# una base SQLite por año.
+ARCHIVO_DIR = os.environ.get('ARCHIVO_DIR', os.path.join(BASE_DIR, 'archivo'))
+
+# Eventos en vivo del dashboard (SSE, Pan/eventos.py). 'local': sólo pantallas del
+# mismo proceso; 'unix': reparte entre workers de la máquina con sockets en EVENTOS_DIR.
+EVENTOS_BROKER = os.environ.get('EVENTOS_BROKER', 'local')
+EVENTOS_DIR = os.environ.get('EVENTOS_DIR', os.path.join(tempfile.gettempdir(), 'pan-eventos'))
+
+
+# Instrumentación por petición (Pan/instrumentacion.py), desactivada por defecto.
+# INSTRUMENTACION=1 añade el middleware y el backend de plantillas que mide el render;
+# el informe está en /instrumentacion/ y en `manage.py informe_instrumentacion`.
+
+INSTRUMENTACION = os.environ.get('INSTRUMENTACION') == '1'
+INSTRUMENTACION_BUFFER = 5000  # registros en memoria (buffer circular)
+INSTRUMENTACION_FLUSH_SEGUNDOS = 30
+INSTRUMENTACION_ARCHIVO = os.environ.get('INSTRUMENTACION_ARCHIVO', os.path.join(BASE_DIR, 'instrumentacion.jsonl'))
+
+if INSTRUMENTACION:
+    MIDDLEWARE.insert(0, 'Pan.instrumentacion.InstrumentacionMiddleware')
+    TEMPLATES[0]['BACKEND'] = 'Pan.instrumentacion.DjangoTemplatesInstrumentado'
+    TEMPLATES[0]['NAME'] = 'django'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
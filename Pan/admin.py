@@ -1,3 +1,44 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Insumo, Producto, ProductoInsumo, Proveedor, Vendedor
+
+# Las ediciones del admin pasan por save()/delete(): las señales (Pan/signals.py)
+# invalidan el catálogo, las recetas en caché y el índice de búsqueda.
+# Para cambios masivos de precios o recetas: `manage.py importar_catalogo` o /importar/.
+
+
+class ProductoInsumoInline(admin.TabularInline):
+    model = ProductoInsumo
+    extra = 1
+    autocomplete_fields = ['insumo']
+
+
+@admin.register(Producto)
+class ProductoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nombre', 'tipo_producto', 'precio_venta', 'costo', 'stock']
+    list_filter = ['tipo_producto']
+    search_fields = ['nombre']
+    ordering = ['nombre']
+    inlines = [ProductoInsumoInline]
+
+
+@admin.register(Insumo)
+class InsumoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nombre', 'coste', 'stock']
+    search_fields = ['nombre']
+    ordering = ['nombre']
+
+
+@admin.register(Proveedor)
+class ProveedorAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nombre', 'tipo_proveedor', 'telefono']
+    list_filter = ['tipo_proveedor']
+    search_fields = ['nombre']
+    ordering = ['nombre']
+
+
+@admin.register(Vendedor)
+class VendedorAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nombre']
+    search_fields = ['nombre']
+    ordering = ['nombre']
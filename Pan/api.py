@@ -0,0 +1,229 @@
+"""
+API JSON para las terminales de venta (tablets del mostrador).
+
+``POST /api/ventas/`` acepta una venta o una lista ``{"ventas": [...]}``:
+
+    {"clave": "6f1c...", "vendedor": 1, "fecha_hora": "2026-10-16T08:30:00",
+     "lineas": [{"producto": 3, "cantidad": 2}, ...]}
+
+``clave`` la genera el cliente y hace la venta idempotente: reenviarla tras
+un corte de red devuelve la venta ya registrada sin volver a descontar stock.
+``fecha_hora`` es opcional. Cada venta se valida con las mismas reglas de
+stock que el formulario de ``ventas`` y se responde con un resultado compacto
+por venta.
+
+``POST /api/ventas/sincronizar/`` recibe la cola de tickets pendientes que la
+página de ventas guarda mientras no hay conexión, con el mismo formato.
+
+``GET /api/catalogo/`` devuelve productos, insumos, proveedores y vendedores
+para armar los selectores en el navegador (ver ``catalogo.py``).
+
+``GET /api/buscar/?tipo=productos&q=pan dul`` devuelve los primeros
+productos, insumos o proveedores cuyo nombre coincide (ver ``busqueda.py``).
+
+``GET /api/planificador/`` devuelve el máximo producible de cada pan y su
+insumo limitante; ``POST`` con ``{"plan": [{"producto": 3, "cantidad": 40}, ...]}``
+indica si el plan cabe en el stock (ver ``planificador.py``).
+"""
+import json
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_GET, require_http_methods, require_POST
+
+from . import busqueda, catalogo, escritor, planificador
+from .stock import StockInsuficiente, registrar_venta_idempotente
+
+MAX_VENTAS_POR_PETICION = 100
+# la cola offline de una tablet puede acumular muchos tickets durante un corte
+MAX_TICKETS_POR_LOTE = 500
+
+
+def leer_json(request):
+    # exigir application/json: un formulario de otro sitio no puede enviarlo sin CORS
+    if request.content_type != 'application/json':
+        raise ValueError('Content-Type debe ser application/json.')
+    try:
+        return json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError('JSON inválido.')
+
+
+def _lineas(lineas):
+    if not isinstance(lineas, list) or not lineas:
+        raise ValueError('La venta debe tener al menos una línea.')
+    required = {}
+    for linea in lineas:
+        if not isinstance(linea, dict):
+            raise ValueError('Línea inválida.')
+        pid = int(linea['producto'])
+        qty = int(linea['cantidad'])
+        if qty <= 0:
+            raise ValueError('La cantidad debe ser mayor que cero.')
+        required[pid] = required.get(pid, 0) + qty
+    return required
+
+
+def _fecha_hora(valor):
+    if not valor:
+        return None
+    fecha = parse_datetime(str(valor))
+    if fecha is None:
+        raise ValueError('fecha_hora inválida.')
+    return timezone.make_aware(fecha) if timezone.is_naive(fecha) else fecha
+
+
+def procesar_venta(datos):
+    """Registra una venta enviada por un cliente y devuelve su resultado.
+
+    ``estado`` es ``ok``, ``duplicada`` (la clave ya se había usado),
+    ``stock_insuficiente`` o ``invalida``.
+    """
+    clave = str(datos.get('clave') or '').strip() if isinstance(datos, dict) else ''
+    try:
+        if not clave or len(clave) > 64:
+            raise ValueError('Se requiere una clave de hasta 64 caracteres.')
+        vendedor_id = int(datos['vendedor'])
+        required = _lineas(datos.get('lineas'))
+        fecha_hora = _fecha_hora(datos.get('fecha_hora'))
+    except KeyError as exc:
+        return {'clave': clave, 'estado': 'invalida', 'error': f'Falta el campo {exc.args[0]}.'}
+    except (TypeError, ValueError) as exc:
+        return {'clave': clave, 'estado': 'invalida', 'error': str(exc)}
+
+    try:
+        venta_id, nueva = escritor.ejecutar(registrar_venta_idempotente, clave, vendedor_id, required, fecha_hora)
+    except StockInsuficiente as exc:
+        return {
+            'clave': clave,
+            'estado': 'stock_insuficiente',
+            'faltantes': [
+                {'producto': i['id'], 'disponible': i['disponible'], 'requerido': i['requerido']}
+                for i in exc.insuficientes
+            ],
+        }
+    except ValueError as exc:
+        return {'clave': clave, 'estado': 'invalida', 'error': str(exc)}
+    except IntegrityError:
+        return {'clave': clave, 'estado': 'invalida', 'error': 'Vendedor o producto inexistente.'}
+    return {'clave': clave, 'estado': 'ok' if nueva else 'duplicada', 'venta': venta_id}
+
+
+@csrf_exempt
+@require_POST
+def api_ventas(request):
+    try:
+        datos = leer_json(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    ventas = datos['ventas'] if isinstance(datos, dict) and 'ventas' in datos else [datos]
+    if not isinstance(ventas, list) or not ventas:
+        return JsonResponse({'error': 'No se enviaron ventas.'}, status=400)
+    if len(ventas) > MAX_VENTAS_POR_PETICION:
+        return JsonResponse({'error': f'Máximo {MAX_VENTAS_POR_PETICION} ventas por petición.'}, status=400)
+
+    # cada venta es independiente: una con stock insuficiente no anula las demás
+    return JsonResponse({'resultados': [procesar_venta(v) for v in ventas]})
+
+
+@csrf_exempt
+@require_POST
+def api_sincronizar_ventas(request):
+    """Aplica en orden un lote de tickets offline dentro de una sola transacción.
+
+    Cada ticket usa un savepoint: los que tienen conflicto (stock insuficiente,
+    datos inválidos) se deshacen y se informan sin afectar al resto; los que
+    ya se habían sincronizado se devuelven como ``duplicada``. Si aun así el
+    commit del lote falla (una restricción que SQLite sólo comprueba al
+    confirmar), no quedó nada aplicado y se repite ticket por ticket, cada
+    uno en su transacción: la cola del navegador no queda trabada por un
+    ticket inválido.
+    """
+    try:
+        datos = leer_json(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    tickets = datos.get('ventas') if isinstance(datos, dict) else None
+    if not isinstance(tickets, list) or not tickets:
+        return JsonResponse({'error': 'No se enviaron tickets.'}, status=400)
+    if len(tickets) > MAX_TICKETS_POR_LOTE:
+        return JsonResponse({'error': f'Máximo {MAX_TICKETS_POR_LOTE} tickets por lote.'}, status=400)
+
+    try:
+        with transaction.atomic():
+            resultados = [procesar_venta(t) for t in tickets]
+    except IntegrityError:
+        resultados = [procesar_venta(t) for t in tickets]
+    return JsonResponse({'resultados': resultados})
+
+
+@require_GET
+@cache_control(no_cache=True)
+@etag(lambda request: catalogo.etag())
+def api_catalogo(request):
+    # no_cache: el navegador guarda la respuesta pero la revalida siempre (304 si no cambió)
+    return HttpResponse(catalogo.contenido(), content_type='application/json; charset=utf-8')
+
+
+@require_GET
+def api_buscar(request):
+    try:
+        resultados = busqueda.buscar(
+            request.GET.get('tipo', 'productos'), request.GET.get('q', ''),
+            request.GET.get('limite', busqueda.LIMITE), request.GET.get('clase') or None,
+        )
+    except KeyError:
+        return JsonResponse({'error': f"tipo debe ser uno de: {', '.join(busqueda.TIPOS)}."}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'limite inválido.'}, status=400)
+    return JsonResponse({'resultados': resultados})
+
+
+def _plan_json(resultado):
+    return {
+        'factible': resultado['factible'],
+        'faltantes': [
+            {'insumo': i['id'], 'nombre': i['nombre'], 'disponible': i['disponible'], 'requerido': float(i['requerido'])}
+            for i in resultado['faltantes']
+        ],
+        'consumo': [
+            {'insumo': i['id'], 'nombre': i['nombre'], 'disponible': float(i['disponible']),
+             'requerido': float(i['requerido']), 'restante': float(i['restante'])}
+            for i in resultado['consumo']
+        ],
+    }
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def api_planificador(request):
+    if request.method == 'GET':
+        return JsonResponse({'productos': [
+            {
+                'id': fila['id'],
+                'nombre': fila['nombre'],
+                'maximo': fila['maximo'],
+                'limitante': fila['limitante'] and {
+                    'id': fila['limitante']['id'],
+                    'nombre': fila['limitante']['nombre'],
+                    'stock': float(fila['limitante']['stock']),
+                    'uso': float(fila['limitante']['uso']),
+                },
+            }
+            for fila in planificador.capacidad()
+        ]})
+
+    try:
+        datos = leer_json(request)
+        plan = _lineas(datos.get('plan') if isinstance(datos, dict) else None)
+        return JsonResponse(_plan_json(planificador.evaluar(plan)))
+    except KeyError as exc:
+        return JsonResponse({'error': f'Falta el campo {exc.args[0]}.'}, status=400)
+    except (TypeError, ValueError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
@@ -0,0 +1,247 @@
+"""
+Archivo de ventas antiguas en bases SQLite por año.
+
+``archivar(anio)`` mueve las filas de ``Venta`` y ``DetalleVenta`` de un año
+cerrado a ``ARCHIVO_DIR/ventas-AAAA.sqlite3`` (``ATTACH`` sobre la conexión
+principal) y las borra de la base principal, que conserva los acumulados de
+``VentaDiaria`` y así sigue siendo pequeña. El movimiento se hace en dos
+commits (copiar con ``INSERT OR IGNORE``, verificar, borrar), de modo que si
+se interrumpe basta con volver a ejecutarlo.
+
+Para leer lo archivado:
+
+- ``consultar(sql, params, desde, hasta)`` ejecuta ``sql`` en cada año del
+  rango con una conexión de sólo lectura; en ella ``Venta`` y ``DetalleVenta``
+  son las del archivo y la base principal está adjunta como ``principal``
+  (nombres de productos y vendedores);
+- ``filas_ventas`` (exportaciones) y ``unidades_por_producto`` (conciliación)
+  están construidas sobre ``consultar``;
+- ``adjuntos()`` adjunta todos los años a la conexión de Django para
+  sentencias ``INSERT ... SELECT`` (reconstrucción del libro de inventario).
+
+Sólo funciona con el motor SQLite.
+"""
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .fechas import rango_dias
+
+PATRON = re.compile(r'^ventas-(\d{4})\.sqlite3$')
+
+ESQUEMA = [
+    'CREATE TABLE IF NOT EXISTS {esquema}."Venta" ('
+    '"id" integer NOT NULL PRIMARY KEY, "vendedor_id" integer NOT NULL, "fecha_hora" datetime NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS {esquema}."DetalleVenta" ('
+    '"id" integer NOT NULL PRIMARY KEY, "venta_id" integer NOT NULL, "producto_id" integer NOT NULL, '
+    '"cantidad" integer NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS {esquema}."venta_fecha_hora" ON "Venta" ("fecha_hora", "id")',
+    'CREATE INDEX IF NOT EXISTS {esquema}."detalleventa_venta" ON "DetalleVenta" ("venta_id")',
+]
+
+
+class ArchivoError(Exception):
+    pass
+
+
+def _comprobar_sqlite():
+    if connection.vendor != 'sqlite':
+        raise ArchivoError('El archivo de ventas sólo está disponible con SQLite.')
+
+
+def ruta(anio):
+    return os.path.join(settings.ARCHIVO_DIR, f'ventas-{anio}.sqlite3')
+
+
+def anios():
+    """Años archivados, en orden."""
+    try:
+        nombres = os.listdir(settings.ARCHIVO_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(int(m.group(1)) for m in map(PATRON.match, nombres) if m)
+
+
+def _texto(valor):
+    # mismo formato en que el backend de SQLite guarda los datetime (UTC, sin zona)
+    return valor.astimezone(dt_timezone.utc).replace(tzinfo=None).isoformat(' ')
+
+
+def _fecha(texto):
+    return datetime.fromisoformat(texto).replace(tzinfo=dt_timezone.utc)
+
+
+def _dinero(valor):
+    return None if valor is None else Decimal(str(valor)).quantize(Decimal('0.01'))
+
+
+def _esquema(anio):
+    return f'archivo_{anio}'
+
+
+def archivar(anio):
+    """Mueve las ventas de ``anio`` a su base de archivo y devuelve (ventas, detalles) movidos.
+
+    ``VentaDiaria`` debe estar al día para ese año antes de llamar (el
+    comando ``archivar_ventas`` lo recalcula). Las claves de idempotencia
+    (``VentaCliente``) de esas ventas se descartan.
+    """
+    _comprobar_sqlite()
+    if anio >= timezone.localdate().year:
+        raise ArchivoError(f'El año {anio} no está cerrado.')
+    os.makedirs(settings.ARCHIVO_DIR, exist_ok=True)
+    inicio, fin = rango_dias(date(anio, 1, 1), date(anio, 12, 31))
+    rango = [_texto(inicio), _texto(fin)]
+    esquema = _esquema(anio)
+    en_rango = 'SELECT "id" FROM main."Venta" WHERE "fecha_hora" >= %s AND "fecha_hora" < %s'
+
+    # ATTACH y VACUUM no se pueden ejecutar dentro de una transacción
+    with connection.cursor() as cursor:
+        cursor.execute(f'ATTACH DATABASE %s AS {esquema}', [ruta(anio)])
+        try:
+            with transaction.atomic():
+                for sentencia in ESQUEMA:
+                    cursor.execute(sentencia.format(esquema=esquema))
+                cursor.execute(
+                    f'INSERT OR IGNORE INTO {esquema}."Venta" ("id", "vendedor_id", "fecha_hora") '
+                    f'SELECT "id", "vendedor_id", "fecha_hora" FROM main."Venta" '
+                    f'WHERE "fecha_hora" >= %s AND "fecha_hora" < %s', rango,
+                )
+                cursor.execute(
+                    f'INSERT OR IGNORE INTO {esquema}."DetalleVenta" ("id", "venta_id", "producto_id", "cantidad") '
+                    f'SELECT "id", "venta_id", "producto_id", "cantidad" FROM main."DetalleVenta" '
+                    f'WHERE "venta_id" IN ({en_rango})', rango,
+                )
+
+            with transaction.atomic():
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM main."DetalleVenta" d WHERE d."venta_id" IN ({en_rango}) '
+                    f'AND NOT EXISTS (SELECT 1 FROM {esquema}."DetalleVenta" a WHERE a."id" = d."id")', rango,
+                )
+                if cursor.fetchone()[0]:
+                    raise ArchivoError(f'La copia de {anio} está incompleta; no se borró nada.')
+                cursor.execute(f'DELETE FROM main."VentaCliente" WHERE "venta_id" IN ({en_rango})', rango)
+                cursor.execute(f'DELETE FROM main."DetalleVenta" WHERE "venta_id" IN ({en_rango})', rango)
+                detalles = cursor.rowcount
+                cursor.execute(f'DELETE FROM main."Venta" WHERE "id" IN ({en_rango})', rango)
+                ventas = cursor.rowcount
+            cursor.execute(f'VACUUM {esquema}')
+        finally:
+            cursor.execute(f'DETACH DATABASE {esquema}')
+    return ventas, detalles
+
+
+def compactar():
+    """VACUUM de la base principal para devolver al sistema el espacio liberado."""
+    _comprobar_sqlite()
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+
+
+@contextmanager
+def adjuntos():
+    """Adjunta todos los años a la conexión de Django; devuelve la lista de esquemas.
+
+    Debe usarse fuera de ``transaction.atomic()`` (SQLite no permite ATTACH
+    dentro de una transacción); las transacciones se abren dentro. Con otro
+    motor no adjunta nada.
+    """
+    esquemas = []
+    if connection.vendor != 'sqlite':
+        yield esquemas
+        return
+    with connection.cursor() as cursor:
+        try:
+            for anio in anios():
+                esquema = _esquema(anio)
+                cursor.execute(f'ATTACH DATABASE %s AS {esquema}', [ruta(anio)])
+                esquemas.append(esquema)
+            yield esquemas
+        finally:
+            for esquema in esquemas:
+                cursor.execute(f'DETACH DATABASE {esquema}')
+
+
+def _solo_lectura(camino):
+    return f'file:{os.path.abspath(camino)}?mode=ro'
+
+
+def consultar(sql, params=(), desde=None, hasta=None):
+    """Ejecuta ``sql`` en cada año archivado que toca [desde, hasta] y genera sus filas.
+
+    Cada año usa su propia conexión de sólo lectura (no afecta a la conexión
+    de Django ni a sus transacciones) y se recorren en orden cronológico.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    principal = _solo_lectura(settings.DATABASES['default']['NAME'])
+    for anio in anios():
+        if (desde and anio < desde.year) or (hasta and anio > hasta.year):
+            continue
+        conexion = sqlite3.connect(_solo_lectura(ruta(anio)), uri=True)
+        try:
+            conexion.execute('ATTACH DATABASE ? AS principal', [principal])
+            yield from conexion.execute(sql, params)
+        finally:
+            conexion.close()
+
+
+def _filtro_fechas(desde, hasta):
+    inicio, fin = rango_dias(desde, hasta)
+    condiciones, params = [], []
+    if inicio:
+        condiciones.append('v."fecha_hora" >= ?')
+        params.append(_texto(inicio))
+    if fin:
+        condiciones.append('v."fecha_hora" < ?')
+        params.append(_texto(fin))
+    return (' WHERE ' + ' AND '.join(condiciones)) if condiciones else '', params
+
+
+def filas_ventas(desde=None, hasta=None):
+    """Líneas de venta archivadas en [desde, hasta] con las columnas del libro de ventas.
+
+    (fecha_hora, venta_id, vendedor, producto, cantidad, precio_venta, total),
+    con el precio actual del producto como en el libro de la base principal.
+    """
+    donde, params = _filtro_fechas(desde, hasta)
+    sql = (
+        'SELECT v."fecha_hora", v."id", ve."nombre", p."nombre", d."cantidad", p."precio_venta", '
+        'd."cantidad" * p."precio_venta" '
+        'FROM "DetalleVenta" d INNER JOIN "Venta" v ON v."id" = d."venta_id" '
+        'LEFT JOIN principal."Vendedor" ve ON ve."id" = v."vendedor_id" '
+        'LEFT JOIN principal."Producto" p ON p."id" = d."producto_id"'
+        f'{donde} ORDER BY v."fecha_hora", d."id"'
+    )
+    for fecha, venta, vendedor, producto, cantidad, precio, total in consultar(sql, params, desde, hasta):
+        yield (_fecha(fecha), venta, vendedor, producto, cantidad, _dinero(precio), _dinero(total))
+
+
+def unidades_por_producto():
+    """{producto_id: unidades vendidas} sumando todos los años archivados."""
+    total = {}
+    sql = 'SELECT "producto_id", SUM("cantidad") FROM "DetalleVenta" GROUP BY "producto_id"'
+    for pid, unidades in consultar(sql):
+        total[pid] = total.get(pid, 0) + unidades
+    return total
+
+
+def resumen():
+    """[(anio, ventas, detalles, bytes)] de cada año archivado."""
+    filas = []
+    for anio in anios():
+        conexion = sqlite3.connect(_solo_lectura(ruta(anio)), uri=True)
+        try:
+            ventas = conexion.execute('SELECT COUNT(*) FROM "Venta"').fetchone()[0]
+            detalles = conexion.execute('SELECT COUNT(*) FROM "DetalleVenta"').fetchone()[0]
+        finally:
+            conexion.close()
+        filas.append((anio, ventas, detalles, os.path.getsize(ruta(anio))))
+    return filas
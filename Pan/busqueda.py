@@ -0,0 +1,137 @@
+"""
+Búsqueda por nombre de productos, insumos y proveedores para los selectores.
+
+``/api/buscar/?tipo=productos&q=pan dul`` devuelve los primeros resultados
+para autocompletar, en lugar de mandar el catálogo entero a cada formulario.
+
+En SQLite se usa el índice FTS5 ``BusquedaNombre`` (migración 0005) con el
+tokenizador ``unicode61 remove_diacritics 2``: no distingue mayúsculas ni
+acentos ("azucar" encuentra "Azúcar") y cada palabra de la consulta se busca
+como prefijo ("pan dul" encuentra "Pan Dulce"); los prefijos de 2 y 3 letras
+tienen su propio índice. El ``rowid`` de cada fila es ``id * 4 + código`` del
+tipo, así que actualizar o quitar un artículo es un acceso por clave.
+
+Las señales (``signals.py``) mantienen el índice al guardar o borrar; las
+cargas con ``bulk_create``/``bulk_update`` del nombre deben llamar a
+``reconstruir`` (también ``manage.py indice_busqueda``). Con otro motor se
+busca con ``icontains`` sobre cada palabra.
+"""
+import re
+
+from django.db import connection
+
+from .models import Insumo, Producto, Proveedor
+
+TABLA = 'BusquedaNombre'
+# tipo -> (código en el rowid, modelo, columna de la clase que filtra ``clase``)
+TIPOS = {
+    'productos': (1, Producto, 'tipo_producto'),
+    'insumos': (2, Insumo, None),
+    'proveedores': (3, Proveedor, 'tipo_proveedor'),
+}
+CODIGOS = {modelo: codigo for codigo, modelo, _ in TIPOS.values()}
+# columnas que devuelve ``buscar`` además de id y nombre
+CAMPOS = {
+    'productos': {'tipo': 'tipo_producto', 'precio': 'precio_venta'},
+    'insumos': {},
+    'proveedores': {'tipo': 'tipo_proveedor'},
+}
+LIMITE = 20
+MAX_LIMITE = 50
+MAX_PALABRAS = 8
+
+
+def _fts():
+    return connection.vendor == 'sqlite'
+
+
+def palabras(texto):
+    return re.findall(r'\w+', texto or '')[:MAX_PALABRAS]
+
+
+def consulta_fts(texto):
+    """Expresión MATCH con cada palabra como prefijo: 'pan dul' -> '"pan"* "dul"*'."""
+    return ' '.join(f'"{p}"*' for p in palabras(texto))
+
+
+def indexar(modelo, pk, nombre):
+    """Agrega o reemplaza el nombre del artículo en el índice."""
+    if not _fts():
+        return
+    rowid = pk * 4 + CODIGOS[modelo]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{TABLA}" WHERE rowid = %s', [rowid])
+        cursor.execute(f'INSERT INTO "{TABLA}" (rowid, nombre) VALUES (%s, %s)', [rowid, nombre or ''])
+
+
+def quitar(modelo, pk):
+    if not _fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{TABLA}" WHERE rowid = %s', [pk * 4 + CODIGOS[modelo]])
+
+
+def reconstruir():
+    """Vuelve a llenar el índice desde las tablas (tras cargas masivas). Devuelve las filas indexadas."""
+    if not _fts():
+        return 0
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{TABLA}"')
+        for codigo, modelo, _ in TIPOS.values():
+            cursor.execute(
+                f'INSERT INTO "{TABLA}" (rowid, nombre) '
+                f'SELECT "id" * 4 + {codigo}, COALESCE("nombre", \'\') FROM "{modelo._meta.db_table}"'
+            )
+            total += cursor.rowcount
+        # fusiona los segmentos del índice en uno: menos páginas por consulta
+        cursor.execute(f'INSERT INTO "{TABLA}" ("{TABLA}") VALUES (\'optimize\')')
+    return total
+
+
+def _ids_fts(tipo, texto, limite, clase):
+    codigo, modelo, columna_clase = TIPOS[tipo]
+    filtro, params = '', [consulta_fts(texto), codigo]
+    if clase and columna_clase:
+        filtro = f' AND t."{columna_clase}" = %s'
+        params.append(clase)
+    params.append(limite)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT t."id" FROM "{TABLA}" b INNER JOIN "{modelo._meta.db_table}" t ON t."id" = b.rowid / 4 '
+            f'WHERE "{TABLA}" MATCH %s AND b.rowid %% 4 = %s{filtro} ORDER BY b.rank, t."nombre" LIMIT %s',
+            params,
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def _ids_orm(tipo, texto, limite, clase):
+    _, modelo, columna_clase = TIPOS[tipo]
+    qs = modelo.objects.all()
+    for palabra in palabras(texto):
+        qs = qs.filter(nombre__icontains=palabra)
+    if clase and columna_clase:
+        qs = qs.filter(**{columna_clase: clase})
+    return list(qs.order_by('nombre').values_list('id', flat=True)[:limite])
+
+
+def buscar(tipo, texto, limite=LIMITE, clase=None):
+    """Los primeros ``limite`` artículos de ``tipo`` cuyo nombre coincide con ``texto``.
+
+    ``clase`` filtra por ``tipo_producto`` o ``tipo_proveedor``. Devuelve una
+    lista de dicts con ``id``, ``nombre`` y los campos de ``CAMPOS[tipo]``,
+    los más relevantes primero. Lanza ``KeyError`` si ``tipo`` no existe.
+    """
+    if tipo not in TIPOS:
+        raise KeyError(tipo)
+    if not palabras(texto):
+        return []
+    limite = max(1, min(int(limite), MAX_LIMITE))
+    ids = (_ids_fts if _fts() else _ids_orm)(tipo, texto, limite, clase)
+    campos = CAMPOS[tipo]
+    filas = TIPOS[tipo][1].objects.filter(pk__in=ids).values('id', 'nombre', *campos.values())
+    por_id = {f['id']: f for f in filas}
+    return [
+        {'id': pk, 'nombre': por_id[pk]['nombre'], **{k: por_id[pk][c] for k, c in campos.items()}}
+        for pk in ids if pk in por_id
+    ]
@@ -0,0 +1,83 @@
+"""
+Caché del contexto del dashboard.
+
+Cada rango (``Hoy``, ``7``) se guarda bajo una clave que incluye el día y una
+"generación". Las escrituras (ventas, compras, producción) incrementan la
+generación al confirmar su transacción, con lo que todas las entradas
+anteriores dejan de usarse sin tener que borrarlas una por una. La caché
+usada es el alias ``dashboard`` de ``CACHES``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+CLAVE_GENERACION = 'generacion'
+CLAVE_ACIERTOS = 'aciertos'
+CLAVE_FALLOS = 'fallos'
+
+
+def _cache():
+    return caches['dashboard']
+
+
+def _contar(cache, clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 1, timeout=None)
+
+
+def _generacion(cache):
+    generacion = cache.get(CLAVE_GENERACION)
+    if generacion is None:
+        # valor nuevo en cada arranque o expulsión: nunca reutiliza claves viejas
+        cache.add(CLAVE_GENERACION, int(time.time() * 1000), timeout=None)
+        generacion = cache.get(CLAVE_GENERACION)
+    return generacion
+
+
+def clave(rango, dia):
+    """Clave de ``rango``/``dia`` en la generación actual.
+
+    Se obtiene antes de calcular: si una escritura invalida la caché mientras
+    tanto, el resultado se guarda bajo la generación vieja y nunca se sirve.
+    """
+    return f'{_generacion(_cache())}:{rango}:{dia.isoformat()}'
+
+
+def consultar(clave):
+    """Devuelve el contexto guardado bajo ``clave`` o ``None`` (y cuenta el acierto/fallo)."""
+    cache = _cache()
+    datos = cache.get(clave)
+    _contar(cache, CLAVE_FALLOS if datos is None else CLAVE_ACIERTOS)
+    return datos
+
+
+def guardar(clave, datos):
+    _cache().set(clave, datos, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+
+
+def invalidar():
+    """Invalida todas las entradas del dashboard (se llama tras cada escritura)."""
+    cache = _cache()
+    try:
+        cache.incr(CLAVE_GENERACION)
+    except ValueError:
+        cache.add(CLAVE_GENERACION, int(time.time() * 1000), timeout=None)
+
+
+def estadisticas():
+    cache = _cache()
+    aciertos = cache.get(CLAVE_ACIERTOS, 0)
+    fallos = cache.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': aciertos / total if total else 0.0,
+    }
+
+
+def reiniciar_estadisticas():
+    _cache().delete_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
@@ -0,0 +1,256 @@
+"""
+Prueba de carga de ventas y producción a través de las vistas reales.
+
+Un grupo de vendedores y panaderos simulados (hilos o procesos) envía
+peticiones a ``/ventas/`` (formulario), ``/api/ventas/`` (JSON con clave de
+idempotencia, a veces reenviada) y ``/produccion/`` con el cliente de pruebas
+de Django: recorren middleware, vistas, escritor y transacciones igual que en
+producción, sin servidor ni servicios externos. Todos compiten por unos pocos
+panes y por los insumos de sus recetas.
+
+Al terminar, ``verificar`` contrasta el stock final con lo que quedó escrito:
+
+- productos: inicial - vendido (``DetalleVenta``) + producido (``Produccion``);
+- insumos: inicial - consumo de los lotes nuevos según su receta;
+- el libro de inventario: la suma de los movimientos nuevos es la variación
+  de stock de cada artículo;
+- ningún stock negativo y tantas filas creadas como peticiones confirmadas.
+
+Cualquier diferencia es una actualización perdida, una venta de más o una
+escritura fantasma. Modifica datos: úsese sobre una copia de la base o con
+``restaurar``.
+"""
+import random
+import time
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, FloatField, Sum
+from django.db.models.functions import Cast
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache_dashboard, inventario, planificador
+from .models import (
+    DetalleVenta, Insumo, MovimientoInventario, Produccion, Producto, ProductoInsumo, Vendedor, Venta, VentaCliente,
+)
+from .rollup import reconstruir
+
+CENTAVOS = Decimal('0.01')
+# operaciones simuladas; los resultados y latencias se agrupan por estas claves
+VENTA_FORMULARIO = 'venta'
+VENTA_API = 'venta_api'
+PRODUCCION = 'produccion'
+
+
+def _host():
+    # el cliente de pruebas usa 'testserver', que ALLOWED_HOSTS rechaza fuera de los tests
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+class Escenario:
+    """Artículos en juego y marcas (últimos ids) para separar lo que escribe la prueba."""
+
+    def __init__(self, productos=5):
+        self.productos = list(
+            Producto.objects.filter(tipo_producto='PAN', productoinsumo__cantidad_utilizada__gt=0)
+            .distinct().order_by('id').values_list('id', flat=True)[:productos]
+        )
+        self.vendedores = list(Vendedor.objects.order_by('id').values_list('id', flat=True)[:20])
+        self.insumos = sorted(set(
+            ProductoInsumo.objects.filter(producto_id__in=self.productos).values_list('insumo_id', flat=True)
+        ))
+        self.stock_original = self._stock()
+        self.marcas = {
+            modelo: modelo.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            for modelo in (Venta, Produccion, MovimientoInventario)
+        }
+        # desde dónde se cuenta el libro en ``verificar``: después de los ajustes de ``fijar_stock``
+        self.inicio_libro = self.marcas[MovimientoInventario]
+
+    def _stock(self):
+        # valor guardado sin redondear a 2 decimales: redondear inicial y final por separado
+        # puede inventar (u ocultar) una diferencia de un centavo
+        return {
+            modelo: {pk: Decimal(repr(stock)) for pk, stock in modelo.objects.filter(pk__in=ids).annotate(
+                exacto=Cast('stock', FloatField())).values_list('id', 'exacto')}
+            for modelo, ids in ((Producto, self.productos), (Insumo, self.insumos))
+        }
+
+    def fijar_stock(self, productos=None, insumos=None):
+        """Fija el stock inicial (para forzar que se agote durante la prueba) y lo toma como punto de partida.
+
+        El cambio queda en el libro como ``AJUSTE``; ``restaurar`` lo borra junto con lo demás.
+        """
+        ajustes = []
+        if productos is not None:
+            ajustes += inventario.fijar(inventario.PRODUCTO, {pk: productos for pk in self.productos})
+        if insumos is not None:
+            ajustes += inventario.fijar(inventario.INSUMO, {pk: insumos for pk in self.insumos})
+            transaction.on_commit(planificador.invalidar_stock)
+        if ajustes:
+            self.inicio_libro = MovimientoInventario.objects.order_by('-id').values_list('id', flat=True).first()
+        self.stock_inicial = self._stock()
+
+    def restaurar(self):
+        """Borra lo escrito por la prueba y devuelve el stock original."""
+        ventas = Venta.objects.filter(id__gt=self.marcas[Venta])
+        with transaction.atomic():
+            VentaCliente.objects.filter(venta__in=ventas).delete()
+            DetalleVenta.objects.filter(venta__in=ventas).delete()
+            ventas.delete()
+            Produccion.objects.filter(id__gt=self.marcas[Produccion]).delete()
+            MovimientoInventario.objects.filter(id__gt=self.marcas[MovimientoInventario]).delete()
+            for modelo, stock in self.stock_original.items():
+                objs = list(modelo.objects.filter(pk__in=stock))
+                for obj in objs:
+                    obj.stock = stock[obj.pk]
+                modelo.objects.bulk_update(objs, ['stock'])
+            hoy = timezone.localdate()
+            reconstruir(hoy, hoy)
+            transaction.on_commit(cache_dashboard.invalidar)
+            transaction.on_commit(planificador.invalidar_stock)
+
+
+def _resultado_formulario(respuesta):
+    # las vistas de formulario redirigen si registran y vuelven a mostrar la página con el error si no
+    if respuesta.status_code == 302:
+        return 'ok'
+    if respuesta.status_code == 200:
+        return 'rechazada'
+    return 'error'
+
+
+def trabajador(rol, n, semilla, escenario, opciones):
+    """Ejecuta ``n`` operaciones de ``rol`` ('vendedor' o 'panadero') y devuelve sus resultados.
+
+    Es una función de módulo para poder lanzarla en otro proceso. El
+    resultado es un dict con ``conteos`` {operacion: {estado: n}},
+    ``latencias`` {operacion: [ms]}, ``lineas`` (líneas de producción
+    confirmadas) y los primeros ``errores``.
+    """
+    rnd = random.Random(semilla)
+    cliente = Client(HTTP_HOST=_host(), raise_request_exception=True)
+    conteos = defaultdict(lambda: defaultdict(int))
+    latencias = defaultdict(list)
+    errores, lineas_producidas = [], 0
+    urls = {VENTA_FORMULARIO: reverse('ventas'), VENTA_API: reverse('api_ventas'), PRODUCCION: reverse('produccion')}
+    try:
+        for _ in range(n):
+            elegidos = rnd.sample(escenario.productos, rnd.randint(1, min(opciones['lineas'], len(escenario.productos))))
+            if rol == 'panadero':
+                operacion = PRODUCCION
+                cantidades = [rnd.randint(1, opciones['lote']) for _ in elegidos]
+                datos = {'producto_id': elegidos, 'cantidad': cantidades}
+            else:
+                operacion = VENTA_API if rnd.random() < opciones['api'] else VENTA_FORMULARIO
+                cantidades = [rnd.randint(1, 3) for _ in elegidos]
+                vendedor = rnd.choice(escenario.vendedores)
+                datos = {'vendedor': vendedor, 'producto_id': elegidos, 'cantidad': cantidades}
+                if operacion == VENTA_API:
+                    datos = {
+                        'clave': uuid.uuid4().hex, 'vendedor': vendedor,
+                        'lineas': [{'producto': p, 'cantidad': c} for p, c in zip(elegidos, cantidades)],
+                    }
+
+            envios = 2 if operacion == VENTA_API and rnd.random() < opciones['reintentos'] else 1
+            for _ in range(envios):
+                inicio = time.perf_counter()
+                try:
+                    if operacion == VENTA_API:
+                        respuesta = cliente.post(urls[operacion], datos, content_type='application/json')
+                        estado = respuesta.json()['resultados'][0]['estado'] if respuesta.status_code == 200 else 'error'
+                        estado = 'rechazada' if estado == 'stock_insuficiente' else estado
+                    else:
+                        respuesta = cliente.post(urls[operacion], datos)
+                        estado = _resultado_formulario(respuesta)
+                except Exception as exc:
+                    estado = 'error'
+                    if len(errores) < 5:
+                        errores.append(f'{operacion}: {type(exc).__name__}: {exc}')
+                latencias[operacion].append((time.perf_counter() - inicio) * 1000)
+                conteos[operacion][estado] += 1
+                if operacion == PRODUCCION and estado == 'ok':
+                    lineas_producidas += len(elegidos)
+    finally:
+        connections.close_all()
+    return {
+        'conteos': {op: dict(c) for op, c in conteos.items()},
+        'latencias': dict(latencias),
+        'lineas': lineas_producidas,
+        'errores': errores,
+    }
+
+
+def combinar(resultados):
+    total = {'conteos': defaultdict(lambda: defaultdict(int)), 'latencias': defaultdict(list), 'lineas': 0, 'errores': []}
+    for r in resultados:
+        for op, conteo in r['conteos'].items():
+            for estado, n in conteo.items():
+                total['conteos'][op][estado] += n
+        for op, valores in r['latencias'].items():
+            total['latencias'][op].extend(valores)
+        total['lineas'] += r['lineas']
+        total['errores'].extend(r['errores'])
+    return total
+
+
+def _diferencia(a, b):
+    return abs(Decimal(a or 0) - Decimal(b or 0)) >= CENTAVOS / 2
+
+
+def verificar(escenario, total):
+    """Contrasta el stock final con las filas escritas; devuelve la lista de inconsistencias."""
+    ventas = Venta.objects.filter(id__gt=escenario.marcas[Venta])
+    producciones = Produccion.objects.filter(id__gt=escenario.marcas[Produccion])
+    vendido = dict(DetalleVenta.objects.filter(venta__in=ventas).values('producto_id').annotate(
+        t=Sum('cantidad')).values_list('producto_id', 't'))
+    producido = dict(producciones.values('producto_id').annotate(t=Sum('cantidad')).values_list('producto_id', 't'))
+    consumido = dict(producciones.filter(producto__productoinsumo__cantidad_utilizada__gt=0).values(
+        insumo_id=F('producto__productoinsumo__insumo_id')
+    ).annotate(t=Sum(F('cantidad') * F('producto__productoinsumo__cantidad_utilizada'))).values_list('insumo_id', 't'))
+    libro = {
+        (tipo, pk): t for tipo, pk, t in MovimientoInventario.objects.filter(
+            id__gt=escenario.inicio_libro
+        ).values('tipo', 'articulo_id').annotate(t=Sum('cantidad')).values_list('tipo', 'articulo_id', 't')
+    }
+    final = escenario._stock()
+    inconsistencias = []
+
+    for modelo, tipo, esperado_de in (
+        (Producto, 'PRODUCTO', lambda pk: -Decimal(vendido.get(pk, 0)) + Decimal(producido.get(pk, 0))),
+        (Insumo, 'INSUMO', lambda pk: -Decimal(consumido.get(pk) or 0)),
+    ):
+        nombre = modelo.__name__.lower()
+        for pk, inicial in escenario.stock_inicial[modelo].items():
+            actual = Decimal(final[modelo][pk] or 0)
+            variacion = actual - Decimal(inicial or 0)
+            esperado = esperado_de(pk)
+            if _diferencia(variacion, esperado):
+                inconsistencias.append(
+                    f'{nombre} {pk}: varió {variacion.quantize(CENTAVOS)}, las filas escritas dicen {esperado.quantize(CENTAVOS)}'
+                )
+            if _diferencia(variacion, libro.get((tipo, pk))):
+                inconsistencias.append(
+                    f'{nombre} {pk}: varió {variacion.quantize(CENTAVOS)}, el libro de inventario dice {libro.get((tipo, pk), 0)}'
+                )
+            if actual < 0:
+                inconsistencias.append(f'{nombre} {pk}: stock negativo ({actual})')
+
+    conteos = total['conteos']
+    confirmadas = conteos[VENTA_FORMULARIO].get('ok', 0) + conteos[VENTA_API].get('ok', 0)
+    if ventas.count() != confirmadas:
+        inconsistencias.append(f'{ventas.count()} ventas creadas pero {confirmadas} confirmadas')
+    claves = VentaCliente.objects.filter(venta__in=ventas).count()
+    if claves != conteos[VENTA_API].get('ok', 0):
+        inconsistencias.append(f"{claves} claves de idempotencia pero {conteos[VENTA_API].get('ok', 0)} ventas por API")
+    if producciones.count() != total['lineas']:
+        inconsistencias.append(f"{producciones.count()} lotes creados pero {total['lineas']} líneas confirmadas")
+    return inconsistencias
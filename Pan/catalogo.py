@@ -0,0 +1,83 @@
+"""
+Catálogo de productos, insumos, proveedores y vendedores para los selectores
+de ventas y compras, servido como JSON en ``/api/catalogo/``.
+
+El JSON se genera una vez por "versión" y se guarda serializado en la caché
+``default``. La versión se incrementa cuando se guarda o borra cualquiera de
+esos modelos (ver ``signals.py``) y forma el ETag de la respuesta: el
+navegador revalida con ``If-None-Match`` y sólo descarga el catálogo cuando
+cambió. El stock no forma parte del catálogo, así que las ventas, compras y
+producción (que lo modifican con UPDATE) no lo invalidan.
+"""
+import json
+import time
+
+from django.core.cache import caches
+
+from .models import Producto, Insumo, Proveedor, Vendedor
+
+CLAVE_VERSION = 'catalogo:version'
+# el contenido de una versión no cambia; el timeout sólo libera versiones viejas
+TIMEOUT_CONTENIDO = 24 * 60 * 60
+
+
+def _cache():
+    return caches['default']
+
+
+def version():
+    cache = _cache()
+    actual = cache.get(CLAVE_VERSION)
+    if actual is None:
+        # valor nuevo en cada arranque o expulsión: nunca reutiliza un ETag viejo
+        cache.add(CLAVE_VERSION, int(time.time() * 1000), timeout=None)
+        actual = cache.get(CLAVE_VERSION)
+    return actual
+
+
+def invalidar():
+    """Publica una nueva versión del catálogo (se llama al confirmar cambios)."""
+    cache = _cache()
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, int(time.time() * 1000), timeout=None)
+
+
+def etag():
+    return f'"catalogo-{version()}"'
+
+
+def _construir(numero):
+    return json.dumps({
+        'version': numero,
+        'productos': [
+            {'id': pk, 'nombre': nombre, 'tipo': tipo, 'precio': str(precio)}
+            for pk, nombre, tipo, precio in
+            Producto.objects.order_by('nombre').values_list('id', 'nombre', 'tipo_producto', 'precio_venta')
+        ],
+        'insumos': [
+            {'id': pk, 'nombre': nombre}
+            for pk, nombre in Insumo.objects.order_by('nombre').values_list('id', 'nombre')
+        ],
+        'proveedores': [
+            {'id': pk, 'nombre': nombre, 'tipo': tipo}
+            for pk, nombre, tipo in Proveedor.objects.order_by('nombre').values_list('id', 'nombre', 'tipo_proveedor')
+        ],
+        'vendedores': [
+            {'id': pk, 'nombre': nombre}
+            for pk, nombre in Vendedor.objects.order_by('nombre').values_list('id', 'nombre')
+        ],
+    }, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def contenido():
+    """Devuelve el JSON (bytes) de la versión actual, generándolo si hace falta."""
+    cache = _cache()
+    numero = version()
+    clave = f'catalogo:{numero}'
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _construir(numero)
+        cache.set(clave, datos, timeout=TIMEOUT_CONTENIDO)
+    return datos
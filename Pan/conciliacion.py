@@ -0,0 +1,138 @@
+"""
+Conciliación del stock con el historial de compras, producción y ventas.
+
+El stock esperado de cada artículo se recalcula en la base de datos con una
+consulta agrupada por origen, a partir de su saldo inicial (``SaldoInicial``):
+
+- productos: saldo + compras (``ProductoProveedor``) + producción - ventas (``DetalleVenta``);
+- insumos: saldo + compras (``CompraInsumo``) - consumo de la producción, obtenido
+  multiplicando cada lote por su receta (``ProductoInsumo``) en el mismo JOIN.
+
+El saldo inicial es el stock con que se dio de alta el artículo (señal en
+``signals.py``). En una base con historial anterior a esta tabla se fija una
+vez con ``fijar_saldos`` (``conciliar_stock --saldo-inicial``), que toma el
+stock actual como correcto: debe hacerse tras un recuento físico.
+
+El consumo usa las recetas actuales: si una receta cambió, los lotes
+anteriores aparecen como desvío aunque el stock se descontara bien en su día.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import archivo, inventario, planificador
+from .models import CompraInsumo, DetalleVenta, Produccion, ProductoInsumo, ProductoProveedor, SaldoInicial
+
+CENTAVOS = Decimal('0.01')
+
+
+def _sumar(esperado, filas, signo=1):
+    for pk, total in filas:
+        esperado[pk] = esperado.get(pk, Decimal('0')) + signo * Decimal(total or 0)
+
+
+def _saldos(tipo):
+    return dict(SaldoInicial.objects.filter(tipo=tipo).values_list('articulo_id', 'cantidad'))
+
+
+def esperado_productos():
+    """{producto_id: stock esperado} en cuatro consultas agrupadas (más una por año archivado)."""
+    esperado = {}
+    _sumar(esperado, _saldos(inventario.PRODUCTO).items())
+    _sumar(esperado, ProductoProveedor.objects.values('producto_id').annotate(t=Sum('cantidad')).values_list('producto_id', 't'))
+    _sumar(esperado, Produccion.objects.values('producto_id').annotate(t=Sum('cantidad')).values_list('producto_id', 't'))
+    _sumar(esperado, DetalleVenta.objects.values('producto_id').annotate(t=Sum('cantidad')).values_list('producto_id', 't'), -1)
+    _sumar(esperado, archivo.unidades_por_producto().items(), -1)
+    return esperado
+
+
+def esperado_insumos():
+    """{insumo_id: stock esperado} en tres consultas agrupadas."""
+    esperado = {}
+    _sumar(esperado, _saldos(inventario.INSUMO).items())
+    _sumar(esperado, CompraInsumo.objects.values('insumo_id').annotate(t=Sum('cantidad')).values_list('insumo_id', 't'))
+    consumo = ProductoInsumo.objects.filter(cantidad_utilizada__gt=0).values('insumo_id').annotate(
+        t=Sum(F('cantidad_utilizada') * F('producto__produccion__cantidad'))
+    ).values_list('insumo_id', 't')
+    _sumar(esperado, consumo, -1)
+    return esperado
+
+
+ESPERADO = {
+    inventario.PRODUCTO: esperado_productos,
+    inventario.INSUMO: esperado_insumos,
+}
+
+
+def desvios(tipo, tolerancia=Decimal('0')):
+    """Artículos de ``tipo`` cuyo stock difiere del esperado en más de ``tolerancia``.
+
+    Devuelve una lista de dicts (``id``, ``nombre``, ``stock``, ``esperado``,
+    ``diferencia`` = stock - esperado) ordenada por diferencia absoluta.
+    """
+    esperado = ESPERADO[tipo]()
+    resultado = []
+    for pk, nombre, stock in inventario.MODELOS[tipo].objects.values_list('pk', 'nombre', 'stock'):
+        actual = Decimal(stock or 0).quantize(CENTAVOS)
+        previsto = esperado.get(pk, Decimal('0')).quantize(CENTAVOS)
+        if abs(actual - previsto) > tolerancia:
+            resultado.append({
+                'id': pk, 'nombre': nombre, 'stock': actual, 'esperado': previsto, 'diferencia': actual - previsto,
+            })
+    resultado.sort(key=lambda d: abs(d['diferencia']), reverse=True)
+    return resultado
+
+
+def reparar(tipo, tolerancia=Decimal('0')):
+    """Lleva el stock de ``tipo`` al esperado y devuelve los desvíos corregidos.
+
+    El cálculo y la corrección van en una transacción (con el bloqueo de
+    escritura tomado al empezar no se cuela ninguna venta entre ambos): un
+    ``bulk_update`` del stock y los movimientos ``AJUSTE`` correspondientes en
+    el libro de inventario. Si algún esperado es negativo (falta el saldo
+    inicial o el historial está incompleto) lanza ``ValueError`` sin tocar nada.
+    """
+    with transaction.atomic():
+        corregir = desvios(tipo, tolerancia)
+        if not corregir:
+            return []
+        negativos = [d['id'] for d in corregir if d['esperado'] < 0]
+        if negativos:
+            raise ValueError(
+                f"Stock esperado negativo para {len(negativos)} artículos de {tipo} "
+                f"({', '.join(map(str, negativos[:10]))}): revise el saldo inicial antes de reparar."
+            )
+        modelo = inventario.MODELOS[tipo]
+        modelo.objects.bulk_update(
+            [modelo(pk=d['id'], stock=d['esperado']) for d in corregir], ['stock'], batch_size=500
+        )
+        ahora = timezone.now()
+        inventario.registrar([
+            inventario.movimiento(tipo, d['id'], -d['diferencia'], 'AJUSTE', None, ahora) for d in corregir
+        ])
+        if tipo == inventario.INSUMO:
+            transaction.on_commit(planificador.invalidar_stock)
+    return corregir
+
+
+def fijar_saldos(tipo):
+    """Registra como saldo inicial ``stock - historial`` de los artículos de ``tipo`` que no lo tienen.
+
+    Para la puesta en marcha de una base con historial anterior a
+    ``SaldoInicial``: da por bueno el stock actual de esos artículos. Devuelve
+    el número de saldos creados.
+    """
+    with transaction.atomic():
+        con_saldo = set(SaldoInicial.objects.filter(tipo=tipo).values_list('articulo_id', flat=True))
+        historial = ESPERADO[tipo]()
+        ahora = timezone.now()
+        saldos = [
+            SaldoInicial(
+                tipo=tipo, articulo_id=pk, fecha=ahora,
+                cantidad=(Decimal(stock or 0) - historial.get(pk, Decimal('0'))).quantize(CENTAVOS),
+            )
+            for pk, stock in inventario.MODELOS[tipo].objects.values_list('pk', 'stock') if pk not in con_saldo
+        ]
+        return len(SaldoInicial.objects.bulk_create(saldos, batch_size=1000))
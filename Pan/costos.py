@@ -0,0 +1,130 @@
+"""
+Costes de insumos y productos.
+
+- Compras: cada línea de ``CompraInsumo``/``ProductoProveedor`` actualiza el
+  coste promedio ponderado del artículo en el mismo UPDATE que suma el stock
+  (``stock.registrar_compra``): ``(stock * coste + cantidad * precio) / (stock + cantidad)``.
+  No se relee el historial de compras.
+- Recetas: el ``costo`` de los productos ``PAN`` es la suma de
+  ``cantidad_utilizada * Insumo.coste`` de su receta. ``recalcular_recetas``
+  lo actualiza con un UPDATE sólo para los productos que usan los insumos
+  cuyo coste cambió (o cuya receta se editó, aunque se haya quedado vacía).
+- ``margenes`` arma el informe de márgenes con esos costes ya calculados y
+  los acumulados de ``VentaDiaria``.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .models import CompraInsumo, Insumo, Producto, ProductoInsumo, ProductoProveedor, VentaDiaria
+
+CENTAVOS = Decimal('0.01')
+# modelo -> nombre de su columna de coste
+CAMPO_COSTE = {Insumo: 'coste', Producto: 'costo'}
+
+
+def _por_id(valores):
+    return Case(
+        *[When(pk=pk, then=Value(Decimal(v))) for pk, v in valores.items()],
+        output_field=DecimalField(max_digits=18, decimal_places=4),
+    )
+
+
+def promedio_ponderado(modelo, cantidades, importes):
+    """Expresión del nuevo coste promedio de ``modelo`` tras sumar una compra.
+
+    ``cantidades`` e ``importes`` son {id: cantidad comprada} y {id: cantidad
+    * precio}. Debe usarse en el mismo ``update()`` que suma el stock: SQL
+    evalúa ambas columnas con los valores anteriores. Con stock cero o
+    negativo el coste pasa a ser el de la compra.
+    """
+    campo = CAMPO_COSTE[modelo]
+    cantidad, importe = _por_id(cantidades), _por_id(importes)
+    return Round(Case(
+        When(stock__gt=0, then=(F('stock') * F(campo) + importe) / (F('stock') + cantidad)),
+        default=importe / cantidad,
+        output_field=DecimalField(max_digits=18, decimal_places=4),
+    ), 2)
+
+
+def _coste_receta():
+    return Subquery(
+        ProductoInsumo.objects.filter(producto_id=OuterRef('pk')).values('producto_id').annotate(
+            total=Sum(F('cantidad_utilizada') * F('insumo__coste'))
+        ).values('total')
+    )
+
+
+def recalcular_recetas(insumo_ids=None, producto_ids=None):
+    """Recalcula el ``costo`` de los productos ``PAN`` afectados en un UPDATE.
+
+    Afectados son los que usan alguno de ``insumo_ids`` más todos los de
+    ``producto_ids``, tengan o no receta: a un producto al que se le quitó la
+    última línea le queda costo 0. Sin ninguno de los dos, todos los que
+    tienen receta. Devuelve el número de productos actualizados.
+    """
+    if insumo_ids is None and producto_ids is None:
+        afectados = Q(pk__in=ProductoInsumo.objects.values('producto_id'))
+    else:
+        afectados = Q(pk__in=[pk for pk in producto_ids or () if pk is not None])
+        if insumo_ids:
+            afectados |= Q(pk__in=ProductoInsumo.objects.filter(insumo_id__in=list(insumo_ids)).values('producto_id'))
+    return Producto.objects.filter(afectados, tipo_producto='PAN').update(costo=Round(
+        Coalesce(_coste_receta(), Value(Decimal('0')), output_field=DecimalField(max_digits=18, decimal_places=4)), 2
+    ))
+
+
+def promedios_historicos():
+    """Asigna a insumos y bebidas el precio medio de todas sus compras (puesta en marcha).
+
+    Es la única operación que recorre el historial; a partir de ahí el
+    promedio se mantiene con cada compra. Devuelve (insumos, productos) actualizados.
+    """
+    resultado = []
+    for modelo, compras, campo_fk in ((Insumo, CompraInsumo, 'insumo_id'), (Producto, ProductoProveedor, 'producto_id')):
+        medio = compras.objects.filter(**{campo_fk: OuterRef('pk')}).values(campo_fk).annotate(
+            valor=Sum(F('cantidad') * F('precio_unitario')) / Sum('cantidad')
+        ).values('valor')
+        campo = CAMPO_COSTE[modelo]
+        resultado.append(modelo.objects.filter(
+            pk__in=compras.objects.filter(cantidad__gt=0).values(campo_fk)
+        ).update(**{campo: Round(Subquery(medio), 2)}))
+    return tuple(resultado)
+
+
+def margenes(dias=30, hoy=None):
+    """Margen por producto en los últimos ``dias`` días según el coste actual.
+
+    Una consulta agrupada sobre ``VentaDiaria``; devuelve una lista de dicts
+    ordenada por margen total, con ``unidades``, ``ingresos``, ``costo``
+    (unitario), ``coste_total``, ``margen`` y ``margen_pct``.
+    """
+    hoy = hoy or timezone.localdate()
+    filas = VentaDiaria.objects.filter(dia__gt=hoy - timedelta(days=dias), dia__lte=hoy).values(
+        'producto_id', 'producto__nombre', 'producto__tipo_producto', 'producto__precio_venta', 'producto__costo',
+    ).annotate(
+        unidades=Sum('unidades'), ingresos=Coalesce(Sum('ingresos'), Value(Decimal('0')), output_field=DecimalField())
+    ).order_by()
+    informe = []
+    for f in filas:
+        costo = Decimal(f['producto__costo'] or 0)
+        ingresos = Decimal(f['ingresos']).quantize(CENTAVOS)
+        coste_total = costo * f['unidades']
+        margen = ingresos - coste_total
+        informe.append({
+            'id': f['producto_id'],
+            'nombre': f['producto__nombre'],
+            'tipo': f['producto__tipo_producto'],
+            'precio': f['producto__precio_venta'],
+            'costo': costo,
+            'unidades': f['unidades'],
+            'ingresos': ingresos,
+            'coste_total': coste_total,
+            'margen': margen,
+            'margen_pct': (margen / ingresos * 100).quantize(Decimal('0.1')) if ingresos else None,
+        })
+    informe.sort(key=lambda d: d['margen'], reverse=True)
+    return informe
@@ -0,0 +1,253 @@
+"""
+Cifras del dashboard, divididas en secciones independientes.
+
+Cada sección es una función síncrona que hace sus propias consultas y
+devuelve su parte del contexto. ``datos_concurrentes`` (vista asíncrona,
+ASGI) las lanza a la vez en hilos con su propia conexión y espera cada una
+como máximo ``DASHBOARD_TIMEOUT_SECCION`` segundos. Una sección que tarda más
+o falla se sustituye por sus valores vacíos y se informa en
+``no_disponibles`` para que la plantilla muestre un aviso en su lugar. Las
+consultas de esos hilos se suman a la instrumentación de la petición
+(``instrumentacion.heredar``).
+
+``delta_venta`` y ``delta_inventario`` arman los eventos pequeños que se
+envían a las pantallas abiertas tras cada escritura (``eventos.py``).
+"""
+import asyncio
+import json
+import logging
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from . import instrumentacion, pronostico
+from .models import DetalleVenta, Insumo, PronosticoInsumo, VentaDiaria
+
+logger = logging.getLogger(__name__)
+
+
+def _rango_qs(rango, today):
+    # Todas las cifras de ventas salen de los acumulados diarios (VentaDiaria)
+    if rango == '7':
+        return VentaDiaria.objects.filter(dia__gte=today - timedelta(days=6))
+    return VentaDiaria.objects.filter(dia=today)
+
+
+def _totales(rango, today):
+    agg = _rango_qs(rango, today).aggregate(ingresos_total=Sum('ingresos'), unidades_vendidas=Sum('unidades'))
+    return {
+        'ingresos_total': agg['ingresos_total'] or Decimal('0.00'),
+        'unidades_vendidas': agg['unidades_vendidas'] or 0,
+    }
+
+
+def _serie(rango, today):
+    start_7 = today - timedelta(days=6)
+    diarios_qs = VentaDiaria.objects.filter(dia__gte=start_7).values('dia').annotate(
+        ingreso_dia=Sum('ingresos')
+    ).order_by('dia')
+    diarios_map = {item['dia']: (item['ingreso_dia'] or Decimal('0.00')) for item in diarios_qs}
+
+    labels = []
+    values = []
+    for i in range(7):
+        d = start_7 + timedelta(days=i)
+        labels.append(d.strftime('%Y-%m-%d'))
+        values.append(float(diarios_map.get(d, Decimal('0.00'))))
+    return {
+        'ingresos_last7_total': sum(values),
+        'sales_chart_labels_json': json.dumps(labels),
+        'sales_chart_values_json': json.dumps(values),
+    }
+
+
+def _top(rango, today):
+    top_qs = _rango_qs(rango, today).values('producto__id', 'producto__nombre').annotate(
+        total_vendidos=Sum('unidades')
+    ).order_by('-total_vendidos')[:4]
+    return {
+        'top_sellers': [
+            {'producto_id': it['producto__id'], 'nombre': it['producto__nombre'], 'vendidos': it['total_vendidos'] or 0}
+            for it in top_qs
+        ],
+    }
+
+
+def _bajo_stock(rango, today):
+    # insumos bajo su punto de reorden (pronostico.py); sin pronóstico calculado,
+    # el umbral fijo de siempre
+    if PronosticoInsumo.objects.exists():
+        qs = pronostico.por_reponer()
+        items = [
+            {'id': p.insumo_id, 'nombre': p.nombre, 'stock': p.stock, 'dias_cobertura': p.dias_cobertura}
+            for p in qs[:4]
+        ]
+    else:
+        qs = Insumo.objects.filter(stock__lt=Decimal('10')).order_by('stock')
+        items = [{'id': i.id, 'nombre': i.nombre, 'stock': i.stock, 'dias_cobertura': None} for i in qs[:4]]
+    return {
+        'low_stock_count': qs.count(),
+        'low_stock_items': items,
+    }
+
+
+def _vendedores(rango, today):
+    ventas_vendedores_qs = VentaDiaria.objects.filter(dia=today).values(
+        'vendedor__id', 'vendedor__nombre'
+    ).annotate(
+        total_unidades=Sum('unidades'),
+        ingreso_total=Sum('ingresos')
+    ).order_by('-ingreso_total')
+    return {
+        'ventas_vendedores_hoy': [
+            {
+                'vendedor_id': it.get('vendedor__id'),
+                'vendedor': it.get('vendedor__nombre') or '',
+                'unidades': it.get('total_unidades') or 0,
+                'ingreso': it.get('ingreso_total') or Decimal('0.00'),
+            }
+            for it in ventas_vendedores_qs
+        ],
+    }
+
+
+# nombre -> (función, valores cuando la sección no está disponible)
+SECCIONES = {
+    'totales': (_totales, {'ingresos_total': None, 'unidades_vendidas': None}),
+    'serie': (_serie, {'ingresos_last7_total': None, 'sales_chart_labels_json': '[]', 'sales_chart_values_json': '[]'}),
+    'top': (_top, {'top_sellers': []}),
+    'bajo_stock': (_bajo_stock, {'low_stock_count': None, 'low_stock_items': []}),
+    'vendedores': (_vendedores, {'ventas_vendedores_hoy': []}),
+}
+
+
+class _Ejecucion:
+    """Conexión que usa una sección mientras corre en un hilo del pool.
+
+    El hilo vuelve al pool y atiende otras tareas: sólo se interrumpe su
+    conexión mientras sigue corriendo la sección que se pasó de tiempo.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conexion = None
+        self.abandonada = False
+
+    def interrumpir(self):
+        with self.lock:
+            self.abandonada = True
+            conexion = self.conexion
+            # SQLite permite cancelar la consulta en curso desde otro hilo
+            if conexion is not None and conexion.vendor == 'sqlite' and conexion.connection is not None:
+                conexion.connection.interrupt()
+
+
+def _en_hilo(funcion, rango, today, ejecucion):
+    with ejecucion.lock:
+        if ejecucion.abandonada:
+            # se pasó de tiempo antes de llegar a un hilo libre
+            return None
+        ejecucion.conexion = connections[DEFAULT_DB_ALIAS]
+    try:
+        with instrumentacion.heredar():
+            return funcion(rango, today)
+    finally:
+        with ejecucion.lock:
+            ejecucion.conexion = None
+        close_old_connections()
+
+
+async def _seccion(nombre, rango, today, timeout):
+    funcion, vacio = SECCIONES[nombre]
+    ejecucion = _Ejecucion()
+    try:
+        return True, await asyncio.wait_for(
+            sync_to_async(_en_hilo, thread_sensitive=False)(funcion, rango, today, ejecucion), timeout
+        )
+    except asyncio.TimeoutError:
+        logger.warning('Dashboard: la sección %s superó %.1f s', nombre, timeout)
+        ejecucion.interrumpir()
+    except Exception:
+        logger.exception('Dashboard: falló la sección %s', nombre)
+    return False, vacio
+
+
+async def datos_concurrentes(rango, today):
+    """Contexto completo del dashboard, con las secciones en paralelo y con tiempo límite.
+
+    Devuelve ``(context, completo)``; ``completo`` es False si alguna sección
+    quedó sin datos (ese contexto no debe guardarse en caché).
+    """
+    timeout = settings.DASHBOARD_TIMEOUT_SECCION
+    resultados = await asyncio.gather(*(_seccion(nombre, rango, today, timeout) for nombre in SECCIONES))
+    context = {'no_disponibles': []}
+    for nombre, (ok, parte) in zip(SECCIONES, resultados):
+        context.update(parte)
+        if not ok:
+            context['no_disponibles'].append(nombre)
+    return context, not context['no_disponibles']
+
+
+# --- eventos en vivo (ver eventos.py) ---
+
+def delta_venta(venta_id):
+    """Evento ``venta``: importes de la venta y totales actuales de sus productos.
+
+    Los totales por producto (hoy y últimos 7 días) son absolutos, así la
+    pantalla puede reordenar su top sin conocer el resto del catálogo.
+    """
+    hoy = timezone.localdate()
+    lineas = list(DetalleVenta.objects.filter(venta_id=venta_id).values(
+        'venta__fecha_hora', 'venta__vendedor_id', 'venta__vendedor__nombre',
+        'producto_id', 'producto__nombre', 'producto__precio_venta', 'cantidad',
+    ))
+    if not lineas:
+        return {'tipo': 'resincronizar'}
+    totales = {
+        fila['producto_id']: fila for fila in VentaDiaria.objects.filter(
+            producto_id__in=[l['producto_id'] for l in lineas], dia__gte=hoy - timedelta(days=6)
+        ).values('producto_id').annotate(hoy=Sum('unidades', filter=Q(dia=hoy)), semana=Sum('unidades'))
+    }
+    primera = lineas[0]
+    return {
+        'tipo': 'venta',
+        'hoy': hoy,
+        'dia': timezone.localdate(primera['venta__fecha_hora']),
+        'vendedor': {'id': primera['venta__vendedor_id'], 'nombre': primera['venta__vendedor__nombre']},
+        'ingresos': float(sum(l['cantidad'] * l['producto__precio_venta'] for l in lineas)),
+        'unidades': sum(l['cantidad'] for l in lineas),
+        'productos': [
+            {
+                'id': l['producto_id'],
+                'nombre': l['producto__nombre'],
+                'hoy': totales.get(l['producto_id'], {}).get('hoy') or 0,
+                'semana': totales.get(l['producto_id'], {}).get('semana') or 0,
+            }
+            for l in lineas
+        ],
+    }
+
+
+def delta_inventario():
+    """Evento ``inventario``: conteo y lista de insumos con bajo stock."""
+    parte = _bajo_stock(None, None)
+    return {
+        'tipo': 'inventario',
+        'hoy': timezone.localdate(),
+        'bajo_stock_total': parte['low_stock_count'],
+        'bajo_stock': [
+            {
+                'id': i['id'],
+                'nombre': i['nombre'],
+                'stock': float(i['stock']),
+                'dias': None if i['dias_cobertura'] is None else round(float(i['dias_cobertura']), 1),
+            }
+            for i in parte['low_stock_items']
+        ],
+    }
@@ -0,0 +1,113 @@
+"""
+Cola de escritura única para SQLite (activar con SQLITE_ESCRITOR_UNICO=1).
+
+SQLite admite un solo escritor a la vez y cada commit cuesta una escritura a
+disco. Con el escritor único, las mutaciones de stock de todos los hilos del
+proceso se encolan a un hilo que las aplica por lotes: cada una dentro de su
+propio savepoint (si falla, sólo ella se deshace) y todas en el mismo commit.
+Quien encola espera el resultado, así que para las vistas la llamada sigue
+siendo síncrona y las excepciones (``StockInsuficiente``, ``ValueError``) se
+propagan igual que sin cola.
+
+Un savepoint no ve las claves foráneas, que SQLite comprueba recién en el
+commit: si el commit del lote falla no quedó nada aplicado y cada mutación
+se repite en su propia transacción, así el error queda sólo en la que lo
+causó (``Pan.stock`` además valida vendedor y proveedor antes de escribir).
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+# segundos que una petición espera a que el escritor aplique su mutación
+ESPERA_MAXIMA = 30
+
+_cola = queue.Queue()
+_hilo = None
+_lock = threading.Lock()
+
+
+def ejecutar(funcion, *args, **kwargs):
+    """Ejecuta ``funcion(*args, **kwargs)`` (una mutación de ``Pan.stock``).
+
+    Sin escritor único, o si ya hay una transacción abierta en este hilo (el
+    lote de sincronización, por ejemplo), se llama directamente.
+    """
+    if not settings.SQLITE_ESCRITOR_UNICO or connection.in_atomic_block:
+        return funcion(*args, **kwargs)
+    futuro = Future()
+    _iniciar()
+    _cola.put((futuro, funcion, args, kwargs))
+    try:
+        return futuro.result(timeout=ESPERA_MAXIMA)
+    except TimeoutError:
+        # si sigue en la cola se cancela y el escritor la descarta; si ya se está
+        # aplicando se espera su resultado: no se informa como fallida una venta que se registra
+        if futuro.cancel():
+            raise
+        return futuro.result()
+
+
+def _iniciar():
+    global _hilo
+    with _lock:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_bucle, name='escritor-sqlite', daemon=True)
+            _hilo.start()
+
+
+def _bucle():
+    while True:
+        trabajos = [_cola.get()]
+        while len(trabajos) < settings.SQLITE_ESCRITOR_LOTE:
+            try:
+                trabajos.append(_cola.get_nowait())
+            except queue.Empty:
+                break
+        _aplicar(trabajos)
+
+
+def _transaccion(trabajos):
+    """Aplica ``trabajos`` en una transacción, cada uno en su savepoint.
+
+    Devuelve [(futuro, resultado, excepción)]; lanza la excepción del commit.
+    """
+    resultados = []
+    with transaction.atomic():
+        for futuro, funcion, args, kwargs in trabajos:
+            try:
+                with transaction.atomic():
+                    resultados.append((futuro, funcion(*args, **kwargs), None))
+            except Exception as exc:
+                resultados.append((futuro, None, exc))
+    return resultados
+
+
+def _aislado(trabajo):
+    try:
+        return _transaccion([trabajo])[0]
+    except Exception as exc:
+        return trabajo[0], None, exc
+
+
+def _aplicar(trabajos):
+    # los cancelados por ``ejecutar`` (su petición ya dejó de esperar) no se aplican
+    trabajos = [t for t in trabajos if t[0].set_running_or_notify_cancel()]
+    try:
+        try:
+            resultados = _transaccion(trabajos)
+        except Exception as exc:
+            # falló el commit del lote: ninguna mutación quedó aplicada
+            if len(trabajos) > 1:
+                resultados = [_aislado(t) for t in trabajos]
+            else:
+                resultados = [(futuro, None, exc) for futuro, *_ in trabajos]
+        for futuro, resultado, exc in resultados:
+            if exc is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(exc)
+    finally:
+        close_old_connections()
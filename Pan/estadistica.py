@@ -0,0 +1,12 @@
+"""
+Percentiles de latencias para los informes de rendimiento.
+
+Lo usan ``benchmark``, la instrumentación de peticiones y las pruebas de
+carga y de estrés, así todas reportan el mismo p95 para los mismos tiempos.
+"""
+
+
+def percentil(valores, p):
+    """El valor de rango más cercano al percentil ``p`` (0-100) de ``valores``; 0 si no hay valores."""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))] if ordenados else 0
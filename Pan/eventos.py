@@ -0,0 +1,221 @@
+"""
+Eventos en vivo para las pantallas del dashboard (Server-Sent Events).
+
+Las escrituras (ventas, compras de insumos, producción) publican al confirmar
+su transacción un evento JSON pequeño con lo que cambió. Cada pantalla
+conectada a ``/dashboard/eventos/`` tiene una ``Suscripcion``: una cola
+acotada que se llena desde cualquier hilo y se consume en el bucle asyncio
+(ASGI) o en el hilo de la petición (WSGI). Entre eventos una pantalla sólo
+cuesta una tarea dormida y un comentario de latido cada ``LATIDO`` segundos.
+
+Con ``EVENTOS_BROKER = 'local'`` los eventos sólo llegan a las pantallas del
+mismo proceso. Con ``'unix'`` cada worker que tiene pantallas abre un socket
+de datagramas en ``EVENTOS_DIR`` y quien publica envía el evento a todos los
+sockets del directorio: un broker local, sin servicios externos, para
+servidores con varios workers en la misma máquina.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# eventos sin leer por pantalla; si se llena se le pide que recargue
+MAX_PENDIENTES = 100
+# segundos entre comentarios de latido (mantienen viva la conexión en proxies)
+LATIDO = 25
+MAX_DATAGRAMA = 64 * 1024
+RESINCRONIZAR = json.dumps({'tipo': 'resincronizar'})
+
+_suscripciones = set()
+_lock = threading.Lock()
+_broker = None
+
+
+class Suscripcion:
+    """Cola de eventos (JSON ya serializado) de una pantalla conectada.
+
+    Con ``loop`` la cola es de asyncio y se alimenta con
+    ``call_soon_threadsafe``; sin él es una ``queue.Queue`` de hilos.
+    """
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.cola = asyncio.Queue(MAX_PENDIENTES) if loop else queue.Queue(MAX_PENDIENTES)
+
+    def _poner(self, datos):
+        try:
+            self.cola.put_nowait(datos)
+        except (asyncio.QueueFull, queue.Full):
+            # la pantalla no consume a tiempo: se descarta lo pendiente y se le pide recargar
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(RESINCRONIZAR)
+
+    def entregar(self, datos):
+        if self.loop is None:
+            self._poner(datos)
+        else:
+            self.loop.call_soon_threadsafe(self._poner, datos)
+
+
+def suscribir(loop=None):
+    suscripcion = Suscripcion(loop)
+    with _lock:
+        _suscripciones.add(suscripcion)
+    if settings.EVENTOS_BROKER == 'unix':
+        _obtener_broker().escuchar()
+    return suscripcion
+
+
+def cancelar(suscripcion):
+    with _lock:
+        _suscripciones.discard(suscripcion)
+
+
+def _distribuir(datos):
+    with _lock:
+        destinos = list(_suscripciones)
+    for suscripcion in destinos:
+        try:
+            suscripcion.entregar(datos)
+        except RuntimeError:
+            # el bucle de esa pantalla ya se cerró
+            cancelar(suscripcion)
+
+
+def hay_pantallas():
+    """True si alguna pantalla (de este proceso o, con el broker, de otro) escucha."""
+    if _suscripciones:
+        return True
+    return settings.EVENTOS_BROKER == 'unix' and _obtener_broker().hay_oyentes()
+
+
+def publicar(evento):
+    datos = json.dumps(evento, cls=DjangoJSONEncoder, ensure_ascii=False)
+    _distribuir(datos)
+    if settings.EVENTOS_BROKER == 'unix':
+        _obtener_broker().enviar(datos)
+
+
+def publicar_delta(construir, *args):
+    """Construye el evento con ``construir(*args)`` y lo publica si alguien escucha.
+
+    Pensado para ``transaction.on_commit``: un fallo aquí no debe afectar a la
+    escritura ya confirmada, así que sólo se registra.
+    """
+    try:
+        if hay_pantallas():
+            publicar(construir(*args))
+    except Exception:
+        logger.exception('No se pudo publicar el evento del dashboard')
+
+
+class _BrokerUnix:
+    def __init__(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.ruta = None
+        self.tx = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.tx.setblocking(False)
+        self.lock = threading.Lock()
+
+    def _sockets(self):
+        try:
+            nombres = os.listdir(self.directorio)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directorio, n) for n in nombres if n.endswith('.sock')]
+
+    def hay_oyentes(self):
+        return any(ruta != self.ruta for ruta in self._sockets())
+
+    def escuchar(self):
+        """Abre (una vez por proceso) el socket por el que llegan los eventos de otros workers."""
+        with self.lock:
+            if self.ruta:
+                return
+            self.ruta = os.path.join(self.directorio, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+            rx = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            rx.bind(self.ruta)
+            atexit.register(self._cerrar)
+        threading.Thread(target=self._recibir, args=(rx,), name='eventos-broker', daemon=True).start()
+
+    def _recibir(self, rx):
+        while True:
+            _distribuir(rx.recv(MAX_DATAGRAMA).decode())
+
+    def enviar(self, datos):
+        mensaje = datos.encode()
+        for ruta in self._sockets():
+            if ruta == self.ruta:
+                continue
+            try:
+                self.tx.sendto(mensaje, ruta)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # worker terminado sin limpiar su socket
+                try:
+                    os.unlink(ruta)
+                except OSError:
+                    pass
+            except OSError as exc:
+                logger.warning('Evento no entregado a %s: %s', ruta, exc)
+
+    def _cerrar(self):
+        try:
+            os.unlink(self.ruta)
+        except OSError:
+            pass
+
+
+def _obtener_broker():
+    global _broker
+    with _lock:
+        if _broker is None:
+            _broker = _BrokerUnix(settings.EVENTOS_DIR)
+        return _broker
+
+
+def _mensaje(datos):
+    return f'data: {datos}\n\n'
+
+
+async def flujo_async():
+    """Flujo SSE para ASGI: una tarea dormida por pantalla entre eventos."""
+    suscripcion = suscribir(asyncio.get_running_loop())
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                datos = await asyncio.wait_for(suscripcion.cola.get(), LATIDO)
+            except asyncio.TimeoutError:
+                yield ': latido\n\n'
+                continue
+            yield _mensaje(datos)
+    finally:
+        cancelar(suscripcion)
+
+
+def flujo_sync():
+    """Flujo SSE para WSGI (p. ej. runserver): ocupa un hilo por pantalla."""
+    suscripcion = suscribir()
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                datos = suscripcion.cola.get(timeout=LATIDO)
+            except queue.Empty:
+                yield ': latido\n\n'
+                continue
+            yield _mensaje(datos)
+    finally:
+        cancelar(suscripcion)
@@ -0,0 +1,141 @@
+"""
+Exportación de los libros de ventas, compras y producción a CSV o XLSX.
+
+Las filas se leen con ``.iterator(chunk_size=...)`` y se escriben a medida que
+llegan, así la memoria no crece con el rango exportado. Los totales de línea
+se calculan en SQL. El XLSX se genera sin dependencias externas (SpreadsheetML
+mínimo dentro de un zip escrito en un archivo temporal).
+"""
+import csv
+import zipfile
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from django.db.models import F, ExpressionWrapper, DecimalField
+from django.utils import timezone
+
+from . import archivo
+from .fechas import filtro_rango
+from .models import DetalleVenta, CompraInsumo, ProductoProveedor, Produccion
+
+TAMANO_LOTE = 2000
+
+
+def _total(a, b):
+    return ExpressionWrapper(F(a) * F(b), output_field=DecimalField(max_digits=18, decimal_places=2))
+
+
+def _ventas():
+    qs = DetalleVenta.objects.annotate(total=_total('cantidad', 'producto__precio_venta'))
+    campos = ['venta__fecha_hora', 'venta_id', 'venta__vendedor__nombre', 'producto__nombre',
+              'cantidad', 'producto__precio_venta', 'total']
+    encabezados = ['fecha', 'venta', 'vendedor', 'producto', 'cantidad', 'precio_venta', 'total']
+    return qs, 'venta__fecha_hora', campos, encabezados
+
+
+def _compras(modelo, articulo):
+    qs = modelo.objects.annotate(total=_total('cantidad', 'precio_unitario'))
+    campos = ['fecha', 'id', 'proveedor__nombre', f'{articulo}__nombre', 'cantidad', 'precio_unitario', 'total']
+    encabezados = ['fecha', 'compra', 'proveedor', articulo, 'cantidad', 'precio_unitario', 'total']
+    return qs, 'fecha', campos, encabezados
+
+
+def _produccion():
+    qs = Produccion.objects.annotate(total=_total('cantidad', 'producto__costo'))
+    campos = ['fecha_hora', 'id', 'producto__nombre', 'cantidad', 'producto__costo', 'total']
+    encabezados = ['fecha', 'produccion', 'producto', 'cantidad', 'costo', 'total']
+    return qs, 'fecha_hora', campos, encabezados
+
+
+LIBROS = {
+    'ventas': _ventas,
+    'compras-insumos': lambda: _compras(CompraInsumo, 'insumo'),
+    'compras-productos': lambda: _compras(ProductoProveedor, 'producto'),
+    'produccion': _produccion,
+}
+
+
+def filas(tipo, desde=None, hasta=None, lote=TAMANO_LOTE):
+    """Genera el encabezado y luego cada fila del libro ``tipo`` en [desde, hasta].
+
+    Las ventas de años archivados (``archivo.py``) salen primero, leídas de su
+    base de archivo.
+    """
+    qs, campo_fecha, campos, encabezados = LIBROS[tipo]()
+    qs = qs.filter(**filtro_rango(campo_fecha, desde, hasta)).order_by(campo_fecha, 'id')
+    yield encabezados
+    archivadas = archivo.filas_ventas(desde, hasta) if tipo == 'ventas' else ()
+    for fila in chain(archivadas, qs.values_list(*campos).iterator(chunk_size=lote)):
+        yield [timezone.localtime(fila[0]).strftime('%Y-%m-%d %H:%M:%S'), *fila[1:]]
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito (para csv.writer en streaming)."""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_stream(filas):
+    writer = csv.writer(_Eco())
+    for fila in filas:
+        yield writer.writerow(fila)
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _celda(valor):
+    if isinstance(valor, (int, float)) or hasattr(valor, 'is_finite'):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(valor if valor is not None else ""))}</t></is></c>'
+
+
+def escribir_xlsx(filas, destino, hoja='Hoja1'):
+    """Escribe ``filas`` como un libro XLSX de una hoja en ``destino`` (archivo o ruta)."""
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _RELS)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(hoja=escape(hoja[:31])))
+        zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for fila in filas:
+                sheet.write(('<row>' + ''.join(_celda(v) for v in fila) + '</row>').encode())
+            sheet.write(b'</sheetData></worksheet>')
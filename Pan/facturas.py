@@ -0,0 +1,90 @@
+"""
+Lectura y validación de líneas de compra (formulario o factura CSV/JSON).
+
+Todas las líneas se validan antes de tocar la base de datos; si alguna es
+inválida se rechaza la compra completa con un ``ValueError`` que indica la
+línea con problemas.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+# tamaño máximo aceptado para una factura subida (bytes)
+MAX_FACTURA_BYTES = 2 * 1024 * 1024
+
+
+def _linea(n, item_id, cantidad, precio):
+    try:
+        item_id = int(item_id)
+    except (TypeError, ValueError):
+        raise ValueError(f'Línea {n}: id de artículo inválido ({item_id!r}).')
+    try:
+        cantidad = Decimal(str(cantidad).strip())
+        precio = Decimal(str(precio).strip()) if precio not in (None, '') else Decimal('0')
+    except InvalidOperation:
+        raise ValueError(f'Línea {n}: cantidad o precio no numérico.')
+    if not cantidad.is_finite() or cantidad <= 0:
+        raise ValueError(f'Línea {n}: la cantidad debe ser mayor que cero.')
+    if not precio.is_finite() or precio < 0:
+        raise ValueError(f'Línea {n}: el precio no puede ser negativo.')
+    return item_id, cantidad, precio
+
+
+def lineas_formulario(ids, cantidades, precios):
+    """Convierte las listas del POST en [(item_id, cantidad, precio)]; omite filas sin id."""
+    lineas = []
+    for i, item_id in enumerate(ids):
+        if not item_id:
+            continue
+        cantidad = cantidades[i] if i < len(cantidades) else ''
+        precio = precios[i] if i < len(precios) else ''
+        lineas.append(_linea(i + 1, item_id, cantidad, precio))
+    return lineas
+
+
+def leer_filas(archivo, maximo, nombre='La factura', clave='lineas'):
+    """Lee un archivo subido CSV o JSON y devuelve sus filas como dicts con claves en minúsculas.
+
+    El JSON puede ser una lista de objetos o un objeto con la lista en
+    ``clave``. ``nombre`` encabeza los mensajes de error.
+    """
+    if archivo.size > maximo:
+        raise ValueError(f'{nombre} es demasiado grande.')
+    try:
+        texto = archivo.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError(f'{nombre} debe estar codificada en UTF-8.')
+
+    if archivo.name.lower().endswith('.json') or texto.lstrip()[:1] in ('[', '{'):
+        try:
+            filas = json.loads(texto)
+        except json.JSONDecodeError:
+            raise ValueError(f'{nombre} JSON no es válida.')
+        if isinstance(filas, dict):
+            filas = filas.get(clave, [])
+        if not isinstance(filas, list) or not all(isinstance(f, dict) for f in filas):
+            raise ValueError(f'{nombre} JSON debe ser una lista de líneas.')
+    else:
+        try:
+            dialecto = csv.Sniffer().sniff(texto[:2048], delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        filas = list(csv.DictReader(io.StringIO(texto), dialect=dialecto))
+    return [{str(k).strip().lower(): v for k, v in fila.items() if k is not None} for fila in filas]
+
+
+def leer_factura(archivo, campo_id):
+    """Lee una factura subida (CSV o JSON) y devuelve [(item_id, cantidad, precio)].
+
+    Columnas/claves aceptadas: ``id`` (o ``campo_id``, p. ej. ``insumo_id``),
+    ``cantidad`` y ``precio_unitario``. El JSON puede ser una lista de objetos o
+    un objeto con la lista en ``lineas``.
+    """
+    lineas = []
+    for n, fila in enumerate(leer_filas(archivo, MAX_FACTURA_BYTES), start=1):
+        item_id = fila.get('id', fila.get(campo_id))
+        lineas.append(_linea(n, item_id, fila.get('cantidad'), fila.get('precio_unitario')))
+    if not lineas:
+        raise ValueError('La factura no contiene líneas.')
+    return lineas
@@ -0,0 +1,36 @@
+"""
+Rangos de fechas semiabiertos [inicio, fin) en la zona horaria local.
+
+Filtrar con ``campo__gte=inicio, campo__lt=fin`` deja la columna sin envolver
+en funciones (a diferencia de ``campo__date=...``), así que SQLite puede
+recorrer el índice de la columna en lugar de la tabla completa.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def inicio_dia(dia):
+    """Medianoche local de ``dia`` como datetime con zona horaria."""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def rango_dias(desde=None, hasta=None):
+    """Devuelve (inicio, fin) para los días [desde, hasta], ambos incluidos.
+
+    Cualquiera de los extremos puede ser ``None`` (rango abierto).
+    """
+    inicio = inicio_dia(desde) if desde else None
+    fin = inicio_dia(hasta + timedelta(days=1)) if hasta else None
+    return inicio, fin
+
+
+def filtro_rango(campo, desde=None, hasta=None):
+    """kwargs de filtro para ``campo`` dentro de los días [desde, hasta]."""
+    inicio, fin = rango_dias(desde, hasta)
+    filtro = {}
+    if inicio:
+        filtro[f'{campo}__gte'] = inicio
+    if fin:
+        filtro[f'{campo}__lt'] = fin
+    return filtro
@@ -0,0 +1,339 @@
+"""
+Importación masiva del catálogo desde CSV o JSON: productos, insumos y recetas.
+
+El archivo se lee completo y se compara en memoria con las filas existentes
+(una consulta por tabla); sólo lo que cambia se escribe, con ``bulk_create``
+y ``bulk_update`` en lotes de ``LOTE`` filas dentro de una transacción. Con
+``simular`` se devuelve el mismo resumen sin escribir nada.
+
+Columnas por tipo (las ausentes o vacías no se modifican):
+
+- ``productos``: ``id`` o ``nombre`` como clave, ``nombre``, ``tipo_producto``,
+  ``precio_venta``, ``costo``;
+- ``insumos``: ``id`` o ``nombre``, ``nombre``, ``coste``;
+- ``recetas``: ``producto`` e ``insumo`` (id o nombre) y ``cantidad_utilizada``
+  (o ``cantidad``). El archivo reemplaza la receta completa de cada producto
+  que aparece en él: las líneas que ya no figuran se borran.
+
+Con ``id`` se actualiza ese artículo (que debe existir); sin ``id`` se busca
+por nombre y, si no existe, se crea. El stock no se importa: lo mueven las
+compras, la producción, las ventas y ``conciliar_stock``. El ``costo`` de los
+panes con receta tampoco: se calcula de la receta (``costos.py``).
+
+Como las operaciones en bloque no emiten señales (el borrado de líneas de
+receta tampoco, para no recalcular costes fila a fila), al aplicar se
+invalidan a mano el catálogo, el índice de búsqueda, las recetas en caché,
+el planificador y el dashboard, y se recalcula una vez el coste de las
+recetas afectadas.
+"""
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import busqueda, cache_dashboard, catalogo, costos, planificador
+from .facturas import leer_filas
+from .models import Insumo, Producto, ProductoInsumo
+from .recetas import invalidar_recetas
+
+LOTE = 500
+# tamaño máximo aceptado para un archivo subido (bytes)
+MAX_IMPORTACION_BYTES = 5 * 1024 * 1024
+TIPOS_PRODUCTO = {valor for valor, _ in Producto._meta.get_field('tipo_producto').choices}
+
+
+class Plan:
+    """Diferencias entre un archivo y la base: qué se crearía, actualizaría y borraría.
+
+    ``actualizar`` es una lista de (objeto ya modificado, {campo: (antes, después)}).
+    """
+
+    def __init__(self, tipo, modelo):
+        self.tipo = tipo
+        self.modelo = modelo
+        self.crear = []
+        self.actualizar = []
+        self.borrar = []
+        self.sin_cambios = 0
+        self.avisos = []
+
+    @property
+    def campos(self):
+        return sorted({campo for _, cambios in self.actualizar for campo in cambios})
+
+    def hay_cambios(self):
+        return bool(self.crear or self.actualizar or self.borrar)
+
+    def resumen(self):
+        return {
+            'crear': len(self.crear),
+            'actualizar': len(self.actualizar),
+            'borrar': len(self.borrar),
+            'sin_cambios': self.sin_cambios,
+        }
+
+    def detalle(self, limite=None):
+        """Líneas legibles con cada cambio (las primeras ``limite``)."""
+        lineas = [f'+ {_describir(obj)}' for obj in self.crear]
+        for obj, cambios in self.actualizar:
+            lineas.append(f'~ {_describir(obj)}: ' + ', '.join(
+                f'{campo} {antes} -> {despues}' for campo, (antes, despues) in sorted(cambios.items())
+            ))
+        lineas += [f'- {_describir(obj)}' for obj in self.borrar]
+        return lineas[:limite] if limite is not None else lineas
+
+
+def _describir(obj):
+    if isinstance(obj, ProductoInsumo):
+        return f'receta {obj.producto_id}: insumo {obj.insumo_id} x {obj.cantidad_utilizada}'
+    return f'{obj._meta.model_name} {obj.pk or "nuevo"} {obj.nombre!r}'
+
+
+def _texto(valor):
+    return str(valor).strip() if valor is not None else ''
+
+
+def _decimal(n, fila, campo):
+    valor = _texto(fila.get(campo))
+    if not valor:
+        return None
+    try:
+        numero = Decimal(valor.replace(',', '.')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Línea {n}: {campo} no numérico ({valor!r}).')
+    if not numero.is_finite() or numero < 0:
+        raise ValueError(f'Línea {n}: {campo} no puede ser negativo.')
+    return numero
+
+
+def _entero(n, valor, campo):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f'Línea {n}: {campo} inválido ({valor!r}).')
+
+
+def _clave_nombre(nombre):
+    # sin distinguir mayúsculas, acentos ni espacios repetidos: "Azúcar  1" == "azucar 1"
+    sin_acentos = ''.join(c for c in unicodedata.normalize('NFKD', nombre) if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.split()).casefold()
+
+
+class _Indice:
+    """Artículos existentes por id y por nombre normalizado (``_clave_nombre``)."""
+
+    def __init__(self, objetos, etiqueta):
+        self.etiqueta = etiqueta
+        self.por_id = {o.pk: o for o in objetos}
+        self.por_nombre, self.repetidos = {}, set()
+        for o in objetos:
+            clave = _clave_nombre(o.nombre or '')
+            if clave in self.por_nombre:
+                self.repetidos.add(clave)
+            self.por_nombre[clave] = o
+
+    def buscar(self, n, ident=None, nombre=None):
+        """El objeto con ``ident`` (debe existir) o ``nombre``; ``None`` si el nombre no existe."""
+        if ident:
+            obj = self.por_id.get(_entero(n, ident, 'id'))
+            if obj is None:
+                raise ValueError(f'Línea {n}: no existe {self.etiqueta} con id {ident}.')
+            return obj
+        clave = _clave_nombre(nombre)
+        if clave in self.repetidos:
+            raise ValueError(f'Línea {n}: hay varios {self.etiqueta}s llamados {nombre!r}; use el id.')
+        return self.por_nombre.get(clave)
+
+
+def _comparar_articulos(plan, filas, campos_decimales, nuevo, validar=None):
+    modelo = plan.modelo
+    indice = _Indice(list(modelo.objects.all()), modelo._meta.model_name)
+    vistos = {}
+    for n, fila in enumerate(filas, start=1):
+        ident, nombre = _texto(fila.get('id')), _texto(fila.get('nombre'))
+        if not ident and not nombre:
+            raise ValueError(f'Línea {n}: falta id o nombre.')
+        if len(nombre) > 100:
+            raise ValueError(f'Línea {n}: el nombre supera los 100 caracteres.')
+        valores = {campo: _decimal(n, fila, campo) for campo in campos_decimales}
+        valores = {campo: valor for campo, valor in valores.items() if valor is not None}
+        if validar:
+            valores.update(validar(n, fila))
+
+        obj = indice.buscar(n, ident, nombre)
+        clave = obj.pk if obj else _clave_nombre(nombre)
+        if clave in vistos:
+            raise ValueError(f'Línea {n}: el mismo artículo ya aparece en la línea {vistos[clave]}.')
+        vistos[clave] = n
+
+        if obj is None:
+            plan.crear.append(nuevo(n, nombre, valores))
+            continue
+        if ident and nombre:
+            valores['nombre'] = nombre
+        cambios = {}
+        for campo, valor in valores.items():
+            actual = getattr(obj, campo)
+            if (Decimal(actual) if isinstance(valor, Decimal) and actual is not None else actual) != valor:
+                cambios[campo] = (actual, valor)
+                setattr(obj, campo, valor)
+        if cambios:
+            plan.actualizar.append((obj, cambios))
+        else:
+            plan.sin_cambios += 1
+
+
+def _comparar_productos(plan, filas):
+    con_receta = set(ProductoInsumo.objects.values_list('producto_id', flat=True).distinct())
+
+    def validar(n, fila):
+        tipo = _texto(fila.get('tipo_producto')).upper()
+        if tipo and tipo not in TIPOS_PRODUCTO:
+            raise ValueError(f"Línea {n}: tipo_producto debe ser {' o '.join(sorted(TIPOS_PRODUCTO))}.")
+        return {'tipo_producto': tipo} if tipo else {}
+
+    def nuevo(n, nombre, valores):
+        if 'tipo_producto' not in valores or 'precio_venta' not in valores:
+            raise ValueError(f'Línea {n}: un producto nuevo necesita tipo_producto y precio_venta.')
+        return Producto(nombre=nombre, stock=0, costo=valores.pop('costo', Decimal('0')), **valores)
+
+    _comparar_articulos(plan, filas, ('precio_venta', 'costo'), nuevo, validar)
+    # el costo de los panes con receta lo calcula costos.recalcular_recetas
+    conservados = []
+    for obj, cambios in plan.actualizar:
+        if 'costo' in cambios and obj.tipo_producto == 'PAN' and obj.pk in con_receta:
+            obj.costo = cambios.pop('costo')[0]
+            plan.avisos.append(f'{_describir(obj)}: el costo se calcula de la receta; se ignora.')
+        if cambios:
+            conservados.append((obj, cambios))
+        else:
+            plan.sin_cambios += 1
+    plan.actualizar = conservados
+
+
+def _comparar_insumos(plan, filas):
+    def nuevo(n, nombre, valores):
+        return Insumo(nombre=nombre, stock=0, coste=valores.get('coste', Decimal('0')))
+
+    _comparar_articulos(plan, filas, ('coste',), nuevo)
+
+
+def _comparar_recetas(plan, filas):
+    productos = _Indice(list(Producto.objects.only('id', 'nombre', 'tipo_producto')), 'producto')
+    insumos = _Indice(list(Insumo.objects.only('id', 'nombre')), 'insumo')
+
+    def resolver(indice, n, valor):
+        valor = _texto(valor)
+        if not valor:
+            raise ValueError(f'Línea {n}: falta {indice.etiqueta}.')
+        obj = indice.buscar(n, valor if valor.isdigit() else None, valor)
+        if obj is None:
+            raise ValueError(f'Línea {n}: no existe {indice.etiqueta} {valor!r}.')
+        return obj
+
+    nuevas, vistos = {}, {}
+    for n, fila in enumerate(filas, start=1):
+        producto = resolver(productos, n, fila.get('producto', fila.get('producto_id')))
+        insumo = resolver(insumos, n, fila.get('insumo', fila.get('insumo_id')))
+        if producto.tipo_producto != 'PAN':
+            raise ValueError(f'Línea {n}: sólo los productos PAN tienen receta ({producto.nombre!r}).')
+        campo = 'cantidad_utilizada' if 'cantidad_utilizada' in fila else 'cantidad'
+        cantidad = _decimal(n, fila, campo)
+        if cantidad is None:
+            raise ValueError(f'Línea {n}: falta cantidad_utilizada.')
+        clave = (producto.pk, insumo.pk)
+        if clave in vistos:
+            raise ValueError(f'Línea {n}: el insumo ya aparece en la receta en la línea {vistos[clave]}.')
+        vistos[clave] = n
+        receta = nuevas.setdefault(producto.pk, {})
+        if cantidad > 0:
+            receta[insumo.pk] = cantidad
+
+    actuales = {}
+    for linea in ProductoInsumo.objects.filter(producto_id__in=list(nuevas)).order_by('id'):
+        actuales.setdefault((linea.producto_id, linea.insumo_id), []).append(linea)
+    for (pid, iid), lineas in actuales.items():
+        cantidad = nuevas[pid].get(iid)
+        if cantidad is None:
+            plan.borrar.extend(lineas)
+            continue
+        primera, sobrantes = lineas[0], lineas[1:]
+        # filas repetidas del mismo insumo: queda una con la cantidad del archivo
+        plan.borrar.extend(sobrantes)
+        if Decimal(primera.cantidad_utilizada) != cantidad:
+            plan.actualizar.append((primera, {'cantidad_utilizada': (primera.cantidad_utilizada, cantidad)}))
+            primera.cantidad_utilizada = cantidad
+        else:
+            plan.sin_cambios += 1
+    for pid, receta in nuevas.items():
+        for iid, cantidad in receta.items():
+            if (pid, iid) not in actuales:
+                plan.crear.append(ProductoInsumo(producto_id=pid, insumo_id=iid, cantidad_utilizada=cantidad))
+
+
+TIPOS = {
+    'productos': (Producto, _comparar_productos),
+    'insumos': (Insumo, _comparar_insumos),
+    'recetas': (ProductoInsumo, _comparar_recetas),
+}
+
+
+def leer(archivo):
+    """Filas (dicts) de un archivo subido CSV o JSON (lista o ``{"filas": [...]}``)."""
+    filas = leer_filas(archivo, MAX_IMPORTACION_BYTES, nombre='La lista', clave='filas')
+    if not filas:
+        raise ValueError('La lista no contiene filas.')
+    return filas
+
+
+def comparar(tipo, filas):
+    """Valida ``filas`` y devuelve el ``Plan`` de cambios sin escribir nada.
+
+    Lanza ``ValueError`` (indicando la línea) ante la primera fila inválida:
+    la importación se aplica completa o no se aplica.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de importación desconocido: {tipo} (use {', '.join(TIPOS)}).")
+    modelo, comparar_tipo = TIPOS[tipo]
+    plan = Plan(tipo, modelo)
+    comparar_tipo(plan, filas)
+    return plan
+
+
+def aplicar(plan):
+    """Escribe el ``plan`` en una transacción y actualiza lo que dependía de esas filas."""
+    if not plan.hay_cambios():
+        return
+    modelo = plan.modelo
+    with transaction.atomic():
+        modelo.objects.bulk_create(plan.crear, batch_size=LOTE)
+        if plan.actualizar:
+            modelo.objects.bulk_update([obj for obj, _ in plan.actualizar], plan.campos, batch_size=LOTE)
+        if plan.borrar:
+            # sin señales post_delete: cada una recalcularía el coste de su receta por separado
+            modelo.objects.filter(pk__in=[obj.pk for obj in plan.borrar])._raw_delete(modelo.objects.db)
+
+        if modelo is ProductoInsumo:
+            productos = {obj.producto_id for obj in plan.crear + plan.borrar}
+            productos |= {obj.producto_id for obj, _ in plan.actualizar}
+            invalidar_recetas(*productos)
+            costos.recalcular_recetas(producto_ids=productos)
+        else:
+            if modelo is Insumo and 'coste' in plan.campos:
+                costos.recalcular_recetas(insumo_ids=[obj.pk for obj, c in plan.actualizar if 'coste' in c])
+            if plan.crear or 'nombre' in plan.campos:
+                busqueda.reconstruir()
+                if modelo is Insumo:
+                    # el stock del planificador se guarda con el nombre de cada insumo
+                    transaction.on_commit(planificador.invalidar_stock)
+            transaction.on_commit(catalogo.invalidar)
+        transaction.on_commit(planificador.invalidar_recetas)
+        transaction.on_commit(cache_dashboard.invalidar)
+
+
+def importar(tipo, filas, simular=False):
+    """Compara ``filas`` con la base y, salvo con ``simular``, aplica los cambios. Devuelve el ``Plan``."""
+    plan = comparar(tipo, filas)
+    if not simular:
+        aplicar(plan)
+    return plan
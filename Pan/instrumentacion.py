@@ -0,0 +1,229 @@
+"""
+Instrumentación opcional por petición (activar con INSTRUMENTACION=1).
+
+Para cada petición guarda, bajo el nombre de la URL de ``Pan/urls.py``: tiempo
+total, tiempo en base de datos, número de consultas, consultas repetidas
+(huellas del SQL con sus parámetros fuera, típicas de un N+1) y tiempo de
+renderizado de plantillas. Los registros van a un buffer circular en memoria
+y se agregan cada ``INSTRUMENTACION_FLUSH_SEGUNDOS`` a un archivo JSONL.
+
+Las consultas se miden con ``connection.execute_wrapper`` y las plantillas con
+el backend ``DjangoTemplatesInstrumentado``, así que no depende de DEBUG y el
+coste por petición es de unos pocos microsegundos por consulta.
+
+``medir_consultas`` deja la medición en el contexto de la petición: el código
+que consulta desde otros hilos (las secciones del dashboard, con
+``sync_to_async``) la aplica a sus propias conexiones con ``heredar``. El
+comando ``benchmark`` cuenta las consultas con el mismo mecanismo.
+"""
+import json
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+from .estadistica import percentil
+
+_actual = ContextVar('instrumentacion_actual', default=None)
+# mediciones activas, para las conexiones de los hilos que trabajan para la petición
+_mediciones = ContextVar('instrumentacion_mediciones', default=())
+_lock = threading.Lock()
+_recientes = deque(maxlen=getattr(settings, 'INSTRUMENTACION_BUFFER', 5000))
+_pendientes = deque(maxlen=getattr(settings, 'INSTRUMENTACION_BUFFER', 5000))
+_ultimo_volcado = time.monotonic()
+
+# huellas repetidas que se guardan por petición
+MAX_DUPLICADAS = 5
+
+
+class _Medicion:
+    __slots__ = ('db_ms', 'consultas', 'sql', 'plantilla_ms', 'lock')
+
+    def __init__(self):
+        self.db_ms = 0.0
+        self.consultas = 0
+        self.sql = Counter()
+        self.plantilla_ms = 0.0
+        # varios hilos pueden sumar a la misma petición (ver ``heredar``)
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.db_ms += (time.perf_counter() - inicio) * 1000
+                self.consultas += 1
+                self.sql[sql] += 1
+
+
+class InstrumentacionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicion = _Medicion()
+        token = _actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with medir_consultas(medicion):
+                response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        duplicadas = [(sql[:300], n) for sql, n in medicion.sql.most_common(MAX_DUPLICADAS) if n > 1]
+        registrar({
+            't': time.time(),
+            'url': match.url_name if match and match.url_name else request.path,
+            'metodo': request.method,
+            'estado': response.status_code,
+            'total_ms': round(total_ms, 3),
+            'db_ms': round(medicion.db_ms, 3),
+            'consultas': medicion.consultas,
+            'plantilla_ms': round(medicion.plantilla_ms, 3),
+            'duplicadas': duplicadas,
+        })
+        return response
+
+
+class _envolver_conexiones:
+    def __init__(self, medicion):
+        self.medicion = medicion
+        self.contextos = []
+
+    def __enter__(self):
+        for conexion in connections.all():
+            ctx = conexion.execute_wrapper(self.medicion)
+            ctx.__enter__()
+            self.contextos.append(ctx)
+
+    def __exit__(self, *exc):
+        for ctx in reversed(self.contextos):
+            ctx.__exit__(*exc)
+
+
+@contextmanager
+def medir_consultas(medicion=None):
+    """Mide las consultas de este hilo y de los que lo hereden; devuelve la medición."""
+    medicion = medicion or _Medicion()
+    token = _mediciones.set(_mediciones.get() + (medicion,))
+    try:
+        with _envolver_conexiones(medicion):
+            yield medicion
+    finally:
+        _mediciones.reset(token)
+
+
+@contextmanager
+def heredar():
+    """En un hilo de trabajo: suma sus consultas a las mediciones del contexto que lo lanzó."""
+    with ExitStack() as pila:
+        for medicion in _mediciones.get():
+            pila.enter_context(_envolver_conexiones(medicion))
+        yield
+
+
+class _PlantillaMedida:
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        medicion = _actual.get()
+        if medicion is None:
+            return self.template.render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            medicion.plantilla_ms += (time.perf_counter() - inicio) * 1000
+
+
+class DjangoTemplatesInstrumentado(DjangoTemplates):
+    """Backend de plantillas de Django que suma el tiempo de render a la petición en curso."""
+
+    def from_string(self, template_code):
+        return _PlantillaMedida(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _PlantillaMedida(super().get_template(template_name))
+
+
+def registrar(registro):
+    global _ultimo_volcado
+    with _lock:
+        _recientes.append(registro)
+        _pendientes.append(registro)
+        intervalo = getattr(settings, 'INSTRUMENTACION_FLUSH_SEGUNDOS', 30)
+        if time.monotonic() - _ultimo_volcado < intervalo:
+            return
+        _ultimo_volcado = time.monotonic()
+        lote = list(_pendientes)
+        _pendientes.clear()
+    volcar(lote)
+
+
+def volcar(lote=None):
+    """Agrega al archivo JSONL los registros pendientes (o ``lote``)."""
+    if lote is None:
+        with _lock:
+            lote = list(_pendientes)
+            _pendientes.clear()
+    archivo = getattr(settings, 'INSTRUMENTACION_ARCHIVO', None)
+    if not lote or not archivo:
+        return
+    with open(archivo, 'a', encoding='utf-8') as f:
+        for registro in lote:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+def recientes():
+    with _lock:
+        return list(_recientes)
+
+
+def leer_archivo(ruta):
+    registros = []
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea:
+                registros.append(json.loads(linea))
+    return registros
+
+
+def resumen(registros):
+    """Agrega los registros por URL: latencias, consultas y huellas más repetidas."""
+    por_url = {}
+    for r in registros:
+        por_url.setdefault(r['url'], []).append(r)
+
+    filas = []
+    for url, items in por_url.items():
+        totales = [r['total_ms'] for r in items]
+        duplicadas = Counter()
+        for r in items:
+            for sql, n in r['duplicadas']:
+                duplicadas[sql] = max(duplicadas[sql], n)
+        filas.append({
+            'url': url,
+            'peticiones': len(items),
+            'p50_ms': round(statistics.median(totales), 2),
+            'p95_ms': round(percentil(totales, 95), 2),
+            'db_ms': round(statistics.fmean(r['db_ms'] for r in items), 2),
+            'plantilla_ms': round(statistics.fmean(r['plantilla_ms'] for r in items), 2),
+            'consultas': round(statistics.fmean(r['consultas'] for r in items), 1),
+            'consultas_max': max(r['consultas'] for r in items),
+            'duplicadas': duplicadas.most_common(MAX_DUPLICADAS),
+        })
+    filas.sort(key=lambda f: f['p95_ms'], reverse=True)
+    return filas
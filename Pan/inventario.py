@@ -0,0 +1,189 @@
+"""
+Libro de movimientos de inventario y fotos periódicas del stock.
+
+Cada venta, compra y producción agrega (en su misma transacción) una fila de
+``MovimientoInventario`` por artículo afectado: tipo, id, cantidad con signo,
+motivo, fila de origen y fecha. ``FotoStock`` guarda el stock de todos los
+artículos en un instante; se toman con ``manage.py inventario --foto``
+(pensado para cron).
+
+El stock en un momento dado se obtiene de la foto más cercana a ese momento
+más (o menos) los movimientos entre ambos, así el rango recorrido queda
+acotado por el intervalo entre fotos y nunca se vuelven a sumar todas las
+compras, ventas y producciones.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import archivo
+from .models import (
+    CompraInsumo, DetalleVenta, FotoStock, Insumo, MovimientoInventario, Produccion, Producto,
+    ProductoInsumo, ProductoProveedor,
+)
+
+CENTAVOS = Decimal('0.01')
+PRODUCTO = 'PRODUCTO'
+INSUMO = 'INSUMO'
+MODELOS = {PRODUCTO: Producto, INSUMO: Insumo}
+
+
+def movimiento(tipo, articulo_id, cantidad, motivo, origen_id, fecha):
+    return MovimientoInventario(
+        tipo=tipo, articulo_id=articulo_id, cantidad=cantidad, motivo=motivo, origen_id=origen_id, fecha=fecha,
+    )
+
+
+def registrar(movimientos):
+    """Inserta ``movimientos`` (una sentencia) y corrige las fotos posteriores a su fecha.
+
+    Un movimiento con fecha anterior a una foto ya tomada (venta offline
+    sincronizada tarde, compra con fecha pasada) se suma a esas fotos para
+    que sigan siendo exactas.
+    """
+    if not movimientos:
+        return
+    MovimientoInventario.objects.bulk_create(movimientos)
+    if not FotoStock.objects.filter(fecha__gte=min(m.fecha for m in movimientos)).exists():
+        return
+    por_fecha = {}
+    for m in movimientos:
+        deltas = por_fecha.setdefault((m.fecha, m.tipo), {})
+        deltas[m.articulo_id] = deltas.get(m.articulo_id, Decimal('0')) + Decimal(m.cantidad)
+    for (fecha, tipo), deltas in por_fecha.items():
+        delta = Case(
+            *[When(articulo_id=pk, then=Value(d)) for pk, d in deltas.items()],
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        FotoStock.objects.filter(tipo=tipo, articulo_id__in=list(deltas), fecha__gte=fecha).update(stock=F('stock') + delta)
+
+
+def fijar(tipo, valores):
+    """Asigna el stock de varios artículos ({articulo_id: stock}) y anota la diferencia como ``AJUSTE``.
+
+    Para cambios deliberados fuera de compras, producción y ventas (pruebas de
+    carga): el libro sigue sumando el stock. Todo en una transacción; devuelve
+    los movimientos registrados.
+    """
+    modelo = MODELOS[tipo]
+    with transaction.atomic():
+        anteriores = dict(modelo.objects.filter(pk__in=list(valores)).values_list('pk', 'stock'))
+        modelo.objects.bulk_update([modelo(pk=pk, stock=valores[pk]) for pk in anteriores], ['stock'], batch_size=500)
+        ahora = timezone.now()
+        movimientos = [
+            movimiento(tipo, pk, Decimal(valores[pk]) - Decimal(stock or 0), 'AJUSTE', None, ahora)
+            for pk, stock in anteriores.items() if Decimal(valores[pk]) != Decimal(stock or 0)
+        ]
+        registrar(movimientos)
+    return movimientos
+
+
+def tomar_foto(momento=None):
+    """Guarda el stock de todos los productos e insumos en ``momento`` (por defecto ahora).
+
+    Se calcula en SQL como ``stock actual - movimientos posteriores a momento``.
+    Devuelve el número de filas creadas.
+    """
+    momento = momento or timezone.now()
+    creadas = 0
+    with transaction.atomic():
+        for tipo, modelo in MODELOS.items():
+            posteriores = MovimientoInventario.objects.filter(
+                tipo=tipo, articulo_id=OuterRef('pk'), fecha__gt=momento
+            ).values('articulo_id').annotate(total=Sum('cantidad')).values('total')
+            filas = modelo.objects.annotate(
+                posterior=Coalesce(Subquery(posteriores), Value(Decimal('0')), output_field=DecimalField())
+            ).values_list('pk', 'stock', 'posterior')
+            creadas += len(FotoStock.objects.bulk_create(
+                [FotoStock(tipo=tipo, articulo_id=pk, fecha=momento, stock=Decimal(stock or 0) - Decimal(posterior))
+                 for pk, stock, posterior in filas],
+                batch_size=1000,
+            ))
+    return creadas
+
+
+def stock_en(tipo, momento, ids=None):
+    """Devuelve {articulo_id: stock} de los artículos ``tipo`` en ``momento``.
+
+    Usa la foto más cercana (anterior o posterior) y suma o resta los
+    movimientos entre la foto y ``momento``: cuatro consultas sin importar el
+    número de artículos. Sin fotos parte del stock actual.
+    """
+    fotos = FotoStock.objects.filter(tipo=tipo)
+    antes = fotos.filter(fecha__lte=momento).order_by('-fecha').values_list('fecha', flat=True).first()
+    despues = fotos.filter(fecha__gt=momento).order_by('fecha').values_list('fecha', flat=True).first()
+    if antes and (despues is None or momento - antes <= despues - momento):
+        base = fotos.filter(fecha=antes)
+        rango, signo = {'fecha__gt': antes, 'fecha__lte': momento}, 1
+    elif despues:
+        base = fotos.filter(fecha=despues)
+        rango, signo = {'fecha__gt': momento, 'fecha__lte': despues}, -1
+    else:
+        base = MODELOS[tipo].objects.annotate(articulo_id=F('pk'))
+        rango, signo = {'fecha__gt': momento}, -1
+
+    if ids is not None:
+        base = base.filter(articulo_id__in=ids)
+    stock = {pk: Decimal(valor or 0) for pk, valor in base.values_list('articulo_id', 'stock')}
+
+    movimientos = MovimientoInventario.objects.filter(tipo=tipo, **rango)
+    if ids is not None:
+        movimientos = movimientos.filter(articulo_id__in=ids)
+    for pk, total in movimientos.values('articulo_id').annotate(total=Sum('cantidad')).values_list('articulo_id', 'total'):
+        stock[pk] = stock.get(pk, Decimal('0')) + signo * total
+    if ids is not None:
+        for pk in ids:
+            stock.setdefault(pk, Decimal('0'))
+    return {pk: valor.quantize(CENTAVOS) for pk, valor in stock.items()}
+
+
+def reconstruir():
+    """Rehace el libro desde compras, producción y ventas y toma una foto.
+
+    Para bases con historial anterior al libro: cinco INSERT ... SELECT (uno
+    por origen y motivo, más uno por año de ventas archivado), sin recorrer
+    filas en Python. Devuelve el número de movimientos creados.
+    """
+    q = connection.ops.quote_name
+    tabla = q(MovimientoInventario._meta.db_table)
+    columnas = ', '.join(q(c) for c in ('tipo', 'articulo_id', 'cantidad', 'motivo', 'origen_id', 'fecha'))
+    consultas = [
+        # compras de insumos y de productos
+        f"SELECT 'INSUMO', c.{q('insumo_id')}, c.{q('cantidad')}, 'COMPRA', c.{q('id')}, c.{q('fecha')} "
+        f"FROM {q(CompraInsumo._meta.db_table)} c",
+        f"SELECT 'PRODUCTO', c.{q('producto_id')}, c.{q('cantidad')}, 'COMPRA', c.{q('id')}, c.{q('fecha')} "
+        f"FROM {q(ProductoProveedor._meta.db_table)} c",
+        # producción: entra el producto y salen los insumos de su receta
+        f"SELECT 'PRODUCTO', p.{q('producto_id')}, p.{q('cantidad')}, 'PRODUCCION', p.{q('id')}, p.{q('fecha_hora')} "
+        f"FROM {q(Produccion._meta.db_table)} p",
+        f"SELECT 'INSUMO', r.{q('insumo_id')}, -(r.{q('cantidad_utilizada')} * p.{q('cantidad')}), 'CONSUMO', "
+        f"p.{q('id')}, p.{q('fecha_hora')} "
+        f"FROM {q(Produccion._meta.db_table)} p "
+        f"INNER JOIN {q(ProductoInsumo._meta.db_table)} r ON r.{q('producto_id')} = p.{q('producto_id')} "
+        f"WHERE r.{q('cantidad_utilizada')} > 0",
+        f"SELECT 'PRODUCTO', d.{q('producto_id')}, -SUM(d.{q('cantidad')}), 'VENTA', v.{q('id')}, v.{q('fecha_hora')} "
+        f"FROM {q(DetalleVenta._meta.db_table)} d "
+        f"INNER JOIN {q('Venta')} v ON v.{q('id')} = d.{q('venta_id')} "
+        f"GROUP BY v.{q('id')}, v.{q('fecha_hora')}, d.{q('producto_id')}",
+    ]
+    creados = 0
+    # las ventas de años archivados se leen de su base adjunta
+    with archivo.adjuntos() as esquemas, transaction.atomic():
+        for esquema in esquemas:
+            consultas.append(
+                f"SELECT 'PRODUCTO', d.{q('producto_id')}, -SUM(d.{q('cantidad')}), 'VENTA', v.{q('id')}, "
+                f"v.{q('fecha_hora')} FROM {esquema}.{q('DetalleVenta')} d "
+                f"INNER JOIN {esquema}.{q('Venta')} v ON v.{q('id')} = d.{q('venta_id')} "
+                f"GROUP BY v.{q('id')}, v.{q('fecha_hora')}, d.{q('producto_id')}"
+            )
+        FotoStock.objects.all().delete()
+        MovimientoInventario.objects.all().delete()
+        with connection.cursor() as cursor:
+            for consulta in consultas:
+                cursor.execute(f'INSERT INTO {tabla} ({columnas}) {consulta}')
+                creados += cursor.rowcount
+        tomar_foto()
+    return creados
@@ -0,0 +1,72 @@
+import os
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from Pan import archivo
+from Pan.models import Venta
+from Pan.rollup import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las ventas (Venta y DetalleVenta) de años cerrados a una base SQLite por año en '
+        'ARCHIVO_DIR. VentaDiaria se conserva en la base principal.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anio', type=int, action='append', help='Año a archivar (repetible).')
+        parser.add_argument(
+            '--mantener', type=int, default=1,
+            help='Años cerrados que se dejan en la base principal además del actual (por defecto 1).',
+        )
+        parser.add_argument('--compactar', action='store_true', help='VACUUM de la base principal al terminar.')
+        parser.add_argument('--listar', action='store_true', help='Sólo muestra los años archivados.')
+
+    def handle(self, *args, **options):
+        if options['listar']:
+            self._listar()
+            return
+
+        actual = timezone.localdate().year
+        if options['anio']:
+            anios = sorted(set(options['anio']))
+            abiertos = [a for a in anios if a >= actual]
+            if abiertos:
+                raise CommandError(f'Sólo se archivan años cerrados: {", ".join(map(str, abiertos))}.')
+        else:
+            limite = actual - options['mantener']
+            anios = sorted(
+                a for a in Venta.objects.annotate(anio=ExtractYear('fecha_hora')).values_list('anio', flat=True).distinct()
+                if a < limite
+            )
+        if not anios:
+            self.stdout.write('No hay años para archivar.')
+            return
+
+        for anio in anios:
+            # los acumulados son lo único que queda del año en la base principal
+            reconstruir(date(anio, 1, 1), date(anio, 12, 31))
+            try:
+                ventas, detalles = archivo.archivar(anio)
+            except archivo.ArchivoError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(
+                f'{anio}: {ventas} ventas y {detalles} líneas movidas a {archivo.ruta(anio)}.'
+            ))
+
+        if options['compactar']:
+            antes = os.path.getsize(settings.DATABASES['default']['NAME'])
+            archivo.compactar()
+            despues = os.path.getsize(settings.DATABASES['default']['NAME'])
+            self.stdout.write(f'Base principal: {antes / 1e6:.1f} MB -> {despues / 1e6:.1f} MB.')
+
+    def _listar(self):
+        filas = archivo.resumen()
+        if not filas:
+            self.stdout.write('No hay años archivados.')
+        for anio, ventas, detalles, tamano in filas:
+            self.stdout.write(f'{anio}: {ventas} ventas, {detalles} líneas, {tamano / 1e6:.1f} MB')
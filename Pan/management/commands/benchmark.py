@@ -0,0 +1,169 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from Pan import cache_dashboard, instrumentacion
+from Pan.estadistica import percentil
+from Pan.models import Producto, Insumo, Proveedor, Vendedor, Venta, DetalleVenta
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide p50/p95, número de consultas y memoria pico de las vistas principales usando el '
+        'cliente de pruebas de Django sobre la base configurada. Los escenarios de escritura '
+        'modifican datos: úsese sobre una copia (p. ej. generada con generar_datos).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--calentamiento', type=int, default=2)
+        parser.add_argument('--solo-lectura', action='store_true', help='Omite los escenarios POST.')
+        parser.add_argument('--escenario', action='append', help='Ejecuta sólo los escenarios indicados.')
+        parser.add_argument('--salida', help='Guarda el resultado en este archivo JSON.')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior para mostrar diferencias.')
+
+    def handle(self, *args, **o):
+        self.client = Client(SERVER_NAME='localhost')
+        escenarios = self._escenarios(o['solo_lectura'])
+        if o['escenario']:
+            desconocidos = set(o['escenario']) - set(escenarios)
+            if desconocidos:
+                raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+            escenarios = {k: v for k, v in escenarios.items() if k in o['escenario']}
+
+        resultados = {}
+        for nombre, (preparar, peticion) in escenarios.items():
+            resultados[nombre] = self._medir(preparar, peticion, o['repeticiones'], o['calentamiento'])
+            r = resultados[nombre]
+            self.stdout.write(
+                f"{nombre:<24} p50={r['p50_ms']:8.2f} ms  p95={r['p95_ms']:8.2f} ms  "
+                f"consultas={r['consultas']:5}  memoria={r['memoria_pico_kb']:9.1f} KB"
+            )
+
+        informe = {
+            'meta': {
+                'commit': _commit(),
+                'fecha': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_datos': connection.vendor,
+                'filas': {
+                    'productos': Producto.objects.count(),
+                    'insumos': Insumo.objects.count(),
+                    'ventas': Venta.objects.count(),
+                    'detalles_venta': DetalleVenta.objects.count(),
+                },
+                'repeticiones': o['repeticiones'],
+            },
+            'escenarios': resultados,
+        }
+        if o['salida']:
+            with open(o['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo, indent=2, ensure_ascii=False)
+        if o['comparar']:
+            self._comparar(o['comparar'], resultados)
+
+    def _escenarios(self, solo_lectura):
+        get = lambda url: (lambda: self.client.get(url))
+        escenarios = {
+            'dashboard_hoy': (cache_dashboard.invalidar, get('/dashboard/')),
+            'dashboard_7_dias': (cache_dashboard.invalidar, get('/dashboard/?range=7')),
+            'dashboard_cacheado': (None, get('/dashboard/')),
+            'ventas_get': (None, get('/ventas/')),
+            'compras_get': (None, get('/compras/')),
+            'produccion_get': (None, get('/produccion/')),
+            'historial_ventas': (None, get('/historial/ventas/')),
+        }
+        if solo_lectura:
+            return escenarios
+
+        vendedor = Vendedor.objects.values_list('pk', flat=True).first()
+        productos = list(Producto.objects.filter(stock__gte=100).values_list('pk', flat=True)[:10])
+        panes = list(Producto.objects.filter(tipo_producto='PAN').values_list('pk', flat=True)[:3])
+        proveedor = Proveedor.objects.filter(tipo_proveedor='INSUMOS').values_list('pk', flat=True).first()
+        insumos = list(Insumo.objects.values_list('pk', flat=True)[:20])
+
+        if vendedor and productos:
+            escenarios['ventas_post_3_lineas'] = (None, lambda: self.client.post('/ventas/', {
+                'vendedor': vendedor, 'producto_id': productos[:3], 'cantidad': ['1'] * len(productos[:3]),
+            }))
+            escenarios['ventas_post_10_lineas'] = (None, lambda: self.client.post('/ventas/', {
+                'vendedor': vendedor, 'producto_id': productos, 'cantidad': ['1'] * len(productos),
+            }))
+        if proveedor and insumos:
+            escenarios['compras_post_20_lineas'] = (None, lambda: self.client.post('/compras/', {
+                'proveedor': proveedor, 'insumo_id': insumos,
+                'cantidad': ['10'] * len(insumos), 'precio_unitario': ['1.00'] * len(insumos),
+            }))
+        if panes:
+            escenarios['produccion_post'] = (None, lambda: self.client.post('/produccion/', {
+                'producto_id': panes, 'cantidad': ['1'] * len(panes),
+            }))
+        return escenarios
+
+    def _medir(self, preparar, peticion, repeticiones, calentamiento):
+        for _ in range(calentamiento):
+            if preparar:
+                preparar()
+            peticion()
+
+        tiempos, consultas = [], []
+        tracemalloc.start()
+        try:
+            for _ in range(repeticiones):
+                if preparar:
+                    preparar()
+                # también cuenta las consultas de los hilos del dashboard asíncrono
+                with instrumentacion.medir_consultas() as medicion:
+                    inicio = time.perf_counter()
+                    respuesta = peticion()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                if respuesta.status_code >= 400:
+                    raise CommandError(f'Respuesta {respuesta.status_code} durante el benchmark.')
+                consultas.append(medicion.consultas)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'n': repeticiones,
+            'p50_ms': round(statistics.median(tiempos), 3),
+            'p95_ms': round(percentil(tiempos, 95), 3),
+            'media_ms': round(statistics.fmean(tiempos), 3),
+            'consultas': max(consultas),
+            'memoria_pico_kb': round(pico / 1024, 1),
+        }
+
+    def _comparar(self, ruta, actuales):
+        with open(ruta, encoding='utf-8') as archivo:
+            anteriores = json.load(archivo).get('escenarios', {})
+        self.stdout.write(f'\nComparación con {ruta}:')
+        for nombre, actual in actuales.items():
+            anterior = anteriores.get(nombre)
+            if not anterior:
+                continue
+            delta = (actual['p50_ms'] - anterior['p50_ms']) / anterior['p50_ms'] * 100 if anterior['p50_ms'] else 0
+            self.stdout.write(
+                f"{nombre:<24} p50 {anterior['p50_ms']:8.2f} -> {actual['p50_ms']:8.2f} ms ({delta:+.1f}%)  "
+                f"consultas {anterior['consultas']} -> {actual['consultas']}"
+            )
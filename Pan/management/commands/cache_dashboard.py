@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from Pan import cache_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Muestra los aciertos/fallos de la caché del dashboard y permite invalidarla.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invalidar', action='store_true', help='Invalida todas las entradas cacheadas.')
+        parser.add_argument('--reiniciar', action='store_true', help='Pone a cero los contadores.')
+
+    def handle(self, *args, **options):
+        stats = cache_dashboard.estadisticas()
+        self.stdout.write(
+            f"aciertos={stats['aciertos']} fallos={stats['fallos']} "
+            f"tasa_aciertos={stats['tasa_aciertos']:.1%}"
+        )
+        if options['invalidar']:
+            cache_dashboard.invalidar()
+            self.stdout.write(self.style.SUCCESS('Caché del dashboard invalidada.'))
+        if options['reiniciar']:
+            cache_dashboard.reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS('Contadores reiniciados.'))
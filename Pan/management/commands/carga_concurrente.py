@@ -0,0 +1,102 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from Pan import carga
+from Pan.estadistica import percentil
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga: vendedores y panaderos simulados (hilos o procesos) envían ventas por '
+        'formulario y por API y lotes de producción a las vistas reales. Mide rendimiento y '
+        'latencias y al final comprueba el stock contra las ventas, la producción y el libro de '
+        'inventario; falla ante cualquier inconsistencia. Modifica datos: úsese sobre una copia o con --restaurar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendedores', type=int, default=8)
+        parser.add_argument('--panaderos', type=int, default=2)
+        parser.add_argument('--operaciones', type=int, default=200, help='Operaciones por vendedor o panadero.')
+        parser.add_argument('--procesos', action='store_true',
+                            help='Un proceso por trabajador en vez de hilos (varios escritores contra SQLite).')
+        parser.add_argument('--productos', type=int, default=5, help='Panes sobre los que compiten.')
+        parser.add_argument('--lineas', type=int, default=3, help='Máximo de productos por venta o lote.')
+        parser.add_argument('--lote', type=int, default=10, help='Máximo de unidades por línea de producción.')
+        parser.add_argument('--api', type=float, default=0.5, help='Fracción de ventas enviadas por /api/ventas/.')
+        parser.add_argument('--reintentos', type=float, default=0.1,
+                            help='Fracción de ventas por API reenviadas con la misma clave.')
+        parser.add_argument('--stock', type=int, help='Fija este stock inicial a los panes (fuerza agotarlos).')
+        parser.add_argument('--stock-insumos', type=int, help='Fija este stock inicial a sus insumos.')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--restaurar', action='store_true',
+                            help='Al terminar borra lo creado y devuelve el stock original.')
+        parser.add_argument('--permitir-errores', action='store_true',
+                            help='No falla por peticiones con error (p. ej. "database is locked"), sólo por stock.')
+
+    def handle(self, *args, **o):
+        escenario = carga.Escenario(o['productos'])
+        if not escenario.productos or not escenario.vendedores:
+            raise CommandError('Hacen falta panes con receta y vendedores (ver generar_datos).')
+        escenario.fijar_stock(o['stock'], o['stock_insumos'])
+        opciones = {k: o[k] for k in ('lineas', 'lote', 'api', 'reintentos')}
+        tareas = [('vendedor', o['operaciones'], o['semilla'] + i, escenario, opciones) for i in range(o['vendedores'])]
+        tareas += [('panadero', o['operaciones'], o['semilla'] + 1000 + i, escenario, opciones)
+                   for i in range(o['panaderos'])]
+
+        inicio = time.perf_counter()
+        resultados = self._procesos(tareas) if o['procesos'] else self._hilos(tareas)
+        duracion = time.perf_counter() - inicio
+        total = carga.combinar(resultados)
+        inconsistencias = carga.verificar(escenario, total)
+
+        self.stdout.write(
+            f"{'procesos' if o['procesos'] else 'hilos'}: {o['vendedores']} vendedores, {o['panaderos']} panaderos, "
+            f"{len(escenario.productos)} panes, {len(escenario.insumos)} insumos"
+        )
+        peticiones = 0
+        for operacion, latencias in sorted(total['latencias'].items()):
+            peticiones += len(latencias)
+            conteo = ' '.join(f'{k}={v}' for k, v in sorted(total['conteos'][operacion].items()))
+            self.stdout.write(
+                f'  {operacion:<11} {len(latencias):>6} peticiones  {conteo}\n'
+                f'  {"":<11} p50={percentil(latencias, 50):.1f} ms  p95={percentil(latencias, 95):.1f} ms  '
+                f'p99={percentil(latencias, 99):.1f} ms  máx={max(latencias):.1f} ms'
+            )
+        self.stdout.write(f'{peticiones / duracion:.1f} peticiones/s en {duracion:.2f} s')
+        for error in total['errores']:
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+
+        if o['restaurar']:
+            escenario.restaurar()
+        errores = sum(c.get('error', 0) for c in total['conteos'].values())
+        if errores and not o['permitir_errores']:
+            inconsistencias.append(f'{errores} peticiones terminaron con error')
+        if inconsistencias:
+            raise CommandError('Prueba de carga fallida:\n' + '\n'.join(inconsistencias))
+        self.stdout.write(self.style.SUCCESS('Stock consistente.'))
+
+    def _hilos(self, tareas):
+        resultados, lock = [], threading.Lock()
+
+        def ejecutar(tarea):
+            resultado = carga.trabajador(*tarea)
+            with lock:
+                resultados.append(resultado)
+
+        hilos = [threading.Thread(target=ejecutar, args=(t,)) for t in tareas]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return resultados
+
+    def _procesos(self, tareas):
+        # fork hereda la configuración de Django; las conexiones abiertas no deben compartirse
+        connections.close_all()
+        with ProcessPoolExecutor(len(tareas), mp_context=multiprocessing.get_context('fork')) as pool:
+            return list(pool.map(carga.trabajador, *zip(*tareas)))
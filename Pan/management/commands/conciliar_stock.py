@@ -0,0 +1,66 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Pan import cache_dashboard, conciliacion, inventario
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el stock de productos e insumos con el que resulta de su saldo inicial más '
+        'compras, producción y ventas; con --reparar lo corrige.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=[inventario.PRODUCTO, inventario.INSUMO], help='Sólo productos o insumos.')
+        parser.add_argument('--tolerancia', type=Decimal, default=Decimal('0'), help='Diferencia ignorada.')
+        parser.add_argument('--reparar', action='store_true', help='Asigna el stock esperado (un bulk_update por tipo).')
+        parser.add_argument('--limite', type=int, default=20, help='Desvíos listados por tipo (0 = todos).')
+        parser.add_argument('--check', action='store_true', help='Termina con error si hay desvíos (sin reparar).')
+        parser.add_argument(
+            '--saldo-inicial', action='store_true',
+            help='Puesta en marcha: toma el stock actual como correcto para los artículos sin saldo inicial '
+                 '(tras un recuento físico) y termina.',
+        )
+
+    def handle(self, *args, **options):
+        if options['reparar'] and options['check']:
+            raise CommandError('--reparar y --check son excluyentes.')
+        tipos = [options['tipo']] if options['tipo'] else [inventario.PRODUCTO, inventario.INSUMO]
+        if options['saldo_inicial']:
+            for tipo in tipos:
+                self.stdout.write(f'{tipo}: {conciliacion.fijar_saldos(tipo)} saldos iniciales registrados.')
+            return
+        total = 0
+        for tipo in tipos:
+            inicio = time.perf_counter()
+            try:
+                if options['reparar']:
+                    encontrados = conciliacion.reparar(tipo, options['tolerancia'])
+                else:
+                    encontrados = conciliacion.desvios(tipo, options['tolerancia'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            segundos = time.perf_counter() - inicio
+            total += len(encontrados)
+
+            accion = 'corregidos' if options['reparar'] else 'con desvío'
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{tipo}: {len(encontrados)} {accion} ({segundos:.2f} s)'))
+            listados = encontrados[:options['limite']] if options['limite'] else encontrados
+            for d in listados:
+                self.stdout.write(
+                    f"{d['id']:>6}  {d['nombre'][:36]:<36} stock {d['stock']:>12}  "
+                    f"esperado {d['esperado']:>12}  dif {d['diferencia']:>+12}"
+                )
+            if len(listados) < len(encontrados):
+                self.stdout.write(f'  ... y {len(encontrados) - len(listados)} más')
+
+        if options['reparar'] and total:
+            # bulk_update no emite señales ni pasa por stock.py
+            cache_dashboard.invalidar()
+            self.stdout.write(self.style.SUCCESS(f'{total} artículos corregidos.'))
+        elif options['check'] and total:
+            raise CommandError(f'{total} artículos con desvío de stock.')
+        elif not total:
+            self.stdout.write(self.style.SUCCESS('Sin desvíos.'))
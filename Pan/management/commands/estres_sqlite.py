@@ -0,0 +1,160 @@
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from Pan import cache_dashboard, escritor, inventario, planificador
+from Pan.estadistica import percentil
+from Pan.models import MovimientoInventario, Producto, Vendedor, Venta, DetalleVenta, VentaCliente
+from Pan.rollup import reconstruir
+from Pan.stock import StockInsuficiente, registrar_venta
+
+# configuraciones que compara --comparar (variables de entorno del subproceso)
+MODOS = {
+    'django': {'SQLITE_CONCURRENCIA': '0', 'SQLITE_ESCRITOR_UNICO': '0'},
+    'wal': {'SQLITE_CONCURRENCIA': '1', 'SQLITE_ESCRITOR_UNICO': '0'},
+    'wal+escritor': {'SQLITE_CONCURRENCIA': '1', 'SQLITE_ESCRITOR_UNICO': '1'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de estrés de escritura: varios hilos registran ventas de 1 unidad sobre pocos '
+        'productos a la vez. Comprueba que no se pierdan descuentos ni quede stock negativo y '
+        'mide ventas por segundo. Modifica datos: úsese sobre una copia o con --restaurar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--ventas', type=int, default=2000, help='Intentos de venta en total.')
+        parser.add_argument('--productos', type=int, default=5, help='Productos sobre los que compiten los hilos.')
+        parser.add_argument('--stock', type=int, help='Fija este stock inicial a los productos (fuerza agotarlos).')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--restaurar', action='store_true',
+                            help='Al terminar borra las ventas creadas y devuelve el stock original.')
+        parser.add_argument('--comparar', action='store_true',
+                            help=f"Ejecuta la prueba en cada modo ({', '.join(MODOS)}) y compara.")
+
+    def handle(self, *args, **o):
+        if o['comparar']:
+            return self._comparar(o)
+
+        productos = list(Producto.objects.order_by('id').values_list('id', 'stock')[:o['productos']])
+        vendedores = list(Vendedor.objects.values_list('id', flat=True)[:20])
+        if not productos or not vendedores:
+            raise CommandError('Hacen falta productos y vendedores (ver generar_datos).')
+        stock_original = {pid: stock for pid, stock in productos}
+        ultima_venta = Venta.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        ultimo_movimiento = MovimientoInventario.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        if o['stock'] is not None:
+            # como AJUSTE en el libro, que --restaurar borra con el resto de la prueba
+            inventario.fijar(inventario.PRODUCTO, {pid: o['stock'] for pid in stock_original})
+        stock_inicial = dict(Producto.objects.filter(pk__in=stock_original).values_list('id', 'stock'))
+
+        ids = list(stock_original)
+        por_hilo = [o['ventas'] // o['hilos'] + (1 if i < o['ventas'] % o['hilos'] else 0) for i in range(o['hilos'])]
+        resultados = {'ok': 0, 'sin_stock': 0, 'bloqueada': 0, 'error': 0}
+        latencias, lock = [], threading.Lock()
+
+        def vendedor(n, semilla):
+            rnd = random.Random(semilla)
+            locales, propias = {k: 0 for k in resultados}, []
+            try:
+                for _ in range(n):
+                    inicio = time.perf_counter()
+                    try:
+                        escritor.ejecutar(registrar_venta, rnd.choice(vendedores), {rnd.choice(ids): 1})
+                        locales['ok'] += 1
+                    except StockInsuficiente:
+                        locales['sin_stock'] += 1
+                    except OperationalError as exc:
+                        locales['bloqueada' if 'locked' in str(exc) else 'error'] += 1
+                    propias.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                connection.close()
+            with lock:
+                for k, v in locales.items():
+                    resultados[k] += v
+                latencias.extend(propias)
+
+        hilos = [threading.Thread(target=vendedor, args=(n, o['semilla'] + i)) for i, n in enumerate(por_hilo)]
+        inicio = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        duracion = time.perf_counter() - inicio
+
+        # oráculo: stock inicial - stock final == unidades vendidas por producto
+        vendidas = dict(
+            DetalleVenta.objects.filter(venta_id__gt=ultima_venta, producto_id__in=ids)
+            .values_list('producto_id').annotate(total=Sum('cantidad'))
+        )
+        stock_final = dict(Producto.objects.filter(pk__in=ids).values_list('id', 'stock'))
+        inconsistencias = []
+        for pid in ids:
+            esperado = Decimal(stock_inicial[pid]) - Decimal(vendidas.get(pid, 0))
+            if Decimal(stock_final[pid]) != esperado or stock_final[pid] < 0:
+                inconsistencias.append(f'producto {pid}: stock {stock_final[pid]}, esperado {esperado}')
+        ventas_creadas = Venta.objects.filter(id__gt=ultima_venta).count()
+        if ventas_creadas != resultados['ok']:
+            inconsistencias.append(f"{ventas_creadas} ventas creadas pero {resultados['ok']} confirmadas")
+
+        self.stdout.write(
+            f"modo={'escritor' if settings.SQLITE_ESCRITOR_UNICO else 'directo'} "
+            f"concurrencia={'on' if settings.SQLITE_CONCURRENCIA else 'off'} hilos={o['hilos']}\n"
+            f"ok={resultados['ok']} sin_stock={resultados['sin_stock']} bloqueadas={resultados['bloqueada']} "
+            f"errores={resultados['error']}\n"
+            f"{resultados['ok'] / duracion:.1f} ventas/s  p50={percentil(latencias, 50):.2f} ms  "
+            f"p99={percentil(latencias, 99):.2f} ms"
+        )
+
+        if o['restaurar']:
+            self._restaurar(ultima_venta, ultimo_movimiento, stock_original)
+        if inconsistencias:
+            raise CommandError('Stock inconsistente:\n' + '\n'.join(inconsistencias))
+        self.stdout.write(self.style.SUCCESS('Stock consistente.'))
+
+    def _restaurar(self, ultima_venta, ultimo_movimiento, stock_original):
+        with transaction.atomic():
+            VentaCliente.objects.filter(venta_id__gt=ultima_venta).delete()
+            DetalleVenta.objects.filter(venta_id__gt=ultima_venta).delete()
+            Venta.objects.filter(id__gt=ultima_venta).delete()
+            # cada venta dejó sus salidas en el libro: sin borrarlas, conciliar ve un desvío por cada una
+            MovimientoInventario.objects.filter(id__gt=ultimo_movimiento).delete()
+            productos = list(Producto.objects.filter(pk__in=stock_original))
+            for p in productos:
+                p.stock = stock_original[p.pk]
+            Producto.objects.bulk_update(productos, ['stock'])
+            hoy = timezone.localdate()
+            reconstruir(hoy, hoy)
+            transaction.on_commit(cache_dashboard.invalidar)
+            transaction.on_commit(planificador.invalidar_stock)
+
+    def _comparar(self, o):
+        argumentos = ['--hilos', str(o['hilos']), '--ventas', str(o['ventas']), '--productos', str(o['productos']),
+                      '--semilla', str(o['semilla']), '--restaurar']
+        if o['stock'] is not None:
+            argumentos += ['--stock', str(o['stock'])]
+        fallos = []
+        for nombre, entorno in MODOS.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {nombre}'))
+            proceso = subprocess.run(
+                [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'estres_sqlite', *argumentos],
+                env={**os.environ, **entorno}, cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+            self.stdout.write(proceso.stdout.rstrip())
+            if proceso.returncode:
+                self.stdout.write(self.style.ERROR(proceso.stderr.strip().splitlines()[-1] if proceso.stderr else ''))
+                fallos.append(nombre)
+        if fallos:
+            raise CommandError(f"Inconsistencias en: {', '.join(fallos)}")
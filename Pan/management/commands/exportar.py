@@ -0,0 +1,44 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Pan.exportar import LIBROS, csv_stream, escribir_xlsx, filas
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor!r} (use AAAA-MM-DD).')
+
+
+class Command(BaseCommand):
+    help = 'Exporta el libro de ventas, compras o producción de un rango de fechas a CSV o XLSX.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(LIBROS))
+        parser.add_argument('--desde', help='Primer día (AAAA-MM-DD).')
+        parser.add_argument('--hasta', help='Último día (AAAA-MM-DD).')
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--salida', default='-', help="Archivo de salida ('-' = stdout, sólo CSV).")
+        parser.add_argument('--lote', type=int, default=2000, help='Filas leídas por bloque.')
+
+    def handle(self, *args, **options):
+        desde = _fecha(options['desde']) if options['desde'] else None
+        hasta = _fecha(options['hasta']) if options['hasta'] else None
+        datos = filas(options['tipo'], desde, hasta, lote=options['lote'])
+
+        if options['formato'] == 'xlsx':
+            if options['salida'] == '-':
+                raise CommandError('Indique --salida para exportar a XLSX.')
+            escribir_xlsx(datos, options['salida'], hoja=options['tipo'])
+            return
+
+        if options['salida'] == '-':
+            for linea in csv_stream(datos):
+                sys.stdout.write(linea)
+            return
+        with open(options['salida'], 'w', newline='', encoding='utf-8') as archivo:
+            for linea in csv_stream(datos):
+                archivo.write(linea)
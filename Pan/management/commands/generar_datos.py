@@ -0,0 +1,215 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Pan import busqueda, catalogo, conciliacion, costos, inventario, pronostico
+from Pan.models import (
+    Proveedor, Insumo, Producto, ProductoInsumo, CompraInsumo, ProductoProveedor,
+    Produccion, Vendedor, Venta, DetalleVenta, VentaDiaria, VentaCliente, MovimientoInventario, FotoStock,
+    PronosticoInsumo, SaldoInicial,
+)
+from Pan.rollup import reconstruir
+
+PANES = ['Pan dulce', 'Pan blanco', 'Pan integral', 'Concha', 'Semita', 'Rosquilla', 'Quesadilla',
+         'Empanada', 'Galleta', 'Cachito', 'Polvorón', 'Bollo', 'Picos', 'Torta', 'Budín']
+VARIANTES = ['de coco', 'de piña', 'de canela', 'con queso', 'integral', 'de maíz', 'de azúcar',
+             'de mantequilla', 'de chocolate', 'de leche', 'relleno', 'grande', 'pequeño']
+BEBIDAS = ['Café', 'Gaseosa', 'Jugo de naranja', 'Agua', 'Leche', 'Té frío', 'Chocolate caliente', 'Refresco de cacao']
+INSUMOS = ['Harina', 'Azúcar', 'Levadura', 'Sal', 'Huevo', 'Mantequilla', 'Leche', 'Canela', 'Coco',
+           'Queso', 'Manteca', 'Vainilla', 'Piña', 'Cacao', 'Maíz', 'Polvo de hornear', 'Aceite']
+NOMBRES = ['Ana', 'Beto', 'Carla', 'Diego', 'Elena', 'Fabio', 'Gloria', 'Hugo', 'Irene', 'Julio',
+           'Karla', 'Luis', 'María', 'Néstor', 'Olga', 'Pedro']
+
+LOTE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos y reproducibles (semilla fija) de una panadería: catálogo, '
+        'recetas, compras, producción y un año de ventas. Pensado para bases de prueba/benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--productos', type=int, default=2000, help='Productos tipo PAN.')
+        parser.add_argument('--bebidas', type=int, default=200, help='Productos tipo BEBIDA.')
+        parser.add_argument('--insumos', type=int, default=500)
+        parser.add_argument('--proveedores', type=int, default=40)
+        parser.add_argument('--vendedores', type=int, default=15)
+        parser.add_argument('--ventas', type=int, default=300000, help='Tickets (cada uno con 1-6 líneas).')
+        parser.add_argument('--compras', type=int, default=20000, help='Líneas de compra (insumos + bebidas).')
+        parser.add_argument('--producciones', type=int, default=30000)
+        parser.add_argument('--dias', type=int, default=365, help='Días de historial hasta hoy.')
+        parser.add_argument('--crear-tablas', action='store_true',
+                            help='Crea las tablas no gestionadas (managed = False) que no existan.')
+        parser.add_argument('--vaciar', action='store_true', help='Borra los datos existentes antes de generar.')
+
+    def handle(self, *args, **o):
+        if o['crear_tablas']:
+            self._crear_tablas()
+        if o['vaciar']:
+            self._vaciar()
+        elif Producto.objects.exists():
+            raise CommandError('La base ya tiene productos; use --vaciar para regenerar.')
+
+        self.rnd = random.Random(o['semilla'])
+        self.hoy = timezone.localdate()
+        self.dias = o['dias']
+
+        with transaction.atomic():
+            articulos = self._catalogo(o)
+        with transaction.atomic():
+            self._compras(o['compras'], articulos)
+        with transaction.atomic():
+            self._producciones(o['producciones'], articulos)
+        self._ventas(o['ventas'], articulos)
+
+        # bulk_create no emite señales: publicar el catálogo nuevo a mano
+        catalogo.invalidar()
+        busqueda.reconstruir()
+        self.stdout.write('Recalculando VentaDiaria...')
+        reconstruir()
+        self.stdout.write('Reconstruyendo el libro de inventario...')
+        inventario.reconstruir()
+        # el stock generado no sale del historial: la diferencia es el saldo inicial de cada artículo
+        for tipo in inventario.MODELOS:
+            conciliacion.fijar_saldos(tipo)
+        pronostico.calcular()
+        costos.recalcular_recetas()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS('Datos generados.'))
+
+    def _crear_tablas(self):
+        with connection.cursor() as cursor:
+            existentes = set(connection.introspection.table_names(cursor))
+        with connection.schema_editor() as schema_editor:
+            for model in apps.get_app_config('Pan').get_models():
+                if not model._meta.managed and model._meta.db_table not in existentes:
+                    schema_editor.create_model(model)
+                    self.stdout.write(f'Tabla {model._meta.db_table} creada.')
+
+    def _vaciar(self):
+        with transaction.atomic():
+            for model in (PronosticoInsumo, SaldoInicial, FotoStock, MovimientoInventario, VentaDiaria, VentaCliente,
+                          DetalleVenta, Venta, Produccion, CompraInsumo, ProductoProveedor, ProductoInsumo, Producto,
+                          Insumo, Proveedor, Vendedor):
+                model.objects.all().delete()
+
+    def _momento(self, hora_min=6, hora_max=20):
+        dia = self.hoy - timedelta(days=self.rnd.randrange(self.dias))
+        hora = time(self.rnd.randint(hora_min, hora_max - 1), self.rnd.randrange(60), self.rnd.randrange(60))
+        return timezone.make_aware(datetime.combine(dia, hora))
+
+    def _catalogo(self, o):
+        rnd = self.rnd
+        proveedores = Proveedor.objects.bulk_create([
+            Proveedor(nombre=f'Proveedor {i + 1:03d}', direccion=f'Calle {i + 1}', telefono=f'8{rnd.randrange(10**7):07d}',
+                      tipo_proveedor='BEBIDAS' if i % 4 == 0 else 'INSUMOS')
+            for i in range(o['proveedores'])
+        ])
+        vendedores = Vendedor.objects.bulk_create([
+            Vendedor(nombre=f'{NOMBRES[i % len(NOMBRES)]} {i // len(NOMBRES) + 1}') for i in range(o['vendedores'])
+        ])
+        insumos = Insumo.objects.bulk_create([
+            Insumo(nombre=f'{INSUMOS[i % len(INSUMOS)]} {i // len(INSUMOS) + 1}',
+                   stock=Decimal(rnd.randint(500, 5000)), coste=Decimal(rnd.randint(5, 300)) / 10)
+            for i in range(o['insumos'])
+        ], batch_size=LOTE)
+        panes = []
+        for i in range(o['productos']):
+            costo = Decimal(rnd.randint(20, 400)) / 10
+            panes.append(Producto(
+                nombre=f'{PANES[i % len(PANES)]} {VARIANTES[(i // len(PANES)) % len(VARIANTES)]} {i + 1}',
+                tipo_producto='PAN', costo=costo, precio_venta=(costo * Decimal('1.6')).quantize(Decimal('0.01')),
+                stock=Decimal(rnd.randint(1000, 10000)),
+            ))
+        for i in range(o['bebidas']):
+            costo = Decimal(rnd.randint(100, 600)) / 10
+            panes.append(Producto(
+                nombre=f'{BEBIDAS[i % len(BEBIDAS)]} {i + 1}', tipo_producto='BEBIDA', costo=costo,
+                precio_venta=(costo * Decimal('1.4')).quantize(Decimal('0.01')), stock=Decimal(rnd.randint(1000, 10000)),
+            ))
+        productos = Producto.objects.bulk_create(panes, batch_size=LOTE)
+
+        recetas = []
+        for p in productos:
+            if p.tipo_producto != 'PAN':
+                continue
+            for insumo in rnd.sample(insumos, min(len(insumos), rnd.randint(3, 8))):
+                recetas.append(ProductoInsumo(producto=p, insumo=insumo,
+                                              cantidad_utilizada=Decimal(rnd.randint(1, 50)) / 100))
+        ProductoInsumo.objects.bulk_create(recetas, batch_size=LOTE)
+        self.stdout.write(f'Catálogo: {len(productos)} productos, {len(insumos)} insumos, {len(recetas)} líneas de receta.')
+        return {
+            'proveedores_insumos': [p for p in proveedores if p.tipo_proveedor == 'INSUMOS'] or proveedores,
+            'proveedores_bebidas': [p for p in proveedores if p.tipo_proveedor == 'BEBIDAS'] or proveedores,
+            'vendedores': vendedores,
+            'insumos': insumos,
+            'panes': [p for p in productos if p.tipo_producto == 'PAN'],
+            'bebidas': [p for p in productos if p.tipo_producto == 'BEBIDA'],
+            'productos': productos,
+        }
+
+    def _compras(self, total, cat):
+        rnd = self.rnd
+        compras_insumos, compras_bebidas = [], []
+        for _ in range(total):
+            fecha = self._momento()
+            if cat['bebidas'] and rnd.random() < 0.25:
+                compras_bebidas.append(ProductoProveedor(
+                    proveedor=rnd.choice(cat['proveedores_bebidas']), producto=rnd.choice(cat['bebidas']),
+                    cantidad=Decimal(rnd.randint(12, 240)), precio_unitario=Decimal(rnd.randint(50, 500)) / 10, fecha=fecha,
+                ))
+            elif cat['insumos']:
+                compras_insumos.append(CompraInsumo(
+                    proveedor=rnd.choice(cat['proveedores_insumos']), insumo=rnd.choice(cat['insumos']),
+                    cantidad=Decimal(rnd.randint(10, 500)), precio_unitario=Decimal(rnd.randint(5, 300)) / 10, fecha=fecha,
+                ))
+        CompraInsumo.objects.bulk_create(compras_insumos, batch_size=LOTE)
+        ProductoProveedor.objects.bulk_create(compras_bebidas, batch_size=LOTE)
+        self.stdout.write(f'Compras: {len(compras_insumos)} de insumos, {len(compras_bebidas)} de bebidas.')
+
+    def _producciones(self, total, cat):
+        if not cat['panes']:
+            return
+        rnd = self.rnd
+        Produccion.objects.bulk_create([
+            Produccion(producto=rnd.choice(cat['panes']), cantidad=rnd.randint(10, 200), fecha_hora=self._momento(4, 9))
+            for _ in range(total)
+        ], batch_size=LOTE)
+        self.stdout.write(f'Producción: {total} lotes.')
+
+    def _ventas(self, total, cat):
+        if not cat['productos'] or not cat['vendedores']:
+            return
+        rnd = self.rnd
+        productos = cat['productos']
+        # popularidad tipo Zipf: pocos productos concentran la mayoría de las ventas
+        acumulado, suma = [], 0.0
+        for rango in range(len(productos)):
+            suma += 1.0 / (rango + 1)
+            acumulado.append(suma)
+
+        creadas = lineas = 0
+        while creadas < total:
+            n = min(LOTE, total - creadas)
+            with transaction.atomic():
+                ventas = Venta.objects.bulk_create([
+                    Venta(vendedor=rnd.choice(cat['vendedores']), fecha_hora=self._momento()) for _ in range(n)
+                ])
+                detalles = []
+                for venta in ventas:
+                    elegidos = {p.pk for p in rnd.choices(productos, cum_weights=acumulado, k=rnd.randint(1, 6))}
+                    detalles.extend(DetalleVenta(venta=venta, producto_id=pid, cantidad=rnd.randint(1, 5)) for pid in elegidos)
+                DetalleVenta.objects.bulk_create(detalles, batch_size=LOTE)
+            creadas += n
+            lineas += len(detalles)
+            self.stdout.write(f'Ventas: {creadas}/{total} ({lineas} líneas)', ending='\r')
+        self.stdout.write('')
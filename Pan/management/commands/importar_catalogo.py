@@ -0,0 +1,47 @@
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from Pan import importacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa productos (precios, costos), insumos (costes) o recetas desde un CSV o JSON. '
+        'Compara con la base y aplica sólo los cambios en una transacción; --simular sólo muestra el resumen.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--tipo', choices=list(importacion.TIPOS), required=True)
+        parser.add_argument('--simular', action='store_true', help='Muestra los cambios sin escribir nada.')
+        parser.add_argument('--mostrar', type=int, default=20, help='Cambios a listar (0 = ninguno, -1 = todos).')
+
+    def handle(self, *args, **o):
+        inicio = time.perf_counter()
+        try:
+            with open(o['archivo'], 'rb') as f:
+                filas = importacion.leer(File(f, name=o['archivo']))
+            plan = importacion.importar(o['tipo'], filas, simular=o['simular'])
+        except OSError as exc:
+            raise CommandError(f'No se pudo leer {o["archivo"]}: {exc.strerror}.')
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        duracion = time.perf_counter() - inicio
+
+        limite = None if o['mostrar'] < 0 else o['mostrar']
+        detalle = plan.detalle(limite)
+        for linea in detalle:
+            self.stdout.write(f'  {linea}')
+        total = sum(plan.resumen().values()) - plan.sin_cambios
+        if limite is not None and total > len(detalle):
+            self.stdout.write(f'  ... y {total - len(detalle)} cambios más')
+        for aviso in plan.avisos:
+            self.stdout.write(self.style.WARNING(f'  {aviso}'))
+
+        resumen = ', '.join(f'{n} {accion.replace("_", " ")}' for accion, n in plan.resumen().items())
+        if o['simular']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Simulación ({len(filas)} filas): {resumen}. No se escribió nada.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(filas)} filas en {duracion:.2f} s: {resumen}.'))
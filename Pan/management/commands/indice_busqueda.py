@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from Pan import busqueda
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye el índice de búsqueda por nombre (FTS5) de productos, insumos y proveedores. '
+        'Necesario tras cargas masivas que no emiten señales; con --buscar prueba una consulta.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buscar', metavar='TEXTO', help='Muestra los resultados de TEXTO en vez de reconstruir.')
+        parser.add_argument('--tipo', choices=list(busqueda.TIPOS), default='productos')
+
+    def handle(self, *args, **options):
+        if options['buscar'] is not None:
+            inicio = time.perf_counter()
+            resultados = busqueda.buscar(options['tipo'], options['buscar'])
+            duracion = (time.perf_counter() - inicio) * 1000
+            for r in resultados:
+                self.stdout.write(f"{r['id']:>6}  {r['nombre']}")
+            self.stdout.write(self.style.SUCCESS(f'{len(resultados)} resultados en {duracion:.1f} ms.'))
+            return
+
+        inicio = time.perf_counter()
+        try:
+            total = busqueda.reconstruir()
+        except DatabaseError as exc:
+            raise CommandError(f'No se pudo reconstruir el índice ({exc}); ¿falta aplicar las migraciones?')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} nombres indexados en {time.perf_counter() - inicio:.2f} s.'
+        ))
@@ -0,0 +1,53 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        'Comprueba y crea los índices declarados en Meta.indexes de los modelos '
+        'no gestionados (managed = False), que las migraciones no crean.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Sólo informa; termina con error si falta algún índice.',
+        )
+
+    def handle(self, *args, **options):
+        introspection = connection.introspection
+        faltantes = []
+        with connection.cursor() as cursor:
+            tablas = set(introspection.table_names(cursor))
+            for model in apps.get_app_config('Pan').get_models():
+                if model._meta.managed or not model._meta.indexes:
+                    continue
+                tabla = model._meta.db_table
+                if tabla not in tablas:
+                    self.stderr.write(self.style.WARNING(f'{tabla}: la tabla no existe, se omite.'))
+                    continue
+                existentes = set(introspection.get_constraints(cursor, tabla))
+                for index in model._meta.indexes:
+                    if index.name in existentes:
+                        self.stdout.write(f'{tabla}.{index.name}: ok')
+                    else:
+                        faltantes.append((model, index))
+
+        if options['check']:
+            for model, index in faltantes:
+                self.stdout.write(self.style.WARNING(f'{model._meta.db_table}.{index.name}: falta'))
+            if faltantes:
+                raise CommandError(f'Faltan {len(faltantes)} índices; ejecute `manage.py indices`.')
+            return
+
+        if faltantes:
+            with connection.schema_editor() as schema_editor:
+                for model, index in faltantes:
+                    schema_editor.add_index(model, index)
+                    self.stdout.write(self.style.SUCCESS(f'{model._meta.db_table}.{index.name}: creado'))
+            if connection.vendor == 'sqlite':
+                # estadísticas para que el planificador elija los índices nuevos
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS(f'{len(faltantes)} índices creados.'))
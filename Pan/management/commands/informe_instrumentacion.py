@@ -0,0 +1,36 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Pan import instrumentacion
+
+
+class Command(BaseCommand):
+    help = 'Resume por URL el archivo JSONL de la instrumentación (latencias, consultas y N+1).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', default=settings.INSTRUMENTACION_ARCHIVO)
+        parser.add_argument('--url', help='Sólo esta URL (nombre de la ruta).')
+        parser.add_argument('--vaciar', action='store_true', help='Borra el archivo después del informe.')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.exists(ruta):
+            raise CommandError(f'No existe {ruta}; active INSTRUMENTACION=1 y haga algunas peticiones.')
+        registros = instrumentacion.leer_archivo(ruta)
+        if options['url']:
+            registros = [r for r in registros if r['url'] == options['url']]
+
+        self.stdout.write(f"{'url':<24}{'n':>7}{'p50':>10}{'p95':>10}{'bd':>9}{'plant.':>9}{'consultas':>12}")
+        for fila in instrumentacion.resumen(registros):
+            self.stdout.write(
+                f"{fila['url']:<24}{fila['peticiones']:>7}{fila['p50_ms']:>10.2f}{fila['p95_ms']:>10.2f}"
+                f"{fila['db_ms']:>9.2f}{fila['plantilla_ms']:>9.2f}{fila['consultas']:>7.1f}/{fila['consultas_max']:<4}"
+            )
+            for sql, n in fila['duplicadas']:
+                self.stdout.write(f'    {n}x {sql[:110]}')
+
+        if options['vaciar']:
+            os.remove(ruta)
+            self.stdout.write(self.style.SUCCESS(f'{ruta} borrado.'))
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from Pan import inventario
+
+
+def _momento(texto):
+    dia = parse_date(texto)
+    if dia is not None:
+        # un día completo: el stock al cierre
+        valor = datetime.combine(dia, datetime.max.time())
+    else:
+        valor = parse_datetime(texto)
+        if valor is None:
+            raise CommandError(f'Fecha no válida: {texto} (use AAAA-MM-DD o AAAA-MM-DD HH:MM).')
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+class Command(BaseCommand):
+    help = 'Libro de movimientos de inventario: fotos de stock, reconstrucción y stock en una fecha.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--foto', action='store_true', help='Guarda una foto del stock actual (para cron).')
+        parser.add_argument(
+            '--reconstruir', action='store_true',
+            help='Rehace el libro desde compras, producción y ventas (borra movimientos y fotos).',
+        )
+        parser.add_argument('--stock-en', metavar='FECHA', help='Muestra el stock en FECHA.')
+        parser.add_argument('--insumo', type=int, nargs='+', metavar='ID', help='Con --stock-en: sólo estos insumos.')
+        parser.add_argument('--producto', type=int, nargs='+', metavar='ID', help='Con --stock-en: sólo estos productos.')
+
+    def handle(self, *args, **options):
+        if not (options['foto'] or options['reconstruir'] or options['stock_en']):
+            raise CommandError('Indique --foto, --reconstruir o --stock-en FECHA.')
+
+        if options['reconstruir']:
+            creados = inventario.reconstruir()
+            self.stdout.write(self.style.SUCCESS(f'{creados} movimientos creados y foto tomada.'))
+        if options['foto']:
+            filas = inventario.tomar_foto()
+            self.stdout.write(self.style.SUCCESS(f'Foto de stock: {filas} artículos.'))
+
+        if options['stock_en']:
+            momento = _momento(options['stock_en'])
+            consultas = []
+            if options['producto'] or not options['insumo']:
+                consultas.append((inventario.PRODUCTO, options['producto']))
+            if options['insumo'] or not options['producto']:
+                consultas.append((inventario.INSUMO, options['insumo']))
+            for tipo, ids in consultas:
+                stock = inventario.stock_en(tipo, momento, ids)
+                nombres = dict(inventario.MODELOS[tipo].objects.filter(pk__in=list(stock)).values_list('pk', 'nombre'))
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{tipo} al {momento:%Y-%m-%d %H:%M}'))
+                for pk in sorted(stock):
+                    self.stdout.write(f'{pk:>6}  {nombres.get(pk, "?")[:40]:<40} {stock[pk]:>12}')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Pan import cache_dashboard, pronostico
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el consumo diario previsto de cada insumo (medias móviles de 7 y 28 días de '
+        'producción) y sus puntos de reorden. Pensado para ejecutarse a diario desde cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sugerencias', action='store_true', help='Muestra los pedidos sugeridos por proveedor.')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = pronostico.calcular()
+        cache_dashboard.invalidar()
+        self.stdout.write(self.style.SUCCESS(
+            f'Pronóstico de {total} insumos en {time.perf_counter() - inicio:.2f} s.'
+        ))
+
+        if options['sugerencias']:
+            for grupo in pronostico.sugerencias():
+                proveedor = grupo['proveedor'].nombre if grupo['proveedor'] else 'Sin proveedor'
+                self.stdout.write(self.style.MIGRATE_HEADING(proveedor))
+                for i in grupo['insumos']:
+                    self.stdout.write(
+                        f"  {i['nombre'][:36]:<36} stock {i['stock']:>10}  {i['dias_cobertura']:>6} días  "
+                        f"pedir {i['cantidad']:>8}"
+                    )
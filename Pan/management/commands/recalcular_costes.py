@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Pan import costos
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el costo de todos los productos PAN desde sus recetas. Con --compras asigna '
+        'antes a insumos y bebidas el precio medio de sus compras (puesta en marcha).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compras', action='store_true', help='Parte del precio medio histórico de las compras.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['compras']:
+                insumos, productos = costos.promedios_historicos()
+                self.stdout.write(f'Coste promedio de compras: {insumos} insumos, {productos} productos.')
+            recetas = costos.recalcular_recetas()
+        self.stdout.write(self.style.SUCCESS(f'Costo de receta actualizado en {recetas} productos.'))
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Pan.rollup import reconstruir
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor!r} (use AAAA-MM-DD).')
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la tabla VentaDiaria a partir de Venta/DetalleVenta (todo el historial o un rango).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--hasta', help='Último día a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por bulk_create.')
+
+    def handle(self, *args, **options):
+        desde = _fecha(options['desde']) if options['desde'] else None
+        hasta = _fecha(options['hasta']) if options['hasta'] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta.')
+        creadas = reconstruir(desde, hasta, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'VentaDiaria: {creadas} filas recalculadas.'))
@@ -0,0 +1,154 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompraInsumo',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'CompraInsumo',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleVenta',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'DetalleVenta',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Insumo',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('stock', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('coste', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+            options={
+                'db_table': 'Insumo',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Produccion',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha_hora', models.DateTimeField()),
+                ('cantidad', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'Produccion',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Producto',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('tipo_producto', models.CharField(choices=[('PAN', 'PAN'), ('BEBIDA', 'BEBIDA')], max_length=10)),
+                ('costo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_venta', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+            ],
+            options={
+                'db_table': 'Producto',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductoInsumo',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad_utilizada', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+            options={
+                'db_table': 'ProductoInsumo',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductoProveedor',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'ProductoProveedor',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Proveedor',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('direccion', models.CharField(max_length=200)),
+                ('telefono', models.CharField(max_length=20)),
+                ('tipo_proveedor', models.CharField(choices=[('INSUMOS', 'INSUMOS'), ('BEBIDAS', 'BEBIDAS')], max_length=50)),
+            ],
+            options={
+                'db_table': 'Proveedor',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Vendedor',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+            ],
+            options={
+                'db_table': 'Vendedor',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Venta',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha_hora', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'Venta',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('dia', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Pan.producto')),
+                ('vendedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Pan.vendedor')),
+            ],
+            options={
+                'db_table': 'VentaDiaria',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'producto', 'vendedor'), name='ventadiaria_dia_producto_vendedor')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pan', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaCliente',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Pan.venta')),
+            ],
+            options={
+                'db_table': 'VentaCliente',
+            },
+        ),
+    ]
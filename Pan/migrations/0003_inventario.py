@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pan', '0002_venta_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FotoStock',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('PRODUCTO', 'PRODUCTO'), ('INSUMO', 'INSUMO')], max_length=8)),
+                ('articulo_id', models.IntegerField()),
+                ('fecha', models.DateTimeField()),
+                ('stock', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                'db_table': 'FotoStock',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'tipo', 'articulo_id'), name='fotostock_fecha_articulo')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('PRODUCTO', 'PRODUCTO'), ('INSUMO', 'INSUMO')], max_length=8)),
+                ('articulo_id', models.IntegerField()),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('motivo', models.CharField(choices=[('VENTA', 'VENTA'), ('COMPRA', 'COMPRA'), ('PRODUCCION', 'PRODUCCION'), ('CONSUMO', 'CONSUMO'), ('AJUSTE', 'AJUSTE')], max_length=10)),
+                ('origen_id', models.IntegerField(null=True)),
+                ('fecha', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'MovimientoInventario',
+                'indexes': [models.Index(fields=['tipo', 'articulo_id', 'fecha'], name='movimiento_articulo_fecha'), models.Index(fields=['fecha'], name='movimiento_fecha')],
+            },
+        ),
+    ]
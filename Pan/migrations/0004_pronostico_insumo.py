@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pan', '0003_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoInsumo',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('consumo_7', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('consumo_28', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('consumo_diario', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('punto_reorden', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('nivel_objetivo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('calculado', models.DateTimeField()),
+                ('insumo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pronostico', to='Pan.insumo')),
+                ('proveedor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='Pan.proveedor')),
+            ],
+            options={
+                'db_table': 'PronosticoInsumo',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# tablas (no gestionadas) que se indexan y código de tipo en el rowid; ver Pan/busqueda.py
+TABLAS = (('Producto', 1), ('Insumo', 2), ('Proveedor', 3))
+
+
+def crear_indice(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor != 'sqlite':
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS "BusquedaNombre" USING fts5('
+            "nombre, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        existentes = set(conexion.introspection.table_names(cursor))
+        for tabla, codigo in TABLAS:
+            if tabla in existentes:
+                cursor.execute(
+                    f'INSERT INTO "BusquedaNombre" (rowid, nombre) '
+                    f'SELECT "id" * 4 + {codigo}, COALESCE("nombre", \'\') FROM "{tabla}"'
+                )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS "BusquedaNombre"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pan', '0004_pronostico_insumo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
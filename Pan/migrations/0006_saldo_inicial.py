@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pan', '0005_busqueda_nombre'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoInicial',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('PRODUCTO', 'PRODUCTO'), ('INSUMO', 'INSUMO')], max_length=8)),
+                ('articulo_id', models.IntegerField()),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fecha', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'SaldoInicial',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'articulo_id'), name='saldoinicial_articulo')],
+            },
+        ),
+    ]
@@ -1,4 +1,8 @@
 from django.db import models
+from django.utils import timezone
+
+# Las tablas con managed = False no las crea Django y las migraciones ignoran
+# sus Meta.indexes: esos índices se comprueban/crean con `manage.py indices`.
 
 class Proveedor(models.Model):
     id = models.AutoField(primary_key=True)
@@ -11,6 +15,9 @@ class Proveedor(models.Model):
         db_table = 'Proveedor'
         managed = False
 
+    def __str__(self):
+        return self.nombre
+
 class Insumo(models.Model):
     id = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100)
@@ -20,6 +27,12 @@ class Insumo(models.Model):
     class Meta:
         db_table = 'Insumo'
         managed = False
+        indexes = [
+            models.Index(fields=['stock'], name='insumo_stock'),
+        ]
+
+    def __str__(self):
+        return self.nombre
 
 class Producto(models.Model):
     id = models.AutoField(primary_key=True)
@@ -33,6 +46,9 @@ class Producto(models.Model):
         db_table = 'Producto'
         managed = False
 
+    def __str__(self):
+        return self.nombre
+
 class ProductoInsumo(models.Model):
     id = models.AutoField(primary_key=True)
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
@@ -42,6 +58,9 @@ class ProductoInsumo(models.Model):
     class Meta:
         db_table = 'ProductoInsumo'
         managed = False
+        indexes = [
+            models.Index(fields=['producto'], name='productoinsumo_producto'),
+        ]
 
 class CompraInsumo(models.Model):
     id = models.AutoField(primary_key=True)
@@ -54,6 +73,10 @@ class CompraInsumo(models.Model):
     class Meta:
         db_table = 'CompraInsumo'
         managed = False
+        indexes = [
+            models.Index(fields=['fecha', 'id'], name='compra_insumo_fecha'),
+            models.Index(fields=['insumo'], name='compra_insumo_insumo'),
+        ]
 
 class ProductoProveedor(models.Model):
     id = models.AutoField(primary_key=True)
@@ -66,6 +89,10 @@ class ProductoProveedor(models.Model):
     class Meta:
         db_table = 'ProductoProveedor'
         managed = False
+        indexes = [
+            models.Index(fields=['fecha', 'id'], name='producto_proveedor_fecha'),
+            models.Index(fields=['producto'], name='producto_proveedor_producto'),
+        ]
 
 class Produccion(models.Model):
     id = models.AutoField(primary_key=True)
@@ -77,6 +104,10 @@ class Produccion(models.Model):
     class Meta:
         db_table = 'Produccion'
         managed = False
+        indexes = [
+            models.Index(fields=['fecha_hora', 'id'], name='produccion_fecha_hora'),
+            models.Index(fields=['producto'], name='produccion_producto'),
+        ]
 
 class Vendedor(models.Model):
     id = models.AutoField(primary_key=True)
@@ -86,14 +117,22 @@ class Vendedor(models.Model):
         db_table = 'Vendedor'
         managed = False
 
+    def __str__(self):
+        return self.nombre
+
 class Venta(models.Model):
     id = models.AutoField(primary_key=True)
     vendedor = models.ForeignKey(Vendedor, on_delete=models.CASCADE)
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    # default (no auto_now_add) para poder registrar ventas diferidas con su hora real
+    fecha_hora = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'Venta'
         managed = False
+        indexes = [
+            models.Index(fields=['fecha_hora', 'id'], name='venta_fecha_hora'),
+            models.Index(fields=['vendedor'], name='venta_vendedor'),
+        ]
 
 class DetalleVenta(models.Model):
     id = models.AutoField(primary_key=True)
@@ -104,3 +143,106 @@ class DetalleVenta(models.Model):
     class Meta:
         db_table = 'DetalleVenta'
         managed = False
+        indexes = [
+            models.Index(fields=['venta'], name='detalleventa_venta'),
+            models.Index(fields=['producto'], name='detalleventa_producto'),
+        ]
+
+class VentaDiaria(models.Model):
+    # acumulado por día, producto y vendedor; lo mantiene Pan.rollup al registrar ventas
+    id = models.AutoField(primary_key=True)
+    dia = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    vendedor = models.ForeignKey(Vendedor, on_delete=models.CASCADE)
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'VentaDiaria'
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'producto', 'vendedor'], name='ventadiaria_dia_producto_vendedor'),
+        ]
+
+class VentaCliente(models.Model):
+    # clave de idempotencia que genera el cliente (tablet/POS) para cada venta;
+    # un reintento con la misma clave devuelve la venta ya registrada
+    id = models.AutoField(primary_key=True)
+    clave = models.CharField(max_length=64, unique=True)
+    venta = models.ForeignKey(Venta, on_delete=models.CASCADE)
+    creada = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'VentaCliente'
+
+class MovimientoInventario(models.Model):
+    # libro de movimientos de stock (sólo se insertan filas); lo escribe Pan.inventario
+    # desde ventas, compras y producción. ``origen_id`` es la fila que lo causó:
+    # Venta (VENTA), CompraInsumo/ProductoProveedor (COMPRA), Produccion (PRODUCCION, CONSUMO)
+    TIPOS = [('PRODUCTO', 'PRODUCTO'), ('INSUMO', 'INSUMO')]
+    MOTIVOS = [
+        ('VENTA', 'VENTA'), ('COMPRA', 'COMPRA'), ('PRODUCCION', 'PRODUCCION'),
+        ('CONSUMO', 'CONSUMO'), ('AJUSTE', 'AJUSTE'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    tipo = models.CharField(max_length=8, choices=TIPOS)
+    articulo_id = models.IntegerField()
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    motivo = models.CharField(max_length=10, choices=MOTIVOS)
+    origen_id = models.IntegerField(null=True)
+    fecha = models.DateTimeField()
+
+    class Meta:
+        db_table = 'MovimientoInventario'
+        indexes = [
+            models.Index(fields=['tipo', 'articulo_id', 'fecha'], name='movimiento_articulo_fecha'),
+            models.Index(fields=['fecha'], name='movimiento_fecha'),
+        ]
+
+class FotoStock(models.Model):
+    # stock de cada artículo en un instante (incluye los movimientos con fecha <= fecha);
+    # se toman periódicamente con `manage.py inventario --foto`
+    id = models.AutoField(primary_key=True)
+    tipo = models.CharField(max_length=8, choices=MovimientoInventario.TIPOS)
+    articulo_id = models.IntegerField()
+    fecha = models.DateTimeField()
+    stock = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = 'FotoStock'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'tipo', 'articulo_id'], name='fotostock_fecha_articulo'),
+        ]
+
+class SaldoInicial(models.Model):
+    # stock de partida de cada artículo, anterior a las compras, producción y ventas registradas;
+    # la conciliación (Pan.conciliacion) lo suma a esos historiales. Lo fija el alta del artículo
+    # o, para bases con historial previo, `manage.py conciliar_stock --saldo-inicial`
+    id = models.AutoField(primary_key=True)
+    tipo = models.CharField(max_length=8, choices=MovimientoInventario.TIPOS)
+    articulo_id = models.IntegerField()
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    fecha = models.DateTimeField()
+
+    class Meta:
+        db_table = 'SaldoInicial'
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'articulo_id'], name='saldoinicial_articulo'),
+        ]
+
+class PronosticoInsumo(models.Model):
+    # consumo diario previsto por insumo; lo recalcula `manage.py pronosticar` (Pan.pronostico)
+    # a partir de la producción. Los días de cobertura y la cantidad a pedir se obtienen
+    # comparando punto_reorden / nivel_objetivo con el stock actual del insumo.
+    id = models.AutoField(primary_key=True)
+    insumo = models.OneToOneField(Insumo, on_delete=models.CASCADE, related_name='pronostico')
+    proveedor = models.ForeignKey(Proveedor, null=True, on_delete=models.SET_NULL)  # el de la última compra
+    consumo_7 = models.DecimalField(max_digits=12, decimal_places=3)  # media diaria, últimos 7 días
+    consumo_28 = models.DecimalField(max_digits=12, decimal_places=3)  # media diaria, últimos 28 días
+    consumo_diario = models.DecimalField(max_digits=12, decimal_places=3)  # el mayor de los dos
+    punto_reorden = models.DecimalField(max_digits=12, decimal_places=2)
+    nivel_objetivo = models.DecimalField(max_digits=12, decimal_places=2)
+    calculado = models.DateTimeField()
+
+    class Meta:
+        db_table = 'PronosticoInsumo'
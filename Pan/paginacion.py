@@ -0,0 +1,57 @@
+"""
+Paginación por cursor (keyset) sobre (fecha, id), de la más reciente a la más antigua.
+
+En lugar de ``OFFSET`` (que recorre y descarta todas las filas anteriores),
+cada página continúa desde la última fila de la anterior con
+``WHERE fecha < f OR (fecha = f AND id < i)``; con el índice (fecha, id) cada
+página cuesta una búsqueda acotada sin importar lo profundo que se navegue.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+TAMANO_PAGINA = 50
+TAMANO_MAXIMO = 200
+
+
+def codificar_cursor(fecha, pk):
+    valor = f'{fecha.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(valor).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) o ``None`` si el cursor está vacío o es inválido."""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pk = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        return datetime.fromisoformat(fecha), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def tamano_pagina(valor, por_defecto=TAMANO_PAGINA):
+    try:
+        return max(1, min(int(valor), TAMANO_MAXIMO))
+    except (TypeError, ValueError):
+        return por_defecto
+
+
+def pagina(qs, campo_fecha, cursor=None, tamano=TAMANO_PAGINA):
+    """Devuelve (filas, cursor_siguiente) de ``qs`` ordenado por (campo_fecha, id) descendente.
+
+    ``cursor_siguiente`` es ``None`` cuando no hay más filas.
+    """
+    posicion = decodificar_cursor(cursor)
+    if posicion:
+        fecha, pk = posicion
+        qs = qs.filter(Q(**{f'{campo_fecha}__lt': fecha}) | Q(**{campo_fecha: fecha, 'id__lt': pk}))
+    filas = list(qs.order_by(f'-{campo_fecha}', '-id')[:tamano + 1])
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(getattr(ultima, campo_fecha), ultima.pk)
+    return filas, siguiente
@@ -0,0 +1,144 @@
+"""
+Planificador de capacidad de producción.
+
+Con las recetas (``ProductoInsumo``) de los productos ``PAN`` y el stock de
+``Insumo`` responde cuántas unidades de cada producto se pueden hornear con
+lo que hay y qué insumo lo limita, y si un plan de varios productos cabe en
+el stock actual, antes de enviarlo a ``produccion``.
+
+La matriz de recetas (filas dispersas: producto -> [(insumo, uso)]) y el
+vector de stock se guardan en la caché ``default`` bajo una versión cada uno,
+igual que el catálogo: la de recetas sube al guardar/borrar recetas,
+productos o insumos (``signals.py``) y la de stock al confirmar compras de
+insumos, producción y ajustes. El cálculo recorre la matriz una vez, sin
+consultas.
+"""
+import time
+from decimal import Decimal
+
+from django.core.cache import caches
+
+from .models import Insumo, Producto, ProductoInsumo
+
+CLAVE_RECETAS = 'planificador:recetas'
+CLAVE_STOCK = 'planificador:stock'
+TIMEOUT = 24 * 60 * 60
+
+
+def _cache():
+    return caches['default']
+
+
+def _version(clave):
+    cache = _cache()
+    actual = cache.get(clave)
+    if actual is None:
+        cache.add(clave, int(time.time() * 1000), timeout=None)
+        actual = cache.get(clave)
+    return actual
+
+
+def _subir(clave):
+    cache = _cache()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, int(time.time() * 1000), timeout=None)
+
+
+def invalidar_recetas():
+    _subir(CLAVE_RECETAS)
+
+
+def invalidar_stock():
+    _subir(CLAVE_STOCK)
+
+
+def _obtener(clave, construir):
+    cache = _cache()
+    k = f'{clave}:{_version(clave)}'
+    valor = cache.get(k)
+    if valor is None:
+        valor = construir()
+        cache.set(k, valor, timeout=TIMEOUT)
+    return valor
+
+
+def _construir_matriz():
+    productos = list(Producto.objects.filter(tipo_producto='PAN').order_by('nombre').values_list('id', 'nombre'))
+    filas = {pid: {} for pid, _nombre in productos}
+    usos = ProductoInsumo.objects.filter(
+        producto__tipo_producto='PAN', cantidad_utilizada__gt=0
+    ).values_list('producto_id', 'insumo_id', 'cantidad_utilizada')
+    for pid, iid, uso in usos:
+        fila = filas[pid]
+        fila[iid] = fila.get(iid, Decimal('0')) + Decimal(uso)
+    return {
+        'productos': productos,
+        'filas': {pid: tuple(fila.items()) for pid, fila in filas.items()},
+    }
+
+
+def _construir_stock():
+    return {pk: (nombre, Decimal(stock or 0)) for pk, nombre, stock in Insumo.objects.values_list('id', 'nombre', 'stock')}
+
+
+def matriz():
+    """``{'productos': [(id, nombre)], 'filas': {producto_id: ((insumo_id, uso), ...)}}`` en caché."""
+    return _obtener(CLAVE_RECETAS, _construir_matriz)
+
+
+def stock():
+    """``{insumo_id: (nombre, stock)}`` en caché."""
+    return _obtener(CLAVE_STOCK, _construir_stock)
+
+
+def capacidad():
+    """Máximo producible de cada producto ``PAN`` con el stock actual y su insumo limitante.
+
+    Devuelve una lista de dicts ``id``, ``nombre``, ``maximo`` y ``limitante``
+    (``{'id', 'nombre', 'stock', 'uso'}``). Un producto sin receta no tiene
+    límite: ``maximo`` y ``limitante`` son ``None``.
+    """
+    m, existencias = matriz(), stock()
+    resultado = []
+    for pid, nombre in m['productos']:
+        maximo, limitante = None, None
+        for iid, uso in m['filas'][pid]:
+            _n, disponible = existencias.get(iid, ('', Decimal('0')))
+            posible = max(int(disponible // uso), 0)
+            if maximo is None or posible < maximo:
+                maximo, limitante = posible, (iid, uso)
+        fila = {'id': pid, 'nombre': nombre, 'maximo': maximo, 'limitante': None}
+        if limitante:
+            iid, uso = limitante
+            nombre_insumo, disponible = existencias.get(iid, (f'ID {iid}', Decimal('0')))
+            fila['limitante'] = {'id': iid, 'nombre': nombre_insumo, 'stock': disponible, 'uso': uso}
+        resultado.append(fila)
+    return resultado
+
+
+def evaluar(plan):
+    """Comprueba si ``plan`` ({producto_id: cantidad}) cabe en el stock actual.
+
+    Devuelve ``{'factible', 'faltantes', 'consumo'}``: ``consumo`` es la lista
+    de insumos requeridos con su stock y lo que quedaría, y ``faltantes`` los
+    que no alcanzan (mismo formato que ``StockInsuficiente.insuficientes``).
+    Lanza ``ValueError`` si el plan incluye productos que no son ``PAN``.
+    """
+    m, existencias = matriz(), stock()
+    desconocidos = sorted(set(plan) - set(m['filas']))
+    if desconocidos:
+        raise ValueError(f'No son productos de panadería: {", ".join(map(str, desconocidos))}.')
+    requerido = {}
+    for pid, cantidad in plan.items():
+        for iid, uso in m['filas'][pid]:
+            requerido[iid] = requerido.get(iid, Decimal('0')) + uso * cantidad
+
+    consumo, faltantes = [], []
+    for iid, total in sorted(requerido.items()):
+        nombre, disponible = existencias.get(iid, (f'ID {iid}', Decimal('0')))
+        consumo.append({'id': iid, 'nombre': nombre, 'disponible': disponible, 'requerido': total, 'restante': disponible - total})
+        if disponible < total:
+            faltantes.append({'id': iid, 'nombre': nombre, 'disponible': float(disponible), 'requerido': total})
+    return {'factible': not faltantes, 'faltantes': faltantes, 'consumo': consumo}
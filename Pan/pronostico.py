@@ -0,0 +1,133 @@
+"""
+Pronóstico de consumo de insumos y sugerencias de reposición.
+
+``calcular`` (comando ``pronosticar``, pensado para cron) obtiene el consumo
+diario de cada insumo de los últimos ``VENTANA`` días completos con una sola
+consulta agrupada sobre ``Produccion`` × ``ProductoInsumo``, calcula las
+medias móviles de 7 y 28 días en una pasada y reescribe ``PronosticoInsumo``.
+
+Lo guardado no depende del stock: el punto de reorden y el nivel objetivo
+son consumo × días. Los días de cobertura y la cantidad a pedir se derivan en
+la misma consulta de lectura comparándolos con el stock actual, así el
+dashboard y las sugerencias siguen exactos entre dos ejecuciones sin volver
+a recorrer el historial.
+"""
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .fechas import filtro_rango
+from .models import CompraInsumo, Insumo, Produccion, PronosticoInsumo
+
+VENTANA = 28
+CORTA = 7
+MILESIMAS = Decimal('0.001')
+CENTAVOS = Decimal('0.01')
+
+
+def consumo_diario(desde, hasta):
+    """{insumo_id: {dia: cantidad}} consumida por la producción en los días [desde, hasta]."""
+    filas = Produccion.objects.filter(
+        producto__productoinsumo__cantidad_utilizada__gt=0, **filtro_rango('fecha_hora', desde, hasta)
+    ).values(
+        insumo_id=F('producto__productoinsumo__insumo_id'), dia=TruncDate('fecha_hora')
+    ).annotate(
+        total=Sum(F('cantidad') * F('producto__productoinsumo__cantidad_utilizada'))
+    ).order_by()
+    serie = {}
+    for fila in filas:
+        serie.setdefault(fila['insumo_id'], {})[fila['dia']] = Decimal(fila['total'] or 0)
+    return serie
+
+
+def calcular(hoy=None):
+    """Recalcula ``PronosticoInsumo`` para todos los insumos y devuelve cuántos se guardaron.
+
+    El día en curso no cuenta (está incompleto): la ventana termina ayer.
+    """
+    hoy = hoy or timezone.localdate()
+    hasta = hoy - timedelta(days=1)
+    desde = hoy - timedelta(days=VENTANA)
+    inicio_corta = hoy - timedelta(days=CORTA)
+    serie = consumo_diario(desde, hasta)
+
+    ultima_compra = CompraInsumo.objects.filter(insumo_id=OuterRef('pk')).order_by('-fecha', '-id').values('proveedor_id')[:1]
+    insumos = Insumo.objects.annotate(proveedor_id=Subquery(ultima_compra)).values_list('id', 'proveedor_id')
+
+    plazo = settings.PRONOSTICO_PLAZO_DIAS + settings.PRONOSTICO_SEGURIDAD_DIAS
+    objetivo = settings.PRONOSTICO_OBJETIVO_DIAS
+    ahora = timezone.now()
+    filas = []
+    for insumo_id, proveedor_id in insumos:
+        dias = serie.get(insumo_id, {})
+        media_28 = sum(dias.values(), Decimal('0')) / VENTANA
+        media_7 = sum((c for d, c in dias.items() if d >= inicio_corta), Decimal('0')) / CORTA
+        # la mayor de las dos: reacciona a un aumento reciente sin olvidar la media del mes
+        diario = max(media_7, media_28)
+        filas.append(PronosticoInsumo(
+            insumo_id=insumo_id,
+            proveedor_id=proveedor_id,
+            consumo_7=media_7.quantize(MILESIMAS),
+            consumo_28=media_28.quantize(MILESIMAS),
+            consumo_diario=diario.quantize(MILESIMAS),
+            punto_reorden=(diario * plazo).quantize(CENTAVOS),
+            nivel_objetivo=(diario * objetivo).quantize(CENTAVOS),
+            calculado=ahora,
+        ))
+
+    with transaction.atomic():
+        PronosticoInsumo.objects.all().delete()
+        PronosticoInsumo.objects.bulk_create(filas, batch_size=500)
+    return len(filas)
+
+
+def con_stock():
+    """``PronosticoInsumo`` con el stock actual, ``dias_cobertura`` y ``sugerido`` anotados."""
+    decimal = DecimalField(max_digits=14, decimal_places=3)
+    return PronosticoInsumo.objects.annotate(
+        nombre=F('insumo__nombre'),
+        stock=F('insumo__stock'),
+        dias_cobertura=ExpressionWrapper(F('insumo__stock') / F('consumo_diario'), output_field=decimal),
+        sugerido=ExpressionWrapper(F('nivel_objetivo') - F('insumo__stock'), output_field=decimal),
+    )
+
+
+def por_reponer():
+    """Insumos cuyo stock actual está por debajo de su punto de reorden, los más urgentes primero."""
+    return con_stock().filter(consumo_diario__gt=0, insumo__stock__lt=F('punto_reorden')).order_by('dias_cobertura')
+
+
+def _redondear(cantidad):
+    return Decimal(cantidad).quantize(Decimal('1'), rounding=ROUND_CEILING)
+
+
+def sugerencias():
+    """Pedidos sugeridos agrupados por proveedor (el de la última compra de cada insumo).
+
+    Devuelve una lista de dicts ``proveedor`` (``None`` si el insumo nunca se
+    compró) e ``insumos``, cada uno con ``id``, ``nombre``, ``stock``,
+    ``consumo_diario``, ``dias_cobertura`` y ``cantidad`` (unidades enteras).
+    """
+    grupos = {}
+    filas = por_reponer().select_related('proveedor').order_by('proveedor__nombre', 'dias_cobertura')
+    for p in filas:
+        grupo = grupos.setdefault(p.proveedor_id, {'proveedor': p.proveedor, 'insumos': []})
+        grupo['insumos'].append({
+            'id': p.insumo_id,
+            'nombre': p.nombre,
+            'stock': Decimal(p.stock or 0),
+            'consumo_diario': p.consumo_diario,
+            'dias_cobertura': Decimal(p.dias_cobertura or 0).quantize(Decimal('0.1')),
+            'cantidad': _redondear(p.sugerido),
+        })
+    return list(grupos.values())
+
+
+def calculado():
+    """Fecha del último cálculo o ``None`` si nunca se ejecutó."""
+    return PronosticoInsumo.objects.order_by('-calculado').values_list('calculado', flat=True).first()
@@ -0,0 +1,41 @@
+"""
+Caché de recetas (lista de materiales) por producto.
+
+Guarda, para cada ``producto_id``, los insumos requeridos por unidad ya
+agrupados ({insumo_id: cantidad}). Las entradas se invalidan desde
+``Pan.signals`` cuando se guarda o borra un ``ProductoInsumo``.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from .models import ProductoInsumo
+
+CLAVE_RECETA = 'receta:{}'
+
+
+def recetas(producto_ids):
+    """Devuelve {producto_id: {insumo_id: cantidad por unidad}}.
+
+    Las recetas que no están en caché se cargan con una sola consulta.
+    """
+    claves = {CLAVE_RECETA.format(pid): pid for pid in set(producto_ids)}
+    en_cache = cache.get_many(list(claves))
+    resultado = {claves[k]: receta for k, receta in en_cache.items()}
+
+    faltan = [pid for k, pid in claves.items() if k not in en_cache]
+    if faltan:
+        nuevas = {pid: {} for pid in faltan}
+        filas = ProductoInsumo.objects.filter(producto_id__in=faltan).values_list(
+            'producto_id', 'insumo_id', 'cantidad_utilizada'
+        )
+        for pid, iid, uso in filas:
+            receta = nuevas[pid]
+            receta[iid] = receta.get(iid, Decimal('0')) + Decimal(uso or 0)
+        cache.set_many({CLAVE_RECETA.format(pid): r for pid, r in nuevas.items()}, timeout=None)
+        resultado.update(nuevas)
+    return resultado
+
+
+def invalidar_recetas(*producto_ids):
+    cache.delete_many([CLAVE_RECETA.format(pid) for pid in producto_ids if pid is not None])
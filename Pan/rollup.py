@@ -0,0 +1,91 @@
+"""
+Mantenimiento de la tabla de acumulados diarios ``VentaDiaria``.
+
+``acumular_venta`` se llama dentro de la transacción de cada venta y suma sus
+detalles con un único INSERT ... ON CONFLICT DO UPDATE. ``reconstruir`` vuelve
+a calcular un rango de días desde ``DetalleVenta`` (comando
+``reconstruir_ventas_diarias``).
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum, F, ExpressionWrapper, DecimalField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archivo import anios
+from .fechas import filtro_rango, rango_dias
+from .models import DetalleVenta, Producto, VentaDiaria
+
+
+def acumular_venta(venta):
+    """Suma las líneas de ``venta`` a sus filas de ``VentaDiaria`` (una sentencia)."""
+    q = connection.ops.quote_name
+    tabla = q(VentaDiaria._meta.db_table)
+    dia = timezone.localdate(venta.fecha_hora)
+    sql = f"""
+        INSERT INTO {tabla} ({q('dia')}, {q('producto_id')}, {q('vendedor_id')}, {q('unidades')}, {q('ingresos')})
+        SELECT %s, d.{q('producto_id')}, %s, SUM(d.{q('cantidad')}), SUM(d.{q('cantidad')} * p.{q('precio_venta')})
+        FROM {q(DetalleVenta._meta.db_table)} d
+        INNER JOIN {q(Producto._meta.db_table)} p ON p.{q('id')} = d.{q('producto_id')}
+        WHERE d.{q('venta_id')} = %s
+        GROUP BY d.{q('producto_id')}
+        ON CONFLICT ({q('dia')}, {q('producto_id')}, {q('vendedor_id')}) DO UPDATE SET
+            {q('unidades')} = {tabla}.{q('unidades')} + excluded.{q('unidades')},
+            {q('ingresos')} = {tabla}.{q('ingresos')} + excluded.{q('ingresos')}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [dia, venta.vendedor_id, venta.pk])
+
+
+def reconstruir(desde=None, hasta=None, lote=1000):
+    """Recalcula ``VentaDiaria`` para los días [desde, hasta] (ambos opcionales).
+
+    Borra las filas del rango y las vuelve a insertar agrupando ``DetalleVenta``
+    en la base de datos. Los años ya archivados (``archivo.py``) se excluyen
+    uno a uno, aunque los anteriores sigan en la base principal: sus detalles
+    ya no están y sus acumulados son lo único que queda de ellos. Devuelve el
+    número de filas creadas.
+    """
+    if desde and hasta and desde > hasta:
+        return 0
+    line_total = ExpressionWrapper(
+        F('cantidad') * F('producto__precio_venta'),
+        output_field=DecimalField(max_digits=18, decimal_places=2)
+    )
+    detalles = DetalleVenta.objects.filter(**filtro_rango('venta__fecha_hora', desde, hasta))
+    acumulados = VentaDiaria.objects.all()
+    if desde:
+        acumulados = acumulados.filter(dia__gte=desde)
+    if hasta:
+        acumulados = acumulados.filter(dia__lte=hasta)
+    for anio in anios():
+        inicio, fin = rango_dias(date(anio, 1, 1), date(anio, 12, 31))
+        detalles = detalles.exclude(venta__fecha_hora__gte=inicio, venta__fecha_hora__lt=fin)
+        acumulados = acumulados.exclude(dia__gte=date(anio, 1, 1), dia__lte=date(anio, 12, 31))
+
+    filas = detalles.annotate(dia=TruncDate('venta__fecha_hora')).values(
+        'dia', 'producto_id', 'venta__vendedor_id'
+    ).annotate(
+        total_unidades=Sum('cantidad'), total_ingresos=Sum(line_total)
+    ).order_by()
+
+    creadas = 0
+    with transaction.atomic():
+        acumulados.delete()
+        pendientes = []
+        for fila in filas.iterator(chunk_size=lote):
+            pendientes.append(VentaDiaria(
+                dia=fila['dia'],
+                producto_id=fila['producto_id'],
+                vendedor_id=fila['venta__vendedor_id'],
+                unidades=fila['total_unidades'] or 0,
+                ingresos=fila['total_ingresos'] or Decimal('0'),
+            ))
+            if len(pendientes) >= lote:
+                creadas += len(VentaDiaria.objects.bulk_create(pendientes))
+                pendientes = []
+        if pendientes:
+            creadas += len(VentaDiaria.objects.bulk_create(pendientes))
+    return creadas
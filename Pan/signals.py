@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from django.utils import timezone
+
+from . import busqueda, catalogo, costos, inventario, planificador
+from .models import Producto, Insumo, Proveedor, Vendedor, ProductoInsumo, SaldoInicial
+from .recetas import invalidar_recetas
+
+
+@receiver(pre_save, sender=ProductoInsumo)
+def _receta_cambia_producto(sender, instance, **kwargs):
+    # si la fila se mueve a otro producto, la receta anterior también cambia
+    if instance.pk:
+        anterior = sender.objects.filter(pk=instance.pk).values_list('producto_id', flat=True).first()
+        if anterior != instance.producto_id:
+            invalidar_recetas(anterior)
+            instance._producto_anterior = anterior
+
+
+@receiver(post_save, sender=ProductoInsumo)
+@receiver(post_delete, sender=ProductoInsumo)
+def _receta_modificada(sender, instance, **kwargs):
+    invalidar_recetas(instance.producto_id)
+    # en la misma transacción que el cambio de receta
+    costos.recalcular_recetas(producto_ids=[instance.producto_id, getattr(instance, '_producto_anterior', None)])
+
+
+@receiver(post_save, sender=Insumo)
+def _coste_insumo_modificado(sender, instance, **kwargs):
+    # coste editado a mano (admin); las compras lo cambian con UPDATE y recalculan ellas mismas
+    costos.recalcular_recetas(insumo_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Insumo)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_save, sender=Vendedor)
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Insumo)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_delete, sender=Vendedor)
+def _catalogo_modificado(sender, **kwargs):
+    # tras el commit, para que nadie cachee la versión nueva con datos sin confirmar
+    transaction.on_commit(catalogo.invalidar)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Insumo)
+@receiver(post_save, sender=Proveedor)
+def _nombre_guardado(sender, instance, **kwargs):
+    # el índice está en la misma base: se actualiza dentro de la transacción del cambio
+    busqueda.indexar(sender, instance.pk, instance.nombre)
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Insumo)
+@receiver(post_delete, sender=Proveedor)
+def _nombre_borrado(sender, instance, **kwargs):
+    busqueda.quitar(sender, instance.pk)
+
+
+TIPO_INVENTARIO = {Producto: inventario.PRODUCTO, Insumo: inventario.INSUMO}
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Insumo)
+def _articulo_creado(sender, instance, created, **kwargs):
+    # el stock del alta no viene de ninguna compra ni producción: es el saldo inicial de la conciliación
+    if created:
+        SaldoInicial.objects.update_or_create(
+            tipo=TIPO_INVENTARIO[sender], articulo_id=instance.pk,
+            defaults={'cantidad': instance.stock or 0, 'fecha': timezone.now()},
+        )
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Insumo)
+def _articulo_borrado(sender, instance, **kwargs):
+    # SQLite puede reutilizar el id del último artículo borrado
+    SaldoInicial.objects.filter(tipo=TIPO_INVENTARIO[sender], articulo_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=ProductoInsumo)
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Insumo)
+@receiver(post_delete, sender=ProductoInsumo)
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Insumo)
+def _planificador_modificado(sender, **kwargs):
+    transaction.on_commit(planificador.invalidar_recetas)
+    if sender is Insumo:
+        # el stock de un insumo también se edita a mano (admin)
+        transaction.on_commit(planificador.invalidar_stock)
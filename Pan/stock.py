@@ -0,0 +1,250 @@
+"""
+Movimientos de stock en bloque para Producto e Insumo.
+
+Cada operación se resuelve con una sola sentencia UPDATE (con un CASE por id),
+así el número de consultas y el tiempo que se mantienen los bloqueos no
+dependen de cuántas líneas tenga la venta, compra o producción.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, When, Value, F, DecimalField
+from django.utils import timezone
+
+from . import cache_dashboard, costos, eventos, inventario, planificador
+from .dashboard import delta_inventario, delta_venta
+from .models import (
+    Producto, Insumo, Venta, DetalleVenta, CompraInsumo, ProductoProveedor, Produccion, Proveedor, Vendedor,
+    VentaCliente,
+)
+from .recetas import recetas
+from .rollup import acumular_venta
+
+# modelo de compra -> (campo FK del artículo, modelo del artículo)
+ARTICULO_DE_COMPRA = {
+    CompraInsumo: ('insumo_id', Insumo),
+    ProductoProveedor: ('producto_id', Producto),
+}
+
+
+class StockInsuficiente(Exception):
+    """Se lanza cuando al menos una línea no tiene stock suficiente.
+
+    ``insuficientes`` es una lista de dicts con ``id``, ``nombre``,
+    ``disponible`` y ``requerido`` para mostrar al usuario.
+    """
+
+    def __init__(self, insuficientes):
+        super().__init__('Stock insuficiente')
+        self.insuficientes = insuficientes
+
+
+def _cantidad_por_id(cantidades):
+    # CASE id WHEN 1 THEN 3 WHEN 2 THEN 5 ... END
+    return Case(
+        *[When(pk=pk, then=Value(Decimal(qty))) for pk, qty in cantidades.items()],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def faltantes(modelo, cantidades):
+    """Devuelve las líneas de ``cantidades`` ({id: cantidad}) sin stock suficiente."""
+    objs = {o.id: o for o in modelo.objects.filter(pk__in=list(cantidades)).only('id', 'nombre', 'stock')}
+    insuficientes = []
+    for pk, qty in cantidades.items():
+        obj = objs.get(pk)
+        disponible = Decimal(obj.stock or 0) if obj else Decimal('0')
+        if disponible < Decimal(qty):
+            insuficientes.append({
+                'id': pk,
+                'nombre': obj.nombre if obj else f'ID {pk}',
+                'disponible': float(disponible),
+                'requerido': qty,
+            })
+    return insuficientes
+
+
+def descontar(modelo, cantidades):
+    """Descuenta ``cantidades`` ({id: cantidad}) del stock de ``modelo``.
+
+    Ejecuta un único ``UPDATE ... SET stock = stock - qty WHERE stock >= qty``.
+    Si el número de filas actualizadas no coincide con el de líneas, se
+    deshace el descuento completo y se lanza ``StockInsuficiente``.
+    """
+    if not cantidades:
+        return
+    try:
+        with transaction.atomic():
+            cantidad = _cantidad_por_id(cantidades)
+            actualizados = modelo.objects.filter(
+                pk__in=list(cantidades), stock__gte=cantidad
+            ).update(stock=F('stock') - cantidad)
+            if actualizados != len(cantidades):
+                raise StockInsuficiente([])
+    except StockInsuficiente:
+        # el savepoint ya se deshizo: el stock leído aquí es el original
+        raise StockInsuficiente(faltantes(modelo, cantidades))
+
+
+def incrementar(modelo, cantidades, importes=None):
+    """Suma ``cantidades`` ({id: cantidad}) al stock de ``modelo``.
+
+    Bloquea las filas afectadas en orden de id (evita interbloqueos entre
+    transacciones concurrentes) y aplica todos los incrementos en un UPDATE.
+    Con ``importes`` ({id: cantidad * precio}, una compra) el mismo UPDATE
+    actualiza el coste promedio ponderado. Devuelve el conjunto de ids
+    existentes; los inexistentes se ignoran.
+    """
+    if not cantidades:
+        return set()
+    ids = sorted(cantidades)
+    existentes = set(
+        modelo.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True)
+    )
+    if existentes:
+        cantidad = _cantidad_por_id({pk: cantidades[pk] for pk in existentes})
+        cambios = {'stock': F('stock') + cantidad}
+        if importes:
+            cambios[costos.CAMPO_COSTE[modelo]] = costos.promedio_ponderado(
+                modelo, {pk: cantidades[pk] for pk in existentes}, {pk: importes[pk] for pk in existentes}
+            )
+        modelo.objects.filter(pk__in=existentes).update(**cambios)
+    return existentes
+
+
+def registrar_venta(vendedor_id, required, fecha_hora=None):
+    """Crea la Venta con sus DetalleVenta y descuenta el stock de los productos.
+
+    ``required`` es {producto_id: cantidad}. Son seis consultas sin importar
+    el número de líneas: la comprobación del vendedor, el UPDATE condicional,
+    el INSERT de la venta, un ``bulk_create`` de los detalles, la suma a
+    ``VentaDiaria`` y los movimientos de inventario. Lanza
+    ``StockInsuficiente`` o ``ValueError`` (vendedor inexistente) sin
+    registrar nada.
+    """
+    # SQLite comprueba las claves foráneas recién al confirmar: un vendedor inexistente
+    # haría fallar el commit de todo el lote en el que va la venta (sincronización, escritor)
+    if not Vendedor.objects.filter(pk=vendedor_id).exists():
+        raise ValueError(f'No existe el vendedor con id {vendedor_id}.')
+    with transaction.atomic():
+        descontar(Producto, required)
+        venta = Venta.objects.create(vendedor_id=vendedor_id, fecha_hora=fecha_hora or timezone.now())
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=venta, producto_id=pid, cantidad=qty)
+            for pid, qty in required.items()
+        ])
+        acumular_venta(venta)
+        inventario.registrar([
+            inventario.movimiento(inventario.PRODUCTO, pid, -Decimal(qty), 'VENTA', venta.pk, venta.fecha_hora)
+            for pid, qty in required.items()
+        ])
+        transaction.on_commit(cache_dashboard.invalidar)
+        transaction.on_commit(lambda: eventos.publicar_delta(delta_venta, venta.pk))
+    return venta
+
+
+def registrar_venta_idempotente(clave, vendedor_id, required, fecha_hora=None):
+    """Como ``registrar_venta`` pero sin duplicar ventas reintentadas por el cliente.
+
+    Devuelve ``(venta_id, nueva)``; si ``clave`` ya se usó, ``nueva`` es False y
+    no se toca el stock. Si dos reintentos llegan a la vez, la restricción
+    única de ``VentaCliente.clave`` deshace el segundo.
+    """
+    existente = VentaCliente.objects.filter(clave=clave).values_list('venta_id', flat=True).first()
+    if existente:
+        return existente, False
+    try:
+        with transaction.atomic():
+            venta = registrar_venta(vendedor_id, required, fecha_hora)
+            VentaCliente.objects.create(clave=clave, venta=venta)
+    except IntegrityError:
+        existente = VentaCliente.objects.filter(clave=clave).values_list('venta_id', flat=True).first()
+        if existente is None:
+            raise
+        return existente, False
+    return venta.pk, True
+
+
+def registrar_compra(modelo, proveedor_id, lineas, fecha):
+    """Registra una compra de varias líneas y suma el stock comprado.
+
+    ``modelo`` es ``CompraInsumo`` o ``ProductoProveedor`` y ``lineas`` una
+    lista ya validada de (item_id, cantidad, precio_unitario). Se bloquean los
+    artículos en una consulta ordenada, se insertan las líneas con un
+    ``bulk_create`` y se aplican los incrementos sumados por artículo en un
+    UPDATE, que también actualiza el coste promedio; si son insumos se
+    recalcula el coste de las recetas que los usan. Lanza ``ValueError`` si
+    el proveedor o algún artículo no existe.
+    """
+    campo, articulo = ARTICULO_DE_COMPRA[modelo]
+    # como en registrar_venta: la clave foránea sólo se comprobaría al confirmar
+    if not Proveedor.objects.filter(pk=proveedor_id).exists():
+        raise ValueError(f'No existe el proveedor con id {proveedor_id}.')
+    totales, importes = {}, {}
+    for item_id, cantidad, precio in lineas:
+        totales[item_id] = totales.get(item_id, Decimal('0')) + cantidad
+        importes[item_id] = importes.get(item_id, Decimal('0')) + cantidad * precio
+
+    with transaction.atomic():
+        existentes = incrementar(articulo, totales, importes)
+        faltan = sorted(set(totales) - existentes)
+        if faltan:
+            raise ValueError(f'No existen los artículos con id: {", ".join(map(str, faltan))}.')
+        if articulo is Insumo:
+            costos.recalcular_recetas(insumo_ids=existentes)
+        transaction.on_commit(cache_dashboard.invalidar)
+        if articulo is Insumo:
+            transaction.on_commit(planificador.invalidar_stock)
+            transaction.on_commit(lambda: eventos.publicar_delta(delta_inventario))
+        compras = modelo.objects.bulk_create([
+            modelo(proveedor_id=proveedor_id, cantidad=cantidad, precio_unitario=precio, fecha=fecha, **{campo: item_id})
+            for item_id, cantidad, precio in lineas
+        ])
+        tipo = inventario.INSUMO if articulo is Insumo else inventario.PRODUCTO
+        inventario.registrar([
+            inventario.movimiento(tipo, getattr(c, campo), c.cantidad, 'COMPRA', c.pk, fecha) for c in compras
+        ])
+        return compras
+
+
+def registrar_produccion(lineas, fecha_hora):
+    """Registra un lote de producción de uno o varios productos.
+
+    ``lineas`` es {producto_id: cantidad}. Los insumos requeridos se calculan
+    con las recetas en caché y se descuentan en un solo UPDATE condicional;
+    el stock producido se suma en otro. Lanza ``StockInsuficiente`` si falta
+    algún insumo y ``ValueError`` si algún producto no existe.
+    """
+    required = {}
+    por_producto = recetas(lineas)
+    for pid, receta in por_producto.items():
+        for iid, uso in receta.items():
+            total = uso * Decimal(lineas[pid])
+            if total > 0:
+                required[iid] = required.get(iid, Decimal('0')) + total
+
+    with transaction.atomic():
+        descontar(Insumo, required)
+        existentes = incrementar(Producto, lineas)
+        faltan = sorted(set(lineas) - existentes)
+        if faltan:
+            raise ValueError(f'No existen los productos con id: {", ".join(map(str, faltan))}.')
+        transaction.on_commit(cache_dashboard.invalidar)
+        transaction.on_commit(planificador.invalidar_stock)
+        transaction.on_commit(lambda: eventos.publicar_delta(delta_inventario))
+        producciones = Produccion.objects.bulk_create([
+            Produccion(producto_id=pid, cantidad=cantidad, fecha_hora=fecha_hora)
+            for pid, cantidad in lineas.items()
+        ])
+        movimientos = []
+        for p in producciones:
+            movimientos.append(inventario.movimiento(
+                inventario.PRODUCTO, p.producto_id, Decimal(p.cantidad), 'PRODUCCION', p.pk, fecha_hora
+            ))
+            for iid, uso in por_producto.get(p.producto_id, {}).items():
+                if uso > 0:
+                    movimientos.append(inventario.movimiento(
+                        inventario.INSUMO, iid, -uso * Decimal(p.cantidad), 'CONSUMO', p.pk, fecha_hora
+                    ))
+        inventario.registrar(movimientos)
+        return producciones
@@ -1,11 +1,24 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),  # URL vacía -> dashboard
     path('dashboard/', views.dashboard, name='dashboard'),  # Ruta explícita para dashboard
+    path('dashboard/eventos/', views.dashboard_eventos, name='dashboard_eventos'),  # SSE: cambios en vivo del dashboard
     path('ventas/', views.ventas, name='ventas'),  # Nueva ruta para ventas
     path('compras/', views.Compras, name='Compras'),
     path('produccion/', views.produccion, name='produccion'),  # Ruta de producción (temporalmente apunta a home)
+    path('historial/<slug:tipo>/', views.historial, name='historial'),  # Historial paginado (compras, producción, ventas)
+    path('exportar/<slug:tipo>/', views.exportar, name='exportar'),  # Descarga CSV/XLSX de los libros
+    path('api/ventas/', api.api_ventas, name='api_ventas'),  # Ventas JSON para tablets (idempotentes)
+    path('api/ventas/sincronizar/', api.api_sincronizar_ventas, name='api_sincronizar_ventas'),  # Cola offline de ventas
+    path('api/catalogo/', api.api_catalogo, name='api_catalogo'),  # Catálogo JSON versionado (ETag) para los selectores
+    path('api/buscar/', api.api_buscar, name='api_buscar'),  # Búsqueda por nombre para autocompletar (FTS5)
+    path('planificador/', views.planificador, name='planificador'),  # Capacidad de producción con el stock actual
+    path('api/planificador/', api.api_planificador, name='api_planificador'),  # Capacidad y planes de producción (JSON)
+    path('reposicion/', views.reposicion, name='reposicion'),  # Pedidos sugeridos por proveedor (pronóstico)
+    path('margenes/', views.margenes, name='margenes'),  # Margen por producto con los costes promedio
+    path('importar/', views.importar, name='importar'),  # Importación masiva de precios, costes y recetas (CSV/JSON)
+    path('instrumentacion/', views.instrumentacion, name='instrumentacion'),  # Latencias y consultas por URL
     path('productos/', views.listar_productos, name='productos'),  # Ruta de producción (temporalmente apunta a home)
 ]
@@ -5,12 +5,23 @@ from .models import (
     Vendedor, Venta, DetalleVenta, Produccion, ProductoInsumo
 )
 from django.utils import timezone
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-from django.db import transaction
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
-from django.db.models.functions import TruncDate
-import json
+from datetime import date, datetime
+from django.db.models import Sum, F, ExpressionWrapper, DecimalField, Exists, OuterRef
+from django.http import FileResponse, Http404, StreamingHttpResponse
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+
+from . import cache_dashboard, costos, escritor, eventos, importacion, planificador as capacidad_produccion, pronostico
+from . import dashboard as datos_dashboard
+from .exportar import LIBROS, csv_stream, escribir_xlsx, filas as filas_libro
+from .facturas import leer_factura, lineas_formulario
+from .fechas import filtro_rango
+from .paginacion import pagina, tamano_pagina
+from .stock import ARTICULO_DE_COMPRA, StockInsuficiente, registrar_compra, registrar_produccion, registrar_venta
 
 def listar_productos(request):
     productos = Producto.objects.all()
@@ -20,9 +31,7 @@ def home(request):
     return render(request, 'base.html')
 
 def ventas(request):
-    vendedores = Vendedor.objects.order_by('nombre')
-    productos = Producto.objects.order_by('nombre')
-
+    # vendedores y productos los carga el navegador desde /api/catalogo/
     if request.method == 'POST':
         vendedor_id = request.POST.get('vendedor')
         producto_ids = request.POST.getlist('producto_id')
@@ -30,147 +39,76 @@ def ventas(request):
 
         if not vendedor_id:
             return render(request, 'ventas.html', {
-                'vendedores': vendedores,
-                'productos': productos,
                 'error': 'Seleccione un vendedor.'
             })
 
         # Construir diccionario con la cantidad requerida por producto (sumar filas duplicadas)
         required = {}
         for i, pid in enumerate(producto_ids):
-            if not pid:
-                continue
             try:
+                pid = int(pid)
                 qty = int(cantidades[i]) if i < len(cantidades) and cantidades[i] else 0
-            except Exception:
-                qty = 0
+            except (TypeError, ValueError):
+                continue
             if qty <= 0:
                 continue
             required[pid] = required.get(pid, 0) + qty
 
         if not required:
             return render(request, 'ventas.html', {
-                'vendedores': vendedores,
-                'productos': productos,
                 'error': 'Agregue al menos un producto con cantidad válida.'
             })
 
-        # Validar stock antes de crear la venta (y usar bloqueo para concurrencia)
-        with transaction.atomic():
-            productos_objs = Producto.objects.select_for_update().filter(pk__in=required.keys())
-            prod_map = {p.id: p for p in productos_objs}
-
-            insuficientes = []
-            for pid, qty in required.items():
-                p = prod_map.get(int(pid))
-                disponible = Decimal(p.stock or 0) if p else Decimal('0')
-                if disponible < Decimal(qty):
-                    insuficientes.append({
-                        'producto_id': pid,
-                        'nombre': p.nombre if p else f'ID {pid}',
-                        'disponible': float(disponible),
-                        'requerido': qty
-                    })
-
-            if insuficientes:
-                # Si falta stock en al menos un producto, cancelar todo y avisar
-                return render(request, 'ventas.html', {
-                    'vendedores': vendedores,
-                    'productos': productos,
-                    'error': 'Stock insuficiente para completar la venta. No se realizó ningún registro.',
-                    'insuficientes': insuficientes
-                })
-
-            # Todo OK: crear Venta y DetalleVenta, y actualizar stock (ya tenemos bloqueo)
-            # usar hora local Centroamérica (UTC-6) al crear la venta
-            venta = Venta.objects.create(vendedor_id=vendedor_id, fecha_hora=timezone.now())
-
-            for pid, qty in required.items():
-                DetalleVenta.objects.create(venta=venta, producto_id=pid, cantidad=qty)
-                p = prod_map.get(int(pid))
-                if p:
-                    p.stock = (p.stock or Decimal('0')) - Decimal(qty)
-                    p.save(update_fields=['stock'])
+        # Validar y descontar stock en un solo UPDATE condicional; si falta stock
+        # en al menos un producto no se registra nada
+        try:
+            escritor.ejecutar(registrar_venta, vendedor_id, required)
+        except StockInsuficiente as exc:
+            return render(request, 'ventas.html', {
+                'error': 'Stock insuficiente para completar la venta. No se realizó ningún registro.',
+                'insuficientes': exc.insuficientes
+            })
+        except ValueError as exc:
+            return render(request, 'ventas.html', {'error': str(exc)})
 
         return redirect('ventas')
 
-    return render(request, 'ventas.html', {
-        'vendedores': vendedores,
-        'productos': productos,
-    })
+    return render(request, 'ventas.html')
 
-def dashboard(request):
+async def dashboard(request):
+    """
+    Vista asíncrona: con ASGI (``Core/asgi.py``) las secciones del dashboard se
+    consultan en paralelo (``dashboard.datos_concurrentes``); una sección lenta
+    se muestra como no disponible en vez de retrasar la página entera.
+    """
     range_param = request.GET.get('range', 'Hoy')
     today = timezone.localdate()
+    rango = '7' if range_param == '7' else 'Hoy'
+
+    # Las cifras se recalculan sólo cuando una venta/compra/producción invalida la caché
+    clave = await sync_to_async(cache_dashboard.clave)(rango, today)
+    context = await sync_to_async(cache_dashboard.consultar)(clave)
+    if context is None:
+        context, completo = await datos_dashboard.datos_concurrentes(rango, today)
+        if completo:
+            await sync_to_async(cache_dashboard.guardar)(clave, context)
+    context = {**context, 'range_selected': range_param}
+    return await sync_to_async(render)(request, 'dashboard.html', context)
+
+def dashboard_eventos(request):
+    """
+    Server-Sent Events con los cambios del dashboard (ventas, inventario) para
+    actualizar las pantallas abiertas sin recargar. Con ASGI cada conexión es
+    una corrutina dormida; con WSGI ocupa un hilo.
+    """
+    flujo = eventos.flujo_async() if isinstance(request, ASGIRequest) else eventos.flujo_sync()
+    response = StreamingHttpResponse(flujo, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # que un proxy nginx no acumule el flujo
+    return response
 
-    if range_param == '7':
-        start_date_sel = today - timedelta(days=6)
-        detalles_qs = DetalleVenta.objects.filter(venta__fecha_hora__date__gte=start_date_sel)
-    else:
-        detalles_qs = DetalleVenta.objects.filter(venta__fecha_hora__date=today)
-
-    line_total = ExpressionWrapper(
-        F('cantidad') * F('producto__precio_venta'),
-        output_field=DecimalField(max_digits=18, decimal_places=2)
-    )
-
-    agg = detalles_qs.aggregate(ingresos_total=Sum(line_total), unidades_vendidas=Sum('cantidad'))
-    ingresos_total = agg['ingresos_total'] or Decimal('0.00')
-    unidades_vendidas = agg['unidades_vendidas'] or 0
-
-    start_7 = today - timedelta(days=6)
-    detalles_7 = DetalleVenta.objects.filter(venta__fecha_hora__date__gte=start_7)
-    diarios_qs = detalles_7.annotate(dia=TruncDate('venta__fecha_hora')).values('dia').annotate(
-        ingreso_dia=Sum(line_total)
-    ).order_by('dia')
-    diarios_map = {item['dia']: (item['ingreso_dia'] or Decimal('0.00')) for item in diarios_qs}
-
-    labels = []
-    values = []
-    for i in range(7):
-        d = start_7 + timedelta(days=i)
-        labels.append(d.strftime('%Y-%m-%d'))
-        values.append(float(diarios_map.get(d, Decimal('0.00'))))
-    ingresos_last7_total = sum(values)
-
-    top_qs = detalles_qs.values('producto__id', 'producto__nombre').annotate(total_vendidos=Sum('cantidad')).order_by('-total_vendidos')[:4]
-    top_sellers = [{'producto_id': it['producto__id'], 'nombre': it['producto__nombre'], 'vendidos': it['total_vendidos'] or 0} for it in top_qs]
-
-    low_stock_qs = Insumo.objects.filter(stock__lt=Decimal('10')).order_by('stock')
-    low_stock_count = low_stock_qs.count()
-    low_stock_items = list(low_stock_qs[:4])
-
-    detalles_today = DetalleVenta.objects.filter(venta__fecha_hora__date=today)
-    ventas_vendedores_qs = detalles_today.values(
-        'venta__vendedor__id', 'venta__vendedor__nombre'
-    ).annotate(
-        total_unidades=Sum('cantidad'),
-        ingreso_total=Sum(line_total)
-    ).order_by('-ingreso_total')
-
-    ventas_vendedores_hoy = [
-        {
-            'vendedor_id': it.get('venta__vendedor__id'),
-            'vendedor': it.get('venta__vendedor__nombre') or '',
-            'unidades': it.get('total_unidades') or 0,
-            'ingreso': it.get('ingreso_total') or Decimal('0.00'),
-        }
-        for it in ventas_vendedores_qs
-    ]
-
-    context = {
-        'ingresos_total': ingresos_total,
-        'unidades_vendidas': unidades_vendidas,
-        'range_selected': range_param,
-        'low_stock_count': low_stock_count,
-        'low_stock_items': low_stock_items,
-        'top_sellers': top_sellers,
-        'ingresos_last7_total': ingresos_last7_total,
-        'sales_chart_labels_json': json.dumps(labels),
-        'sales_chart_values_json': json.dumps(values),
-        'ventas_vendedores_hoy': ventas_vendedores_hoy,
-    }
-    return render(request, 'dashboard.html', context)
+# filas de cada tabla de compras que se muestran en la página de Compras
+COMPRAS_RECIENTES = 25
 
 def Compras(request):
     """
@@ -178,6 +116,8 @@ def Compras(request):
     para compras de insumos y compras de productos.
     También procesa los formularios POST para registrar Compras de Insumos o Productos.
     """
+    error = None
+
     # --- Procesar POST (compra de insumos o compra de productos) ---
     if request.method == 'POST':
         fecha_str = request.POST.get('fecha')
@@ -192,75 +132,33 @@ def Compras(request):
         else:
             fecha_dt = timezone.now()
 
-        # Comprar Insumos
+        proveedor_id = request.POST.get('proveedor')
         insumo_ids = request.POST.getlist('insumo_id')
-        if insumo_ids and any(i for i in insumo_ids):
-            proveedor_id = request.POST.get('proveedor')
-            cantidades = request.POST.getlist('cantidad')
-            precios = request.POST.getlist('precio_unitario')
-
-            with transaction.atomic():
-                for i, insumo_id in enumerate(insumo_ids):
-                    if not insumo_id:
-                        continue
-                    try:
-                        cantidad = Decimal(cantidades[i]) if i < len(cantidades) and cantidades[i] else Decimal('0')
-                        precio = Decimal(precios[i]) if i < len(precios) and precios[i] else Decimal('0')
-                    except Exception:
-                        continue
-
-                    CompraInsumo.objects.create(
-                        proveedor_id=proveedor_id,
-                        insumo_id=insumo_id,
-                        cantidad=cantidad,
-                        precio_unitario=precio,
-                        fecha=fecha_dt
-                    )
-
-                    # actualizar stock de insumo
-                    try:
-                        insumo_obj = Insumo.objects.select_for_update().get(pk=insumo_id)
-                        insumo_obj.stock = (insumo_obj.stock or Decimal('0')) + cantidad
-                        insumo_obj.save(update_fields=['stock'])
-                    except Insumo.DoesNotExist:
-                        pass
-
-            return redirect('Compras')
-
-        # Comprar Productos/Bebidas
         producto_ids = request.POST.getlist('producto_id')
-        if producto_ids and any(p for p in producto_ids):
-            proveedor_id = request.POST.get('proveedor')
-            cantidades = request.POST.getlist('cantidad')
-            precios = request.POST.getlist('precio_unitario')
-
-            with transaction.atomic():
-                for i, producto_id in enumerate(producto_ids):
-                    if not producto_id:
-                        continue
-                    try:
-                        cantidad = Decimal(cantidades[i]) if i < len(cantidades) and cantidades[i] else Decimal('0')
-                        precio = Decimal(precios[i]) if i < len(precios) and precios[i] else Decimal('0')
-                    except Exception:
-                        continue
-
-                    ProductoProveedor.objects.create(
-                        proveedor_id=proveedor_id,
-                        producto_id=producto_id,
-                        cantidad=cantidad,
-                        precio_unitario=precio,
-                        fecha=fecha_dt
-                    )
-
-                    # actualizar stock del producto
-                    try:
-                        producto_obj = Producto.objects.select_for_update().get(pk=producto_id)
-                        producto_obj.stock = (producto_obj.stock or Decimal('0')) + cantidad
-                        producto_obj.save(update_fields=['stock'])
-                    except Producto.DoesNotExist:
-                        pass
-
-            return redirect('Compras')
+        cantidades = request.POST.getlist('cantidad')
+        precios = request.POST.getlist('precio_unitario')
+        factura = request.FILES.get('factura')
+
+        # Validar todas las líneas antes de escribir; la compra se registra completa o nada
+        try:
+            if factura:
+                # Factura subida (CSV/JSON) de insumos o de bebidas
+                modelo = ProductoProveedor if request.POST.get('tipo_compra') == 'BEBIDAS' else CompraInsumo
+                lineas = leer_factura(factura, ARTICULO_DE_COMPRA[modelo][0])
+            elif insumo_ids and any(i for i in insumo_ids):
+                modelo, lineas = CompraInsumo, lineas_formulario(insumo_ids, cantidades, precios)
+            elif producto_ids and any(p for p in producto_ids):
+                modelo, lineas = ProductoProveedor, lineas_formulario(producto_ids, cantidades, precios)
+            else:
+                modelo, lineas = None, []
+
+            if lineas:
+                if not proveedor_id:
+                    raise ValueError('Seleccione un proveedor.')
+                escritor.ejecutar(registrar_compra, modelo, proveedor_id, lineas, fecha_dt)
+                return redirect('Compras')
+        except ValueError as exc:
+            error = str(exc)
 
     # --- GET: preparar datos para mostrar las tablas y selects ---
     line_total_expr = ExpressionWrapper(
@@ -268,49 +166,56 @@ def Compras(request):
         output_field=DecimalField(max_digits=18, decimal_places=2)
     )
 
-    compras_insumos = CompraInsumo.objects.select_related('proveedor', 'insumo') \
-        .annotate(total=line_total_expr) \
-        .order_by('-fecha')[:200]
-
-    compras_productos = ProductoProveedor.objects.select_related('proveedor', 'producto') \
-        .annotate(total=line_total_expr) \
-        .order_by('-fecha')[:200]
+    # sólo la primera página; el resto se consulta en el historial paginado
+    compras_insumos, _ = pagina(
+        CompraInsumo.objects.select_related('proveedor', 'insumo').annotate(total=line_total_expr),
+        'fecha', tamano=COMPRAS_RECIENTES
+    )
 
-    # proveedores e items para los selects (si tu template los usa)
-    proveedores_insumos = Proveedor.objects.filter(tipo_proveedor='INSUMOS').order_by('nombre')
-    proveedores_bebidas = Proveedor.objects.filter(tipo_proveedor='BEBIDAS').order_by('nombre')
-    insumos = Insumo.objects.order_by('nombre')
-    productos_bebida = Producto.objects.filter(tipo_producto='BEBIDA').order_by('nombre')
+    compras_productos, _ = pagina(
+        ProductoProveedor.objects.select_related('proveedor', 'producto').annotate(total=line_total_expr),
+        'fecha', tamano=COMPRAS_RECIENTES
+    )
 
+    # proveedores, insumos y bebidas de los selects los carga el navegador desde /api/catalogo/
     return render(request, 'Compras.html', {
         'compras_insumos': compras_insumos,
         'compras_productos': compras_productos,
-        'proveedores_insumos': proveedores_insumos,
-        'proveedores_bebidas': proveedores_bebidas,
-        'insumos': insumos,
-        'productos_bebida': productos_bebida,
+        'error': error,
     })
 
 def produccion(request):
     productos_pan = Producto.objects.filter(tipo_producto='PAN').prefetch_related('productoinsumo_set__insumo').order_by('nombre')
 
     if request.method == 'POST':
-        producto_id = request.POST.get('producto_id')
-        cantidad_raw = request.POST.get('cantidad')
+        # Un lote puede incluir varios productos (listas paralelas producto_id/cantidad)
+        producto_ids = request.POST.getlist('producto_id')
+        cantidades = request.POST.getlist('cantidad')
         fecha_str = request.POST.get('fecha_hora')
 
-        try:
-            cantidad = int(cantidad_raw)
-        except (TypeError, ValueError):
-            cantidad = 0
-
-        # validar que la cantidad sea >= 1
-        if not producto_id or cantidad < 1:
+        lineas = {}
+        cantidad_invalida = not any(producto_ids)
+        for i, producto_id in enumerate(producto_ids):
+            if not producto_id:
+                continue
+            try:
+                pid = int(producto_id)
+                cantidad = int(cantidades[i]) if i < len(cantidades) else 0
+            except (TypeError, ValueError):
+                cantidad = 0
+            # validar que la cantidad sea >= 1
+            if cantidad < 1:
+                cantidad_invalida = True
+                break
+            lineas[pid] = lineas.get(pid, 0) + cantidad
+
+        if cantidad_invalida:
+            producto_id = producto_ids[0] if producto_ids else None
             return render(request, 'produccion.html', {
                 'productos_pan': productos_pan,
                 'error': 'La cantidad debe ser al menos 1.',
-                'selected_product_id': int(producto_id) if producto_id else None,
-                'cantidad_inicial': cantidad_raw or ''
+                'selected_product_id': int(producto_id) if producto_id and producto_id.isdigit() else None,
+                'cantidad_inicial': cantidades[0] if cantidades else ''
             })
 
         if fecha_str:
@@ -322,44 +227,20 @@ def produccion(request):
         else:
             fecha_dt = timezone.now()
 
-        producto_insumos = ProductoInsumo.objects.filter(producto_id=producto_id).select_related('insumo')
-        required = {}
-        for pi in producto_insumos:
-            uso = Decimal(pi.cantidad_utilizada or 0)
-            total_consumo = uso * Decimal(cantidad)
-            if total_consumo > 0:
-                required[pi.insumo_id] = {'insumo_id': pi.insumo_id, 'insumo_nombre': pi.insumo.nombre, 'requerido': total_consumo}
-
-        with transaction.atomic():
-            if required:
-                insumo_objs = Insumo.objects.select_for_update().filter(pk__in=list(required.keys()))
-                insuff = []
-                insumo_map = {i.id: i for i in insumo_objs}
-                for iid, info in required.items():
-                    insumo_obj = insumo_map.get(iid)
-                    disponible = Decimal(insumo_obj.stock or 0) if insumo_obj else Decimal('0')
-                    if disponible < info['requerido']:
-                        insuff.append({'nombre': info['insumo_nombre'], 'disponible': float(disponible), 'requerido': float(info['requerido'])})
-
-                if insuff:
-                    return render(request, 'produccion.html', {'productos_pan': productos_pan, 'error': 'Stock insuficiente para iniciar la producción.', 'insuficientes': insuff, 'selected_product_id': int(producto_id), 'cantidad_inicial': cantidad})
-
-            prod_record = Produccion.objects.create(producto_id=producto_id, cantidad=cantidad, fecha_hora=fecha_dt)
-
-            try:
-                producto_obj = Producto.objects.select_for_update().get(pk=producto_id)
-                producto_obj.stock = (producto_obj.stock or Decimal('0')) + Decimal(cantidad)
-                producto_obj.save(update_fields=['stock'])
-            except Producto.DoesNotExist:
-                pass
-
-            for iid, info in required.items():
-                try:
-                    insumo_obj = Insumo.objects.select_for_update().get(pk=iid)
-                    insumo_obj.stock = (insumo_obj.stock or Decimal('0')) - Decimal(info['requerido'])
-                    insumo_obj.save(update_fields=['stock'])
-                except Insumo.DoesNotExist:
-                    continue
+        try:
+            escritor.ejecutar(registrar_produccion, lineas, fecha_dt)
+        except (StockInsuficiente, ValueError) as exc:
+            insuficientes = getattr(exc, 'insuficientes', [])
+            return render(request, 'produccion.html', {
+                'productos_pan': productos_pan,
+                'error': 'Stock insuficiente para iniciar la producción.' if insuficientes else str(exc),
+                'insuficientes': [
+                    {'nombre': i['nombre'], 'disponible': i['disponible'], 'requerido': float(i['requerido'])}
+                    for i in insuficientes
+                ],
+                'selected_product_id': next(iter(lineas)),
+                'cantidad_inicial': next(iter(lineas.values())),
+            })
 
         return redirect('produccion')
 
@@ -390,3 +271,248 @@ def produccion(request):
         })
 
     return render(request, 'produccion.html', {'productos_pan': productos_pan, 'producciones_recientes': producciones_recientes})
+
+def planificador(request):
+    """Máximo producible de cada pan con el stock actual y evaluación de un plan de horneado."""
+    filas = capacidad_produccion.capacidad()
+    plan, evaluacion, error = {}, None, None
+    if request.method == 'POST':
+        for fila in filas:
+            valor = request.POST.get(f'plan_{fila["id"]}', '').strip()
+            if not valor:
+                continue
+            try:
+                cantidad = int(valor)
+            except ValueError:
+                cantidad = -1
+            if cantidad < 0:
+                error = f'Cantidad inválida para {fila["nombre"]}.'
+                break
+            if cantidad:
+                plan[fila['id']] = cantidad
+        if not error and not plan:
+            error = 'Indique la cantidad a producir de al menos un producto.'
+        if not error:
+            evaluacion = capacidad_produccion.evaluar(plan)
+
+    for fila in filas:
+        fila['plan'] = plan.get(fila['id'], '')
+    return render(request, 'planificador.html', {'filas': filas, 'evaluacion': evaluacion, 'error': error})
+
+def reposicion(request):
+    """Pedidos sugeridos por proveedor según el pronóstico de consumo (manage.py pronosticar)."""
+    return render(request, 'reposicion.html', {
+        'grupos': pronostico.sugerencias(),
+        'calculado': pronostico.calculado(),
+        'plazo': settings.PRONOSTICO_PLAZO_DIAS + settings.PRONOSTICO_SEGURIDAD_DIAS,
+        'objetivo': settings.PRONOSTICO_OBJETIVO_DIAS,
+    })
+
+MARGEN_DIAS = (7, 30, 90, 365)
+
+def margenes(request):
+    """Margen por producto con los costes ya calculados (compras y recetas) y las ventas del periodo."""
+    try:
+        dias = int(request.GET.get('dias', 30))
+    except ValueError:
+        dias = 30
+    if dias not in MARGEN_DIAS:
+        dias = 30
+    filas = costos.margenes(dias)
+    return render(request, 'margenes.html', {
+        'filas': filas,
+        'dias': dias,
+        'opciones_dias': MARGEN_DIAS,
+        'ingresos': sum((f['ingresos'] for f in filas), Decimal('0')),
+        'margen': sum((f['margen'] for f in filas), Decimal('0')),
+    })
+
+# cambios que lista la página de importación (el resumen cuenta todos)
+IMPORTAR_DETALLE = 200
+
+def importar(request):
+    """Importación masiva de precios, costes y recetas: ``simular`` muestra los cambios, ``aplicar`` los escribe."""
+    contexto = {'tipos': list(importacion.TIPOS), 'tipo': request.POST.get('tipo', 'productos')}
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo')
+        simular = request.POST.get('accion') != 'aplicar'
+        try:
+            if not archivo:
+                raise ValueError('Seleccione un archivo CSV o JSON.')
+            plan = importacion.importar(contexto['tipo'], importacion.leer(archivo), simular=simular)
+        except ValueError as exc:
+            contexto['error'] = str(exc)
+        else:
+            contexto.update({
+                'plan': plan,
+                'simulado': simular,
+                'resumen': plan.resumen(),
+                'detalle': plan.detalle(IMPORTAR_DETALLE),
+            })
+    return render(request, 'importar.html', contexto)
+
+HISTORIALES = {
+    'compras-insumos': 'Compras de Insumos',
+    'compras-productos': 'Compras de Productos',
+    'produccion': 'Producción',
+    'ventas': 'Ventas',
+}
+
+def _fecha_param(valor):
+    try:
+        return date.fromisoformat(valor) if valor else None
+    except ValueError:
+        return None
+
+def _id_param(valor):
+    try:
+        return int(valor) if valor else None
+    except ValueError:
+        return None
+
+def _fmt_fecha(valor):
+    return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M')
+
+def _fmt_dinero(valor):
+    return f'C${Decimal(valor or 0):.2f}'
+
+def historial(request, tipo):
+    """
+    Historial completo de compras, producción o ventas, paginado por cursor sobre
+    (fecha, id) y filtrable por rango de fechas, proveedor/vendedor y artículo.
+    """
+    if tipo not in HISTORIALES:
+        raise Http404('Historial no encontrado')
+
+    desde = _fecha_param(request.GET.get('desde'))
+    hasta = _fecha_param(request.GET.get('hasta'))
+    proveedor_id = _id_param(request.GET.get('proveedor'))
+    vendedor_id = _id_param(request.GET.get('vendedor'))
+    articulo_id = _id_param(request.GET.get('articulo'))
+    tamano = tamano_pagina(request.GET.get('n'))
+    cursor = request.GET.get('cursor')
+
+    line_total_expr = ExpressionWrapper(
+        F('cantidad') * F('precio_unitario'),
+        output_field=DecimalField(max_digits=18, decimal_places=2)
+    )
+    proveedores = vendedores = None
+
+    if tipo in ('compras-insumos', 'compras-productos'):
+        if tipo == 'compras-insumos':
+            modelo, campo_articulo, tipo_proveedor = CompraInsumo, 'insumo', 'INSUMOS'
+            articulos = Insumo.objects.order_by('nombre')
+        else:
+            modelo, campo_articulo, tipo_proveedor = ProductoProveedor, 'producto', 'BEBIDAS'
+            articulos = Producto.objects.filter(tipo_producto='BEBIDA').order_by('nombre')
+        proveedores = Proveedor.objects.filter(tipo_proveedor=tipo_proveedor).order_by('nombre')
+        campo_fecha = 'fecha'
+        qs = modelo.objects.select_related('proveedor', campo_articulo).annotate(total=line_total_expr)
+        if proveedor_id:
+            qs = qs.filter(proveedor_id=proveedor_id)
+        if articulo_id:
+            qs = qs.filter(**{f'{campo_articulo}_id': articulo_id})
+        columnas = ['Fecha', 'Proveedor', 'Artículo', 'Cantidad', 'Precio Unitario', 'Total']
+        def fila(c):
+            return [_fmt_fecha(c.fecha), c.proveedor.nombre, getattr(c, campo_articulo).nombre,
+                    c.cantidad, c.precio_unitario, _fmt_dinero(c.total)]
+    elif tipo == 'produccion':
+        articulos = Producto.objects.filter(tipo_producto='PAN').order_by('nombre')
+        campo_fecha = 'fecha_hora'
+        qs = Produccion.objects.select_related('producto').annotate(
+            costo_total=ExpressionWrapper(F('cantidad') * F('producto__costo'),
+                                          output_field=DecimalField(max_digits=18, decimal_places=2))
+        )
+        if articulo_id:
+            qs = qs.filter(producto_id=articulo_id)
+        columnas = ['Fecha', 'Producto', 'Cantidad', 'Coste total']
+        def fila(p):
+            return [_fmt_fecha(p.fecha_hora), p.producto.nombre, p.cantidad, _fmt_dinero(p.costo_total)]
+    else:
+        articulos = Producto.objects.order_by('nombre')
+        vendedores = Vendedor.objects.order_by('nombre')
+        campo_fecha = 'fecha_hora'
+        qs = Venta.objects.select_related('vendedor')
+        if vendedor_id:
+            qs = qs.filter(vendedor_id=vendedor_id)
+        if articulo_id:
+            qs = qs.filter(Exists(DetalleVenta.objects.filter(venta=OuterRef('pk'), producto_id=articulo_id)))
+        columnas = ['Fecha', 'Ticket', 'Vendedor', 'Unidades', 'Total']
+        totales = {}
+        def fila(v):
+            unidades, total = totales.get(v.pk, (0, 0))
+            return [_fmt_fecha(v.fecha_hora), v.pk, v.vendedor.nombre, unidades, _fmt_dinero(total)]
+
+    qs = qs.filter(**filtro_rango(campo_fecha, desde, hasta))
+    registros, siguiente = pagina(qs, campo_fecha, cursor, tamano)
+
+    if tipo == 'ventas' and registros:
+        # totales sólo de las ventas de esta página (consulta acotada por venta_id)
+        line_total = ExpressionWrapper(
+            F('cantidad') * F('producto__precio_venta'),
+            output_field=DecimalField(max_digits=18, decimal_places=2)
+        )
+        for it in DetalleVenta.objects.filter(venta_id__in=[v.pk for v in registros]).values('venta_id').annotate(
+            unidades=Sum('cantidad'), total=Sum(line_total)
+        ).order_by():
+            totales[it['venta_id']] = (it['unidades'], it['total'])
+
+    return render(request, 'historial.html', {
+        'tipo': tipo,
+        'titulo': HISTORIALES[tipo],
+        'columnas': columnas,
+        'filas': [fila(r) for r in registros],
+        'siguiente': siguiente,
+        'es_primera': not cursor,
+        'proveedores': proveedores,
+        'vendedores': vendedores,
+        'articulos': articulos,
+        'filtros': {
+            'desde': desde.isoformat() if desde else '',
+            'hasta': hasta.isoformat() if hasta else '',
+            'proveedor': proveedor_id,
+            'vendedor': vendedor_id,
+            'articulo': articulo_id,
+        },
+    })
+
+def exportar(request, tipo):
+    """
+    Descarga el libro de ventas, compras o producción de un rango de fechas
+    (?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&formato=csv|xlsx) sin cargarlo entero en memoria.
+    """
+    if tipo not in LIBROS:
+        raise Http404('Libro no encontrado')
+
+    desde = _fecha_param(request.GET.get('desde'))
+    hasta = _fecha_param(request.GET.get('hasta'))
+    nombre = f"{tipo}_{desde or 'inicio'}_{hasta or timezone.localdate()}"
+
+    if request.GET.get('formato') == 'xlsx':
+        # el zip se arma en un archivo temporal en disco y se envía por bloques
+        archivo = tempfile.TemporaryFile()
+        escribir_xlsx(filas_libro(tipo, desde, hasta), archivo, hoja=tipo)
+        archivo.seek(0)
+        return FileResponse(
+            archivo, as_attachment=True, filename=f'{nombre}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    response = StreamingHttpResponse(csv_stream(filas_libro(tipo, desde, hasta)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return response
+
+@staff_member_required
+def instrumentacion(request):
+    """Resumen por URL de las peticiones medidas en este proceso (INSTRUMENTACION=1).
+
+    Tiempos y consultas dicen mucho de la base: sólo para el personal (login del admin).
+    """
+    from . import instrumentacion as medidas
+
+    registros = medidas.recientes()
+    return render(request, 'instrumentacion.html', {
+        'activa': settings.INSTRUMENTACION,
+        'total': len(registros),
+        'filas': medidas.resumen(registros),
+    })
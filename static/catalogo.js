@@ -0,0 +1,80 @@
+// Catálogo (productos, insumos, proveedores, vendedores) para los selectores.
+// Se guarda en localStorage junto con su ETag: cada carga revalida con
+// If-None-Match y sólo se descarga de nuevo si cambió (si no, el servidor
+// responde 304). Sin conexión se usa la última copia guardada.
+(function () {
+    const CATALOGO_KEY = 'catalogo';
+
+    window.cargarCatalogo = async function (url) {
+        let guardado = null;
+        try { guardado = JSON.parse(localStorage.getItem(CATALOGO_KEY)); } catch (e) { guardado = null; }
+        try {
+            const resp = await fetch(url, {
+                cache: 'no-store',
+                headers: guardado && guardado.etag ? {'If-None-Match': guardado.etag} : {},
+            });
+            if (resp.status === 304 && guardado) return guardado.datos;
+            if (!resp.ok) throw new Error('HTTP ' + resp.status);
+            const datos = await resp.json();
+            try {
+                localStorage.setItem(CATALOGO_KEY, JSON.stringify({etag: resp.headers.get('ETag'), datos: datos}));
+            } catch (e) { /* sin espacio: se usa igual */ }
+            return datos;
+        } catch (e) {
+            if (guardado) return guardado.datos;
+            throw e;
+        }
+    };
+
+    function escapar(texto) {
+        return String(texto).replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'})[c]);
+    }
+
+    // <option>s para ``items``; ``etiqueta(item)`` da el texto y ``atributos(item)`` un objeto data-*
+    window.opcionesHTML = function (items, placeholder, vacio, etiqueta, atributos) {
+        if (!items.length) return `<option value="">${escapar(vacio)}</option>`;
+        const opciones = items.map(item => {
+            const extra = atributos ? Object.entries(atributos(item)).map(([k, v]) => ` data-${k}="${escapar(v)}"`).join('') : '';
+            return `<option value="${item.id}"${extra}>${escapar(etiqueta ? etiqueta(item) : item.nombre)}</option>`;
+        });
+        return (placeholder ? `<option value="">${escapar(placeholder)}</option>` : '') + opciones.join('');
+    };
+
+    // Autocompletar: cada <input class="buscar-input"> dentro de ``contenedor`` reemplaza las
+    // opciones del <select> que le sigue por los resultados de /api/buscar/ (índice del
+    // servidor). ``config``: tipo, clase, etiqueta, atributos y ``todas()`` (opciones completas,
+    // que vuelven al vaciar el campo). Sin conexión el select conserva lo que tenía.
+    window.activarBusqueda = function (contenedor, url, config) {
+        const esperas = new WeakMap();
+        contenedor.addEventListener('input', ev => {
+            const input = ev.target;
+            if (!input.classList.contains('buscar-input')) return;
+            clearTimeout(esperas.get(input));
+            esperas.set(input, setTimeout(() => filtrar(input), 150));
+        });
+
+        async function filtrar(input) {
+            const select = input.nextElementSibling;
+            const texto = input.value.trim();
+            let html;
+            if (!texto) {
+                html = config.todas();
+            } else {
+                const params = new URLSearchParams({tipo: config.tipo, q: texto});
+                if (config.clase) params.set('clase', config.clase);
+                try {
+                    const resp = await fetch(`${url}?${params}`);
+                    if (!resp.ok) return;
+                    const datos = await resp.json();
+                    // la respuesta llegó tarde: ya se escribió otra cosa
+                    if (input.value.trim() !== texto) return;
+                    html = opcionesHTML(datos.resultados, null, 'Sin resultados', config.etiqueta, config.atributos);
+                } catch (e) {
+                    return;
+                }
+            }
+            select.innerHTML = html;
+            select.dispatchEvent(new Event('change'));
+        }
+    };
+})();